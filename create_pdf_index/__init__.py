@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+PDF -> hierarchical section index: parsing, TOC, lookup / BM25 / vector indexes, corpus and daemon.
+
+Nothing is imported here, so `import create_pdf_index.<module>` only loads that module (and the
+heavy dependencies, llama_index and llama_parse, only where they are actually used).
+"""
+
+__version__ = "0.1.0"
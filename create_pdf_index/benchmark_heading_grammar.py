@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark: the single-pass HeadingGrammar + parent stack used by SectionNodeParser,
+against the original heading scan (finditer -> list, a second re.search per heading, and
+sorted(current_parent_nodes) per heading to find the parent).
+
+Run: python -m create_pdf_index.benchmark_heading_grammar
+"""
+
+import random
+import re
+import time
+
+from .heading_grammar import HeadingGrammar
+
+ORIGINAL_PATTERN = re.compile(r"^\s*(\d+(\.\d+)*\.)\s{1,}([^\n]*)$", re.MULTILINE)
+
+
+def original_heading_scan(text):
+    """The heading/parent logic of the original SectionNodeParser._parse_nodes (no node building)."""
+    results = []
+    matches = list(ORIGINAL_PATTERN.finditer(text))
+    current_parent_nodes = {}
+    for i, match in enumerate(matches):
+        section_title_line = match.group(0).strip()
+        section_heading_id = ""
+        heading_level = 0
+        numeric_part_match = re.search(r"(\d+(?:\.\d+)*)", section_title_line)
+        if numeric_part_match:
+            section_heading_id = numeric_part_match.group(1)
+            heading_level = len(section_heading_id.split('.'))
+        parent = None
+        for level in sorted(current_parent_nodes.keys(), reverse=True):
+            if level < heading_level:
+                parent = current_parent_nodes[level]
+                break
+        levels_to_remove = [level for level in current_parent_nodes if level >= heading_level]
+        for level in levels_to_remove:
+            del current_parent_nodes[level]
+        current_parent_nodes[heading_level] = i
+        results.append((section_heading_id, heading_level, parent))
+    return results
+
+
+def grammar_heading_scan(text, grammar):
+    """Same output as original_heading_scan, using the single-pass grammar and an O(1) parent stack."""
+    results = []
+    parent_stack = []
+    for i, (match, line, heading_id, level) in enumerate(grammar.iter_headings(text)):
+        while parent_stack and parent_stack[-1][0] >= level:
+            parent_stack.pop()
+        parent = parent_stack[-1][1] if parent_stack else None
+        parent_stack.append((level, i))
+        results.append((heading_id, level, parent))
+    return results
+
+
+def make_document(num_headings, max_depth=4, seed=0):
+    """Numbered headings ("4.1.2. Title") with a few body lines each."""
+    rnd = random.Random(seed)
+    counters = [0] * max_depth
+    depth = 1
+    lines = ["Guideline for good clinical practice", "Introductory text before the first section."]
+    for _ in range(num_headings):
+        depth = max(1, min(max_depth, depth + rnd.choice((-1, 0, 0, 1))))
+        counters[depth - 1] += 1
+        for d in range(depth, max_depth):
+            counters[d] = 0
+        heading_id = ".".join(str(max(c, 1)) for c in counters[:depth])
+        lines.append(f"{'    ' * rnd.randint(0, 1)}{heading_id}. Section title {rnd.randint(1, 10**6)}")
+        for _ in range(rnd.randint(1, 4)):
+            lines.append("Body text of the section with some words about adverse events and protocol amendments.")
+    return "\n".join(lines)
+
+
+def time_best(func, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+if __name__ == "__main__":
+    grammar = HeadingGrammar()
+    for num_headings in (1_000, 10_000, 100_000):
+        text = make_document(num_headings)
+        assert original_heading_scan(text) == grammar_heading_scan(text, grammar)
+
+        original_time = time_best(original_heading_scan, text)
+        grammar_time = time_best(grammar_heading_scan, text, grammar)
+        mb = len(text) / 1e6
+        print(f"{num_headings:>7} headings ({mb:.1f} MB): "
+              f"original {num_headings / original_time:,.0f} headings/s, "
+              f"grammar {num_headings / grammar_time:,.0f} headings/s "
+              f"(x{original_time / grammar_time:.2f})")
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: the single-pass, list-buffered parse_markdown_to_sections against the original
+version (three re.match calls per line, content grown with +=, H1-H3 only).
+
+Run: python -m create_pdf_index.benchmark_markdown_sections
+"""
+
+import random
+import re
+import time
+
+from .read_pdf_with_llama_parse import parse_markdown_to_sections
+
+
+def original_parse_markdown_to_sections(markdown_text):
+    """The original implementation, kept here as the reference."""
+    sections_data = []
+    current_section = None
+    current_subsection = None
+    current_sub_subsection = None
+    lines = markdown_text.split('\n')
+    for line in lines:
+        h1_match = re.match(r'^#\s*(.*)', line)
+        h2_match = re.match(r'^##\s*(.*)', line)
+        h3_match = re.match(r'^###\s*(.*)', line)
+        if h1_match:
+            title = h1_match.group(1).strip()
+            current_section = {"title": title, "content": "", "subsections": []}
+            sections_data.append(current_section)
+            current_subsection = None
+            current_sub_subsection = None
+        elif h2_match and current_section:
+            title = h2_match.group(1).strip()
+            current_subsection = {"title": title, "content": "", "sub_subsections": []}
+            current_section["subsections"].append(current_subsection)
+            current_sub_subsection = None
+        elif h3_match and current_subsection:
+            title = h3_match.group(1).strip()
+            current_sub_subsection = {"title": title, "content": ""}
+            current_subsection["sub_subsections"].append(current_sub_subsection)
+        else:
+            if current_sub_subsection:
+                current_sub_subsection["content"] += line + "\n"
+            elif current_subsection:
+                current_subsection["content"] += line + "\n"
+            elif current_section:
+                current_section["content"] += line + "\n"
+    for section in sections_data:
+        section["content"] = section["content"].strip()
+        for subsection in section.get("subsections", []):
+            subsection["content"] = subsection["content"].strip()
+            for sub_subsection in subsection.get("sub_subsections", []):
+                sub_subsection["content"] = sub_subsection["content"].strip()
+    return sections_data
+
+
+def make_markdown(target_bytes, max_depth=6, body_lines=(1, 40), seed=0):
+    """Random markdown with H1-H<max_depth> headings and a preamble, about target_bytes long."""
+    rnd = random.Random(seed)
+    parts = ["Preamble text before the first heading."]
+    size = 0
+    depth = 1
+    while size < target_bytes:
+        depth = max(1, min(max_depth, depth + rnd.choice((-1, 0, 1))))
+        heading = f"{'#' * depth} Section {rnd.randint(1, 10**6)}"
+        parts.append(heading)
+        size += len(heading)
+        for _ in range(rnd.randint(*body_lines)):
+            line = "Any law(s) and regulation(s) addressing the conduct of clinical trials of products."
+            parts.append(line)
+            size += len(line)
+    return "\n".join(parts)
+
+
+def time_best(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+if __name__ == "__main__":
+    # Sanity check: on H1-only markdown without a preamble, both give the same sections
+    h1_only = "\n".join(f"# Title {i}\nbody {i}\nmore" for i in range(100))
+    stripped = [{"title": s["title"], "content": s["content"], "subsections": s["subsections"]}
+                for s in parse_markdown_to_sections(h1_only)]
+    assert stripped == original_parse_markdown_to_sections(h1_only)
+
+    for target_mb, body_lines in ((1, (1, 40)), (8, (1, 40)), (8, (2000, 4000))):
+        text = make_markdown(target_mb * 10**6, body_lines=body_lines)
+        original_time = time_best(original_parse_markdown_to_sections, text)
+        new_time = time_best(parse_markdown_to_sections, text)
+        label = "long sections" if body_lines[0] > 100 else "short sections"
+        print(f"{len(text) / 1e6:5.1f} MB, {label:>14}: original {len(text) / 1e6 / original_time:6.1f} MB/s, "
+              f"single-pass {len(text) / 1e6 / new_time:6.1f} MB/s (x{original_time / new_time:.1f})")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite: SectionNodeParser, the header/footer preprocessor, parse_markdown_to_sections
+and build_toc on synthetic documents (see synthetic_documents.py) at 1x / 10x / 100x a base size.
+
+For each component and size it reports the best wall time of --repeat runs, throughput
+(MB/s of input, and pages/s or headings/s), and peak Python memory (tracemalloc, in a separate run
+so the tracing overhead does not distort the timings). --json writes the results for comparing runs.
+
+Run: pdf-index-bench [--base-pages 20] [--scales 1 10 100] [--style numbered|cfr] [--json out.json]
+"""
+
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from .synthetic_documents import generate_document
+
+
+def time_best(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        tic = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+def peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_cases(document, heading_style):
+    """[(component, callable, input bytes, items, item unit)] for one synthetic document."""
+    from .create_index_from_pdf import SectionNodeParser
+    from .heading_grammar import HeadingGrammar, CFR_HEADING_STYLES
+    from .proccess_markdown_data import pre_process_llamaparse_markdown_streaming
+    from .read_pdf_with_llama_parse import parse_markdown_to_sections
+    from .table_of_content_from_metadata import build_toc
+
+    grammar = HeadingGrammar(CFR_HEADING_STYLES) if heading_style == "cfr" else HeadingGrammar()
+    section_parser = SectionNodeParser(heading_grammar=grammar)
+    documents = document.documents()
+    markdown_lines = document.markdown.splitlines(keepends=True)
+
+    # build_toc input: the extracted_nodes records SectionNodeParser produces for this document
+    toc_records = [
+        {
+            "node_id": node.metadata["node_id"],
+            "parent_node_id": node.metadata.get("parent_node_id"),
+            "heading_level": node.metadata["heading_level"],
+            "heading_id": node.metadata.get("heading_id", ""),
+            "page_label": node.metadata["page_label"],
+            "section_title": node.metadata["section"],
+        }
+        for node in section_parser.iter_nodes(documents)
+    ]
+
+    return [
+        ("SectionNodeParser", lambda: section_parser.get_nodes_from_documents(documents),
+         document.text_bytes, len(document.page_texts), "pages"),
+        ("preprocess (streaming)",
+         lambda: pre_process_llamaparse_markdown_streaming(lambda: markdown_lines, io.StringIO(),
+                                                           page_delimiter_base="---PAGE_BREAK__"),
+         document.markdown_bytes, len(document.page_texts), "pages"),
+        ("parse_markdown_to_sections", lambda: parse_markdown_to_sections(document.markdown),
+         document.markdown_bytes, document.heading_count, "headings"),
+        ("build_toc", lambda: build_toc(toc_records),
+         0, len(toc_records), "records"),
+    ]
+
+
+def run_suite(base_pages=20, scales=(1, 10, 100), heading_style="numbered", max_depth=4, repeat=3, seed=0):
+    results = []
+    for scale in scales:
+        document = generate_document(pages=base_pages * scale, max_depth=max_depth,
+                                     heading_style=heading_style, seed=seed)
+        for component, func, input_bytes, items, unit in benchmark_cases(document, heading_style):
+            seconds = time_best(func, repeat)
+            results.append({
+                "component": component,
+                "scale": scale,
+                "pages": len(document.page_texts),
+                "seconds": seconds,
+                "mb_per_s": input_bytes / 1e6 / seconds if input_bytes else None,
+                "items_per_s": items / seconds,
+                "item_unit": unit,
+                "peak_memory_mb": peak_memory(func) / 1e6,
+            })
+    return results
+
+def print_results(results):
+    print(f"{'component':<28} {'scale':>6} {'pages':>7} {'time (s)':>10} {'MB/s':>8} {'items/s':>18} {'peak MB':>9}")
+    for r in results:
+        mb_per_s = f"{r['mb_per_s']:8.1f}" if r["mb_per_s"] is not None else f"{'-':>8}"
+        items = f"{r['items_per_s']:,.0f} {r['item_unit']}"
+        print(f"{r['component']:<28} {r['scale']:>5}x {r['pages']:>7} {r['seconds']:>10.4f} {mb_per_s} "
+              f"{items:>18} {r['peak_memory_mb']:>9.1f}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the section parsers on synthetic documents.")
+    arg_parser.add_argument("--base-pages", type=int, default=20)
+    arg_parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    arg_parser.add_argument("--style", choices=("numbered", "cfr"), default="numbered")
+    arg_parser.add_argument("--max-depth", type=int, default=4)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--json", help="also write the results to this JSON file")
+    args = arg_parser.parse_args(argv)
+
+    results = run_suite(args.base_pages, args.scales, args.style, args.max_depth, args.repeat, args.seed)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: build_toc (one-pass children index, iterative assembly) against the original
+recursive build_toc, which scanned every heading to find the children of each heading.
+
+Run: python -m create_pdf_index.benchmark_toc
+"""
+
+import random
+import time
+
+from .table_of_content_from_metadata import build_toc
+
+
+def original_build_toc(headings_data):
+    """The original O(n^2) build_toc / parse_section, kept here as the reference."""
+    heading_map = {h['node_id']: h for h in headings_data if h.get('heading_level') != 0}
+    toc = []
+    top_level_headings = []
+    for h in heading_map.values():
+        if h['heading_level'] == 1:
+            parent_id = h.get('parent_node_id')
+            if parent_id is None:
+                top_level_headings.append(h)
+            else:
+                parent_heading = heading_map.get(parent_id)
+                if parent_heading and parent_heading.get('heading_level') != 0:
+                    continue
+                else:
+                    top_level_headings.append(h)
+    top_level_headings.sort(key=lambda x: (int(x.get('page_label', 0)), x.get('heading_id', '')))
+    for top_heading in top_level_headings:
+        toc.append(original_parse_section(top_heading, heading_map))
+    return toc
+
+
+def original_parse_section(current_heading, heading_map):
+    section_entry = {
+        "title": current_heading["section_title"],
+        "page": current_heading["page_label"],
+        "level": current_heading["heading_level"],
+        "subsections": []
+    }
+    children = [
+        h for h in heading_map.values()
+        if h.get('parent_node_id') == current_heading['node_id'] and
+           h.get('heading_level') == current_heading['heading_level'] + 1
+    ]
+    children.sort(key=lambda x: (int(x.get('page_label', 0)), x.get('heading_id', '')))
+    for child in children:
+        section_entry["subsections"].append(original_parse_section(child, heading_map))
+    return section_entry
+
+
+def make_headings(num_headings, max_depth=5, seed=0):
+    """extracted_nodes-style records: a level 0 preamble, then a random heading tree."""
+    rnd = random.Random(seed)
+    headings = [{"section_title": "Document Preamble", "page_label": "1", "heading_level": 0,
+                 "heading_id": "", "parent_node_id": None, "node_id": "n0", "content": ""}]
+    counters = [0] * max_depth
+    stack = [(0, "n0")]
+    depth = 1
+    for i in range(1, num_headings + 1):
+        depth = max(1, min(max_depth, depth + rnd.choice((-1, 0, 0, 1))))
+        counters[depth - 1] += 1
+        for d in range(depth, max_depth):
+            counters[d] = 0
+        heading_id = ".".join(str(max(c, 1)) for c in counters[:depth])
+        while stack[-1][0] >= depth:
+            stack.pop()
+        node_id = f"n{i}"
+        headings.append({"section_title": f"{heading_id}. Title", "page_label": str(1 + i // 20),
+                         "heading_level": depth, "heading_id": heading_id,
+                         "parent_node_id": stack[-1][1], "node_id": node_id, "content": ""})
+        stack.append((depth, node_id))
+    return headings
+
+
+def time_once(func, *args):
+    tic = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - tic
+
+
+if __name__ == "__main__":
+    # The original is quadratic, so it is only timed up to this many headings
+    original_limit = 10_000
+
+    for num_headings in (1_000, 10_000, 100_000):
+        headings = make_headings(num_headings)
+        toc, new_time = time_once(build_toc, headings)
+        line = f"{num_headings:>7} headings: build_toc {new_time * 1000:9.1f} ms"
+        if num_headings <= original_limit:
+            original_toc, original_time = time_once(original_build_toc, headings)
+            assert toc == original_toc
+            line += f" | original {original_time * 1000:9.1f} ms (x{original_time / new_time:.0f})"
+        else:
+            line += " | original skipped (quadratic)"
+        print(line)
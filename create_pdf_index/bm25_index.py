@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent BM25 keyword index over extracted_nodes records.
+
+Built once from any number of extracted_nodes_*.json / .ndjson files (see extract_section_from_data),
+then queried from a cold process without loading it: every part of the index is a flat binary
+array, memory-mapped with numpy at open time, so a query only touches the pages it needs.
+
+Index directory layout:
+    meta.json                 counts, avg section length, BM25 parameters, sources and their section ranges
+    terms.bin, terms.offsets  vocabulary: UTF-8 terms sorted by bytes, concatenated (+ uint64 start offsets)
+    postings.offsets          uint64: postings of term t are [offsets[t], offsets[t + 1])
+    postings.docs             uint32 section numbers, ascending within each term
+    postings.tfs              uint16 term frequencies (capped at 65535)
+    doc_lengths               uint32 tokens per section
+    sections.ndjson(.offsets) stored fields of each section (source, node_id, heading_id, title, page, level)
+
+Run: pdf-index-bm25 build <index_dir> extracted_nodes_*.json
+     pdf-index-bm25 search <index_dir> "adverse drug reaction" [-k 10]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+from array import array
+
+import numpy as np
+
+from .node_writer import RecordNdjsonWriter, iter_node_records, read_ndjson_record
+from . import instrumentation
+
+INDEX_FORMAT_VERSION = 2
+
+# Words, plus dotted section numbers ("50.23", "4.1.1") kept as one token, plus "§" on its own
+_TOKEN = re.compile(r"§|\w+(?:\.\w+)*")
+
+# Fields of each extracted_nodes record kept in sections.ndjson (everything but the content)
+STORED_FIELDS = ("node_id", "heading_id", "section_title", "page_label", "heading_level", "parent_node_id")
+
+_MAX_TF = 65535
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def stored_fields(record, source):
+    """The sections.ndjson entry for one extracted_nodes record of file `source`."""
+    stored = {field: record.get(field) for field in STORED_FIELDS}
+    stored["source"] = source
+    return stored
+
+
+def map_array(path, dtype):
+    # np.memmap refuses empty files
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _write_array(path, values, typecode):
+    with open(path, "wb") as f:
+        array(typecode, values).tofile(f)
+
+
+class BM25Index:
+    """
+    Read side of the index. Opening it maps the files and reads meta.json, nothing else.
+
+        index = BM25Index("bm25_index")
+        for hit in index.search("adverse drug reaction", k=5):
+            print(hit["score"], hit["source"], hit["heading_id"], hit["section_title"])
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{directory}: index format {self.meta.get('version')}, expected {INDEX_FORMAT_VERSION}")
+        self.k1 = self.meta["k1"]
+        self.b = self.meta["b"]
+        self.section_count = self.meta["section_count"]
+        self.avg_length = self.meta["avg_length"]
+        # Sections of sources[i] are [source_offsets[i], source_offsets[i + 1])
+        self.sources = self.meta["sources"]
+        self.source_offsets = self.meta["source_offsets"]
+
+        path = lambda name: os.path.join(directory, name)
+        self._terms = map_array(path("terms.bin"), np.uint8)
+        self._term_offsets = map_array(path("terms.offsets"), np.uint64)
+        self._postings_offsets = map_array(path("postings.offsets"), np.uint64)
+        self._postings_docs = map_array(path("postings.docs"), np.uint32)
+        self._postings_tfs = map_array(path("postings.tfs"), np.uint16)
+        self.doc_lengths = map_array(path("doc_lengths"), np.uint32)
+        self._sections_path = path("sections.ndjson")
+
+    @property
+    def term_count(self):
+        return max(0, len(self._term_offsets) - 1)
+
+    def iter_terms(self):
+        """(term bytes, postings start, postings end) for every term, in vocabulary order."""
+        for term_index in range(self.term_count):
+            yield (self._term(term_index), int(self._postings_offsets[term_index]),
+                   int(self._postings_offsets[term_index + 1]))
+
+    def _term(self, term_index):
+        start, end = int(self._term_offsets[term_index]), int(self._term_offsets[term_index + 1])
+        return self._terms[start:end].tobytes()
+
+    def term_id(self, term):
+        """Position of term in the sorted vocabulary (binary search over the mapped terms), or None."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.term_count and self._term(lo) == key:
+            return lo
+        return None
+
+    def postings(self, term):
+        """(section numbers, term frequencies) for term; both empty if it is not in the index."""
+        term_index = self.term_id(term)
+        if term_index is None:
+            return self._postings_docs[:0], self._postings_tfs[:0]
+        start, end = int(self._postings_offsets[term_index]), int(self._postings_offsets[term_index + 1])
+        return self._postings_docs[start:end], self._postings_tfs[start:end]
+
+    def score(self, query, section_count=None, avg_length=None, document_frequencies=None):
+        """
+        BM25 score of every section for query, as a float32 array (0 where no term matches).
+        The collection statistics default to this index's own; callers combining several
+        indexes pass corpus-wide values instead.
+        """
+        section_count = self.section_count if section_count is None else section_count
+        avg_length = self.avg_length if avg_length is None else avg_length
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        if not len(scores) or not avg_length:
+            return scores
+        # Length normalisation part of the BM25 denominator, shared by all terms
+        norm = self.k1 * (1.0 - self.b + self.b * (self.doc_lengths.astype(np.float32) / avg_length))
+
+        for term in set(tokenize(query)):
+            docs, tfs = self.postings(term)
+            if not len(docs):
+                continue
+            df = len(docs) if document_frequencies is None else document_frequencies[term]
+            idf = np.log(1.0 + (section_count - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm[docs])
+        return scores
+
+    def section(self, section_number):
+        """Stored fields of one section (plus "source", the extracted_nodes file it came from)."""
+        return read_ndjson_record(self._sections_path, int(section_number))
+
+    def search(self, query, k=10):
+        """Top k sections for query: stored fields plus "score", best first."""
+        with instrumentation.span("bm25.search", query=query):
+            scores = self.score(query)
+            hits = top_k(scores, k)
+        results = []
+        for section_number in hits:
+            result = self.section(section_number)
+            result["score"] = float(scores[section_number])
+            results.append(result)
+        return results
+
+
+def top_k(scores, k):
+    """Indexes of the k highest non-zero scores, best first (argpartition, then sort only those k)."""
+    candidates = np.flatnonzero(scores)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def build_index(file_names, directory, k1=1.2, b=0.75):
+    """
+    Builds a BM25Index in `directory` from extracted_nodes files (JSON arrays or NDJSON, plain or
+    compressed). Section title and content are indexed. The index is written to a temporary
+    directory and swapped in at the end, so readers never see a half-written index.
+    Returns the opened index.
+    """
+    postings = {}  # term -> (array of section numbers, array of term frequencies)
+    doc_lengths = array("I")
+    source_offsets = [0]
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp_directory)
+    try:
+        with instrumentation.span("bm25.build.tokenize"), \
+                RecordNdjsonWriter(os.path.join(tmp_directory, "sections.ndjson")) as sections:
+            for file_name in file_names:
+                source = os.path.basename(file_name)
+                for record in iter_node_records(file_name):
+                    section_number = len(doc_lengths)
+                    tokens = tokenize(f"{record.get('section_title', '')}\n{record.get('content', '')}")
+                    doc_lengths.append(len(tokens))
+                    counts = {}
+                    for token in tokens:
+                        counts[token] = counts.get(token, 0) + 1
+                    for token, tf in counts.items():
+                        entry = postings.get(token)
+                        if entry is None:
+                            entry = postings[token] = (array("I"), array("H"))
+                        entry[0].append(section_number)
+                        entry[1].append(min(tf, _MAX_TF))
+
+                    sections.write(stored_fields(record, source))
+                source_offsets.append(len(doc_lengths))
+
+        # Terms sorted by their UTF-8 bytes, the order BM25Index.term_id's binary search compares in
+        sorted_postings = ((encoded, *postings[term]) for encoded, term in
+                           sorted((term.encode("utf-8"), term) for term in postings))
+        with instrumentation.span("bm25.build.write", terms=len(postings)):
+            _write_index_files(tmp_directory, sorted_postings, doc_lengths,
+                               [os.path.basename(file_name) for file_name in file_names], source_offsets, k1, b)
+
+        swap_directory(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    instrumentation.count("sections_indexed", len(doc_lengths))
+    return BM25Index(directory)
+
+
+def merge_indexes(parts, directory):
+    """
+    Builds one index in `directory` from several, keeping only some sections of each (used for
+    compaction). parts: [(BM25Index, keep)], keep a boolean array over the index's sections, or None
+    to keep all. Kept sections are renumbered in order; sources left without sections are dropped.
+    Postings are merged term by term from the mapped arrays: nothing is re-tokenized.
+    Returns the opened index.
+    """
+    parts = [(index, np.ones(index.section_count, dtype=bool) if keep is None else np.asarray(keep, dtype=bool))
+             for index, keep in parts]
+    if not parts:
+        raise ValueError("merge_indexes needs at least one index")
+    k1, b = parts[0][0].k1, parts[0][0].b
+
+    # Old section number -> new section number, per part
+    renumber = []
+    base = 0
+    for index, keep in parts:
+        renumber.append((np.cumsum(keep) - 1 + base).astype(np.uint32))
+        base += int(keep.sum())
+
+    # term -> [(part, postings start, postings end)]
+    term_sources = {}
+    for part, (index, _) in enumerate(parts):
+        for encoded, start, end in index.iter_terms():
+            term_sources.setdefault(encoded, []).append((part, start, end))
+
+    def merged_postings():
+        for encoded in sorted(term_sources):
+            docs_parts, tfs_parts = [], []
+            for part, start, end in term_sources[encoded]:
+                index, keep = parts[part]
+                docs = index._postings_docs[start:end]
+                kept = keep[docs]
+                docs_parts.append(renumber[part][docs[kept]])
+                tfs_parts.append(index._postings_tfs[start:end][kept])
+            docs = np.concatenate(docs_parts)
+            if len(docs):
+                yield encoded, docs, np.concatenate(tfs_parts)
+
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp_directory)
+    try:
+        doc_lengths = np.concatenate([index.doc_lengths[keep] for index, keep in parts])
+        sources = []
+        source_offsets = [0]
+        with instrumentation.span("bm25.merge", parts=len(parts)), \
+                RecordNdjsonWriter(os.path.join(tmp_directory, "sections.ndjson")) as sections:
+            for index, keep in parts:
+                for source, start, end in zip(index.sources, index.source_offsets, index.source_offsets[1:]):
+                    for section_number in np.flatnonzero(keep[start:end]):
+                        sections.write(index.section(start + section_number))
+                    if sections.count > source_offsets[-1]:
+                        sources.append(source)
+                        source_offsets.append(sections.count)
+            _write_index_files(tmp_directory, merged_postings(), doc_lengths, sources, source_offsets, k1, b)
+
+        swap_directory(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    return BM25Index(directory)
+
+
+def _write_index_files(directory, sorted_postings, doc_lengths, sources, source_offsets, k1, b):
+    """Writes everything but sections.ndjson; sorted_postings yields (term bytes, docs, tfs) in byte order."""
+    term_offsets = array("Q", [0])
+    postings_offsets = array("Q", [0])
+    with open(os.path.join(directory, "terms.bin"), "wb") as terms_file, \
+            open(os.path.join(directory, "postings.docs"), "wb") as docs_file, \
+            open(os.path.join(directory, "postings.tfs"), "wb") as tfs_file:
+        for encoded, docs, tfs in sorted_postings:
+            terms_file.write(encoded)
+            term_offsets.append(term_offsets[-1] + len(encoded))
+            docs_file.write(np.asarray(docs, dtype=np.uint32).tobytes())
+            tfs_file.write(np.asarray(tfs, dtype=np.uint16).tobytes())
+            postings_offsets.append(postings_offsets[-1] + len(docs))
+    _write_array(os.path.join(directory, "terms.offsets"), term_offsets, "Q")
+    _write_array(os.path.join(directory, "postings.offsets"), postings_offsets, "Q")
+    doc_lengths = np.asarray(doc_lengths, dtype=np.uint32)
+    doc_lengths.tofile(os.path.join(directory, "doc_lengths"))
+
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "k1": k1,
+        "b": b,
+        "section_count": len(doc_lengths),
+        "avg_length": float(doc_lengths.sum(dtype=np.float64) / len(doc_lengths)) if len(doc_lengths) else 0.0,
+        "term_count": len(term_offsets) - 1,
+        "sources": list(sources),
+        "source_offsets": list(source_offsets),
+    }
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+
+def swap_directory(new_directory, directory):
+    """Replaces directory with new_directory (two renames; the old index is removed afterwards)."""
+    old_directory = None
+    if os.path.exists(directory):
+        old_directory = f"{directory}.old-{os.getpid()}"
+        os.rename(directory, old_directory)
+    os.rename(new_directory, directory)
+    if old_directory is not None:
+        shutil.rmtree(old_directory, ignore_errors=True)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build or query a BM25 index over extracted_nodes files.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="index extracted_nodes files")
+    build_parser.add_argument("directory")
+    build_parser.add_argument("files", nargs="+")
+    search_parser = commands.add_parser("search", help="query an index")
+    search_parser.add_argument("directory")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=10)
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_index(args.files, args.directory)
+        print(f"Indexed {index.section_count} sections ({index.term_count} terms) into {args.directory}")
+    else:
+        for hit in BM25Index(args.directory).search(args.query, k=args.k):
+            print(f"{hit['score']:7.3f}  {hit['source']}  {hit['heading_id'] or '-'}  "
+                  f"{hit['section_title']} (page {hit['page_label']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
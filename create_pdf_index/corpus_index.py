@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Incrementally updated corpus index: BM25 keyword search and heading / page lookups over many
+documents, where adding, replacing or removing one document only writes that document's data.
+
+The corpus is a list of immutable segments, each a BM25 index plus a lookup index over one or
+more documents (bm25_index.py, lookup_index.py). corpus.json maps every live document to the
+segment holding its current version:
+  - add / replace: the document's extracted_nodes file becomes a new segment; corpus.json is
+    pointed at it. The copy in its old segment is now a tombstone.
+  - remove: the document is dropped from corpus.json; its rows become tombstones.
+Tombstones are not stored separately: a segment's dead documents are the ones listed in the
+segment whose corpus.json entry points elsewhere. Searches mask them out and compute BM25
+statistics (section count, average length, document frequencies) over live sections only, so
+scores are the same as for a freshly built index.
+
+compact() merges segments into one, dropping tombstones. It merges the mapped postings rather
+than re-tokenizing, and can run in a background thread while updates and searches go on;
+maybe_compact() starts it once there are too many segments or too many tombstones.
+One process should write to a corpus at a time (e.g. the ingest daemon); any number may read.
+
+Run: pdf-index-corpus <corpus_dir> add extracted_nodes_*.json
+     pdf-index-corpus <corpus_dir> remove <document> ...
+     pdf-index-corpus <corpus_dir> search "adverse drug reaction" [-k 10]
+     pdf-index-corpus <corpus_dir> heading <document> <heading_id>
+     pdf-index-corpus <corpus_dir> compact | stats
+"""
+
+import argparse
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from . import bm25_index
+from . import lookup_index
+from .bm25_index import tokenize, top_k
+from .ingest_manifest import file_content_hash
+from . import instrumentation
+
+CORPUS_FORMAT_VERSION = 1
+
+
+class CorpusIndex:
+
+    def __init__(self, directory, max_segments=8, max_dead_fraction=0.3):
+        self.directory = directory
+        self.max_segments = max_segments
+        self.max_dead_fraction = max_dead_fraction
+        self._lock = threading.RLock()
+        self._compaction = None
+        # Segments being merged by a running compaction (their files must stay until it finishes)
+        self._compacting = set()
+        # segment name -> searches still reading it; a dropped segment's files are deleted when the
+        # last of them finishes (segments waiting for that are in _retired)
+        self._readers = {}
+        self._retired = set()
+        # segment name -> (BM25Index, LookupIndex), opened on first use
+        self._opened = {}
+        # (segment name, dead documents) -> (live mask over sections, live length sum)
+        self._live_masks = {}
+
+        os.makedirs(os.path.join(directory, "segments"), exist_ok=True)
+        self._manifest_path = os.path.join(directory, "corpus.json")
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("version") != CORPUS_FORMAT_VERSION:
+                raise ValueError(f"{directory}: corpus format {self.manifest.get('version')}, "
+                                 f"expected {CORPUS_FORMAT_VERSION}")
+        else:
+            # segments: {name: [documents, in segment order]}; documents: {name: {segment, content_hash}}
+            self.manifest = {"version": CORPUS_FORMAT_VERSION, "next_segment": 0, "segments": {}, "documents": {}}
+
+    # --- Manifest and segments ---
+
+    def _save_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self._manifest_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _segment_path(self, segment, part):
+        return os.path.join(self.directory, "segments", segment, part)
+
+    def _new_segment_name(self):
+        with self._lock:
+            name = f"seg-{self.manifest['next_segment']:06d}"
+            self.manifest["next_segment"] += 1
+            return name
+
+    def _segment(self, segment):
+        opened = self._opened.get(segment)
+        if opened is None:
+            opened = self._opened[segment] = (bm25_index.BM25Index(self._segment_path(segment, "bm25")),
+                                              lookup_index.LookupIndex(self._segment_path(segment, "lookup")))
+        return opened
+
+    def dead_documents(self, segment):
+        """Tombstones of a segment: its documents that were since replaced or removed."""
+        documents = self.manifest["documents"]
+        return frozenset(document for document in self.manifest["segments"][segment]
+                         if documents.get(document, {}).get("segment") != segment)
+
+    def _live_mask(self, segment):
+        """(boolean mask of the segment's live sections, total token length of those sections)."""
+        dead = self.dead_documents(segment)
+        cached = self._live_masks.get((segment, dead))
+        if cached is None:
+            bm25 = self._segment(segment)[0]
+            # Only the mask for the segment's current tombstones is worth keeping
+            for key in [key for key in self._live_masks if key[0] == segment]:
+                del self._live_masks[key]
+            mask = np.ones(bm25.section_count, dtype=bool)
+            for source, start, end in zip(bm25.sources, bm25.source_offsets, bm25.source_offsets[1:]):
+                if lookup_index.document_name(source) in dead:
+                    mask[start:end] = False
+            cached = self._live_masks[(segment, dead)] = (mask, int(bm25.doc_lengths[mask].sum(dtype=np.int64)))
+        return cached
+
+    def _drop_segment(self, segment):
+        self._opened.pop(segment, None)
+        for key in [key for key in self._live_masks if key[0] == segment]:
+            del self._live_masks[key]
+        if self._readers.get(segment):
+            self._retired.add(segment)
+        else:
+            shutil.rmtree(os.path.join(self.directory, "segments", segment), ignore_errors=True)
+
+    def _pin(self, segments):
+        # Called with the lock held
+        for segment in segments:
+            self._readers[segment] = self._readers.get(segment, 0) + 1
+
+    def _unpin(self, segments):
+        with self._lock:
+            for segment in segments:
+                self._readers[segment] -= 1
+                if not self._readers[segment]:
+                    del self._readers[segment]
+                    if segment in self._retired:
+                        self._retired.discard(segment)
+                        self._drop_segment(segment)
+
+    # --- Updates ---
+
+    def add_documents(self, file_names, force=False):
+        """
+        Adds or replaces the documents of these extracted_nodes files (named by
+        lookup_index.document_name) as one new segment. Files whose content hash matches the
+        indexed version are skipped unless force=True. Returns the names of the documents written.
+        """
+        changed = []
+        for file_name in file_names:
+            document = lookup_index.document_name(file_name)
+            content_hash = file_content_hash(file_name)
+            current = self.manifest["documents"].get(document)
+            if force or current is None or current["content_hash"] != content_hash:
+                changed.append((document, file_name, content_hash))
+        if not changed:
+            return []
+
+        segment = self._new_segment_name()
+        files = [file_name for _, file_name, _ in changed]
+        with instrumentation.span("corpus.add", documents=len(changed)):
+            bm25_index.build_index(files, self._segment_path(segment, "bm25"))
+            lookup_index.build_index(files, self._segment_path(segment, "lookup"))
+            with self._lock:
+                self.manifest["segments"][segment] = [document for document, _, _ in changed]
+                for document, _, content_hash in changed:
+                    self.manifest["documents"][document] = {"segment": segment, "content_hash": content_hash}
+                self._save_manifest()
+        return [document for document, _, _ in changed]
+
+    def add_document(self, file_name, force=False):
+        return bool(self.add_documents([file_name], force=force))
+
+    def remove_documents(self, documents):
+        """Removes documents from the corpus (their rows become tombstones). Returns those that existed."""
+        with self._lock:
+            removed = [document for document in documents if self.manifest["documents"].pop(document, None)]
+            if removed:
+                self._drop_empty_segments()
+                self._save_manifest()
+        return removed
+
+    def _drop_empty_segments(self):
+        # Segments whose documents are all dead are removed outright (no compaction needed)
+        for segment in list(self.manifest["segments"]):
+            if segment in self._compacting:
+                continue
+            if len(self.dead_documents(segment)) == len(self.manifest["segments"][segment]):
+                del self.manifest["segments"][segment]
+                self._drop_segment(segment)
+
+    # --- Compaction ---
+
+    def stats(self):
+        with self._lock:
+            segments = list(self.manifest["segments"])
+            live = dead = 0
+            for segment in segments:
+                mask = self._live_mask(segment)[0]
+                live += int(mask.sum())
+                dead += len(mask) - int(mask.sum())
+            return {"documents": len(self.manifest["documents"]), "segments": len(segments),
+                    "live_sections": live, "dead_sections": dead,
+                    "compacting": self._compaction is not None and self._compaction.is_alive()}
+
+    def needs_compaction(self):
+        stats = self.stats()
+        total = stats["live_sections"] + stats["dead_sections"]
+        return stats["segments"] > self.max_segments or (total and stats["dead_sections"] / total > self.max_dead_fraction)
+
+    def maybe_compact(self):
+        """Starts a background compaction if the corpus needs one; returns the thread or None."""
+        if self.needs_compaction():
+            return self.compact(background=True)
+        return None
+
+    def compact(self, background=False):
+        """
+        Merges all current segments into one, leaving out tombstones. With background=True it runs
+        in a thread (returned; join() it to wait); updates made meanwhile are kept, and documents
+        replaced or removed meanwhile are tombstoned in the merged segment.
+        """
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return self._compaction
+            if background:
+                self._compaction = threading.Thread(target=self._compact, name="corpus-compaction", daemon=True)
+                self._compaction.start()
+                return self._compaction
+        self._compact()
+        return None
+
+    def _compact(self):
+        with self._lock:
+            segments = list(self.manifest["segments"])
+            if len(segments) <= 1 and not any(self.dead_documents(segment) for segment in segments):
+                return
+            # Snapshot what is live now; the merge itself runs without holding the lock
+            parts = []
+            live_documents = []
+            for segment in segments:
+                bm25, lookup = self._segment(segment)
+                parts.append((segment, bm25, lookup, self._live_mask(segment)[0], self.dead_documents(segment)))
+            merged = self._new_segment_name()
+            self._compacting.update(segments)
+
+        try:
+            self._merge_segments(parts, merged, live_documents)
+        except BaseException:
+            with self._lock:
+                self._compacting.difference_update(segments)
+            shutil.rmtree(os.path.join(self.directory, "segments", merged), ignore_errors=True)
+            raise
+
+        with self._lock:
+            documents = self.manifest["documents"]
+            for document in live_documents:
+                entry = documents.get(document)
+                # Documents replaced or removed during the merge stay dead in the merged segment
+                if entry is not None and entry["segment"] in segments:
+                    entry["segment"] = merged
+            self.manifest["segments"][merged] = live_documents
+            for segment in segments:
+                del self.manifest["segments"][segment]
+            self._compacting.difference_update(segments)
+            self._drop_empty_segments()
+            self._save_manifest()
+            for segment in segments:
+                self._drop_segment(segment)
+
+    def _merge_segments(self, parts, merged, live_documents):
+        with instrumentation.span("corpus.compact", segments=len(parts)):
+            bm25_index.merge_indexes([(bm25, mask) for _, bm25, _, mask, _ in parts],
+                                     self._segment_path(merged, "bm25"))
+            documents_records = []
+            for _, _, lookup, _, dead in parts:
+                for document in lookup.documents:
+                    if document not in dead:
+                        live_documents.append(document)
+                        documents_records.append((document, lookup.document_records(document)))
+            lookup_index.build_index_from_records(documents_records, self._segment_path(merged, "lookup"))
+
+    # --- Queries ---
+
+    def search(self, query, k=10):
+        """BM25 top k over all live sections; hits are stored fields plus "document" and "score"."""
+        with self._lock, instrumentation.span("corpus.search", query=query):
+            segments = [(segment, self._segment(segment)[0], *self._live_mask(segment))
+                        for segment in self.manifest["segments"]]
+            section_count = sum(int(mask.sum()) for _, _, mask, _ in segments)
+            if not section_count:
+                return []
+            avg_length = sum(length for _, _, _, length in segments) / section_count
+            # Corpus-wide document frequencies over live sections only
+            document_frequencies = {}
+            for term in set(tokenize(query)):
+                document_frequencies[term] = sum(
+                    int(np.count_nonzero(mask[bm25.postings(term)[0]])) for _, bm25, mask, _ in segments)
+
+            candidates = []
+            for number, (segment, bm25, mask, _) in enumerate(segments):
+                scores = bm25.score(query, section_count, avg_length, document_frequencies)
+                scores[~mask] = 0.0
+                for section_number in top_k(scores, k):
+                    candidates.append((float(scores[section_number]), number, int(section_number)))
+            # The hits are read after the lock is released: keep the segments' files until then,
+            # even if a compaction finishes and drops them meanwhile
+            pinned = [segment for segment, _, _, _ in segments]
+            self._pin(pinned)
+
+        try:
+            hits = []
+            for score, number, section_number in heapq.nlargest(k, candidates, key=lambda c: c[0]):
+                hit = segments[number][1].section(section_number)
+                hit["document"] = lookup_index.document_name(hit["source"])
+                hit["score"] = score
+                hits.append(hit)
+            return hits
+        finally:
+            self._unpin(pinned)
+
+    def _document_lookup(self, document):
+        entry = self.manifest["documents"].get(document)
+        return None if entry is None else self._segment(entry["segment"])[1]
+
+    def heading(self, document, heading_id):
+        with self._lock:
+            lookup = self._document_lookup(document)
+            return lookup.heading(document, heading_id) if lookup is not None else []
+
+    def pages(self, document, first, last=None):
+        with self._lock:
+            lookup = self._document_lookup(document)
+            return lookup.pages(document, first, last) if lookup is not None else []
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Incrementally updated corpus index over extracted_nodes files.")
+    arg_parser.add_argument("directory")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="add or replace documents")
+    add_parser.add_argument("files", nargs="+")
+    add_parser.add_argument("--force", action="store_true", help="re-index even if unchanged")
+    remove_parser = commands.add_parser("remove", help="remove documents")
+    remove_parser.add_argument("documents", nargs="+")
+    search_parser = commands.add_parser("search")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=10)
+    heading_parser = commands.add_parser("heading")
+    heading_parser.add_argument("document")
+    heading_parser.add_argument("heading_id")
+    commands.add_parser("compact")
+    commands.add_parser("stats")
+    args = arg_parser.parse_args(argv)
+
+    corpus = CorpusIndex(args.directory)
+    if args.command == "add":
+        written = corpus.add_documents(args.files, force=args.force)
+        print(f"Indexed {len(written)} new/changed document(s), {len(args.files) - len(written)} unchanged")
+        compaction = corpus.maybe_compact()
+        if compaction is not None:
+            compaction.join()
+    elif args.command == "remove":
+        print(f"Removed {len(corpus.remove_documents(args.documents))} document(s)")
+    elif args.command == "search":
+        for hit in corpus.search(args.query, k=args.k):
+            print(f"{hit['score']:7.3f}  {hit['document']}  {hit['heading_id'] or '-'}  "
+                  f"{hit['section_title']} (page {hit['page_label']})")
+    elif args.command == "heading":
+        for row in corpus.heading(args.document, args.heading_id):
+            print(json.dumps(row, ensure_ascii=False))
+    elif args.command == "compact":
+        corpus.compact()
+    print(json.dumps(corpus.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
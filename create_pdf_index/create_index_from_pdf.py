@@ -0,0 +1,767 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed May 21 07:37:14 2025
+
+@author: Admin
+"""
+
+import argparse
+import re
+import sys
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.schema import TextNode, Document
+from typing import List, Optional, Dict, Iterable, Iterator
+from llama_index.core.bridge.pydantic import Field
+import os
+import uuid # Import uuid for generating unique IDs
+import glob
+import hashlib
+import traceback
+from .heading_grammar import HeadingGrammar
+from .ingest_manifest import IngestManifest, file_content_hash
+from .node_writer import NodeNdjsonWriter
+from . import lookup_index as section_lookup
+from .section_store import SectionStore
+from . import instrumentation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Node IDs are uuid5(namespace, document key + heading path), so re-parsing an unchanged
+# document gives the same node_id / parent_node_id values. Bump the version if the scheme changes.
+_NODE_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "create-pdf-index/section-node")
+_NODE_ID_SCHEME_VERSION = 2
+
+class SectionNodeParser(NodeParser):
+    """
+    A custom NodeParser that splits a document into sections based on defined heading patterns,
+    and includes hierarchical information in node metadata.
+    """
+    section_heading_pattern: str = Field(
+        # The most robust regex for your document's numeric and indented headings
+        # default=r"^(Chapter\s+\d+:[\s\w]+|(\d+\.)+\s+[\w\s]+|((\d+\.)+\s*.*))$",
+        # default=r"^(Chapter\s+\d+:[\s\w]+|(\d+\.)+\s*.*)$",
+        # default=r"^(Chapter\s+\d+:[\s\w]+|(\d+\.)+\s*.*)|((\d+\.)+\s*[^\n]*)$",
+        # default=r"^((\d+\.)+\s*[\w\s\(\)\-]*)$",
+        # default=r"^\s*((\d+\.)+\s*[\w\s\(\)\-]*)$",
+        # default=r"^.*?((\d+\.)+\s*[\w\s\(\)\-]*)$",
+        # default=r"^\s*(\d+(\.\s*)?)+\s*[^\n]*$",
+        # default=r"^\s*(\d+(\.\s*)?)+\s*[^\n]*$"
+        # default = r"^\s*(\d+(\.\d+)*)\s{1,}([^\n]*)$",
+        default = r"^\s*(\d+(\.\d+)*\.)\s{1,}([^\n]*)$",
+        # default = r"^\s*((?:\d+\.)*\d+)\s{1,}([^\n]*)$",
+        description="Regular expression pattern to identify section headings."
+    )
+    include_text_in_metadata: bool = Field(
+        default=True,
+        description="Whether to include the full section text in metadata (for debugging)."
+    )
+
+    def __init__(
+        self,
+        section_heading_pattern: Optional[str] = None,
+        include_text_in_metadata: bool = True,
+        heading_grammar: Optional[HeadingGrammar] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+
+        # Ensure the correct pattern is used, either from init or the class default
+        if section_heading_pattern is not None:
+            self.section_heading_pattern = section_heading_pattern
+        else:
+            self.section_heading_pattern = self.__fields__["section_heading_pattern"].default
+
+        # All heading styles are matched (and their id/level extracted) in a single regex pass.
+        # Without an explicit grammar, the section_heading_pattern is used as the only style.
+        if heading_grammar is not None:
+            self._heading_grammar = heading_grammar
+        elif self.section_heading_pattern == self.__fields__["section_heading_pattern"].default:
+            self._heading_grammar = HeadingGrammar()
+        else:
+            self._heading_grammar = HeadingGrammar.from_pattern(self.section_heading_pattern)
+
+        self.include_text_in_metadata = include_text_in_metadata
+
+
+    def _parse_nodes(self, documents: List[Document], show_progress: bool = False) -> List[TextNode]:
+        """
+        Splits documents into sections based on heading patterns, adding hierarchical metadata.
+        """
+        with instrumentation.span("parse_nodes", documents=len(documents)) as span:
+            nodes = list(self.iter_nodes(documents))
+            span.set(nodes=len(nodes))
+        instrumentation.count("nodes_emitted", len(nodes))
+        return nodes
+
+    def iter_nodes(self, documents: Iterable[Document]) -> Iterator[TextNode]:
+        """
+        Streaming version of _parse_nodes: yields each TextNode as soon as its heading span closes
+        (i.e. when the next heading is found, or the document ends), so callers can write or index
+        nodes one at a time instead of holding the whole node list in memory.
+        """
+        for doc_index, doc in enumerate(documents):
+            text = doc.text
+            page_label = doc.metadata.get("page_label", "N/A")
+            for record in self._iter_document_records(doc, 0, doc_index):
+                yield self._record_to_node(record, text, page_label)
+
+    def iter_section_records(self, documents: Iterable[Document]) -> Iterator["SectionRecord"]:
+        """
+        Yields compact SectionRecords (offsets into each document's text) instead of TextNodes.
+        parent_index refers to the position of the parent record in this same stream.
+        """
+        record_count = 0
+        for doc_index, doc in enumerate(documents):
+            for record in self._iter_document_records(doc, record_count, doc_index):
+                record_count += 1
+                yield record
+
+    def config_fingerprint(self) -> str:
+        """Hash of everything that changes this parser's output (used to invalidate incremental runs)."""
+        config = "\n".join([
+            self._heading_grammar.pattern,
+            str(self.include_text_in_metadata),
+            str(_NODE_ID_SCHEME_VERSION),
+        ])
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _document_key(doc: Document, doc_index: int) -> str:
+        # extract_section_from_data stores the source file's hash as "content_hash";
+        # documents built by hand fall back to a hash of their own text.
+        # The document's position in the file is part of the key: page labels repeat or are
+        # missing (roman-numeral front matter, blank labels), so they cannot tell pages apart alone.
+        # page_parallel seeds with "content_hash|document" instead (one hierarchy for the whole file),
+        # so the same file gets different node IDs with and without page_workers.
+        content_hash = doc.metadata.get("content_hash")
+        if content_hash is None:
+            content_hash = hashlib.sha256(doc.text.encode("utf-8")).hexdigest()
+        return f"{content_hash}|{doc_index}|{doc.metadata.get('page_label', 'N/A')}"
+
+    def _iter_document_records(self, doc: Document, first_index: int, doc_index: int = 0) -> Iterator["SectionRecord"]:
+        text = doc.text
+        doc_id = doc.doc_id
+        record_index = first_index
+
+        # Deterministic node IDs: document key + heading path ("4/4.1/4.1.1"), plus an occurrence
+        # count for the (rare) case of the same path appearing twice in one document.
+        doc_key = self._document_key(doc, doc_index)
+        path_counts: Dict[str, int] = {}
+
+        def make_node_id(path):
+            occurrence = path_counts.get(path, 0)
+            path_counts[path] = occurrence + 1
+            return str(uuid.uuid5(_NODE_ID_NAMESPACE, f"{doc_key}|{path}|{occurrence}"))
+
+        # Stack of the currently open ancestors, levels strictly increasing from bottom to top.
+        # Entries: (heading_level, node_id, record_index, heading_path)
+        parent_stack: List[tuple[int, str, int, str]] = []
+
+        # The heading whose section is still "open" (its content runs until the next heading)
+        open_section = None
+        heading_count = 0
+
+        for match, section_title_line, section_heading_id, heading_level in self._heading_grammar.iter_headings(text):
+            if open_section is not None:
+                # The next heading closes the previous section
+                open_section.set_span(text, open_section.start, match.start())
+                yield open_section
+                record_index += 1
+
+            # Handle content *before* the first heading (Preamble)
+            elif match.start() > 0:
+                preamble = SectionRecord(doc_id, 0, match.start(), None, 0, -1,
+                                         "Document Preamble", make_node_id("#preamble")) # ID for the preamble node
+                if preamble.set_span(text, 0, match.start()):
+                    yield preamble
+                    # The preamble itself could be a parent for the first actual heading (level 1)
+                    parent_stack.append((0, preamble.node_id, record_index, "")) # Store preamble as level 0 parent
+                    record_index += 1
+
+            # section_title_line e.g. "1.1     Study Aims", section_heading_id e.g. "1.1", heading_level e.g. 2
+
+            # Pop any entries at the same or lower level than the current heading.
+            # This moves us back up to the sibling's / higher-level parent. Each heading is pushed
+            # and popped at most once, so this is O(1) per heading (amortised).
+            while parent_stack and parent_stack[-1][0] >= heading_level:
+                parent_stack.pop()
+
+            # Whatever is left on top is the most immediate parent in the hierarchy
+            parent_node_id = None
+            parent_index = -1
+            heading_path = section_heading_id
+            if parent_stack:
+                _, parent_node_id, parent_index, parent_path = parent_stack[-1]
+                if parent_path:
+                    heading_path = f"{parent_path}/{section_heading_id}"
+
+            node_id = make_node_id(heading_path) # Stable ID for this section's node
+
+            # Push this node: it becomes a potential parent for subsequent lower-level headings
+            parent_stack.append((heading_level, node_id, record_index, heading_path))
+
+            # Content starts right after the heading line; the end is filled in when the section closes
+            open_section = SectionRecord(doc_id, match.end(), match.end(), section_heading_id, heading_level,
+                                         parent_index, section_title_line, node_id, parent_node_id)
+            heading_count += 1
+
+        instrumentation.count("headings_matched", heading_count)
+
+        if open_section is not None:
+            # The last section runs to the end of the document
+            open_section.set_span(text, open_section.start, len(text))
+            yield open_section
+
+        # Handle documents with no headings (treat entire document as one node)
+        else:
+            full_document = SectionRecord(doc_id, 0, len(text), None, 0, -1,
+                                          "Full Document Content", make_node_id("#document"))
+            if full_document.set_span(text, 0, len(text)):
+                yield full_document
+
+    def _record_to_node(self, record: "SectionRecord", text: str, page_label) -> TextNode:
+        node_text = record.get_text(text) # The actual text content of the section
+
+        if record.heading_id is None:
+            # Preamble / full-document node
+            metadata = {
+                "section": record.section,
+                "page_label": page_label,
+                "node_id": record.node_id,
+                "heading_level": 0
+            }
+        else:
+            metadata = {
+                "section": record.section, # Store the full heading line for display
+                "heading_id": record.heading_id, # e.g., "1.1", "4.1.1"
+                "heading_level": record.level, # e.g., 1, 2, 3
+                "page_label": page_label,
+                "node_id": record.node_id # Store its own unique ID
+            }
+            if record.parent_node_id:
+                metadata["parent_node_id"] = record.parent_node_id # Link to its parent node's ID
+
+        if self.include_text_in_metadata:
+            metadata["full_section_content"] = node_text # Optional: full content in metadata
+
+        # Create the TextNode with the collected metadata and unique ID
+        return TextNode(text=node_text, metadata=metadata, id_=record.node_id)
+
+
+_NON_WHITESPACE = re.compile(r"\S")
+
+class SectionRecord:
+    """
+    Compact, offset-based description of one section.
+    The section text is not stored; it is sliced out of the source document's text
+    (text[start:end]) only when get_text() is called.
+    """
+    __slots__ = ("doc_id", "start", "end", "heading_id", "level", "parent_index",
+                 "section", "node_id", "parent_node_id")
+
+    def __init__(self, doc_id, start, end, heading_id, level, parent_index,
+                 section, node_id, parent_node_id=None):
+        self.doc_id = doc_id
+        self.start = start
+        self.end = end
+        self.heading_id = heading_id # None for preamble / full-document records
+        self.level = level
+        self.parent_index = parent_index # -1 when there is no parent
+        self.section = section
+        self.node_id = node_id
+        self.parent_node_id = parent_node_id
+
+    def set_span(self, text, start, end):
+        """Sets start/end to the whitespace-stripped bounds of text[start:end]; returns False if it is empty."""
+        first = _NON_WHITESPACE.search(text, start, end)
+        if first is None:
+            self.start = self.end = start
+            return False
+        end -= 1
+        while text[end].isspace():
+            end -= 1
+        self.start = first.start()
+        self.end = end + 1
+        return True
+
+    def get_text(self, doc_text):
+        return doc_text[self.start:self.end]
+
+    def to_row(self):
+        return [self.doc_id, self.start, self.end, self.heading_id, self.level, self.parent_index,
+                self.section, self.node_id, self.parent_node_id]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+
+def write_section_records(out_file_name, documents, records):
+    """
+    Writes the compact form of a parsed file: each document's text once, plus one
+    offset row per section (see SectionRecord.to_row for the column order).
+    """
+    import json
+    data = {
+        "documents": [
+            {"doc_id": doc.doc_id, "page_label": doc.metadata.get("page_label", "N/A"), "text": doc.text}
+            for doc in documents
+        ],
+        "columns": list(SectionRecord.__slots__),
+        "sections": [record.to_row() for record in records],
+    }
+    with open(out_file_name, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+def load_section_records(file_name):
+    """Loads a file written by write_section_records; returns ({doc_id: document_dict}, [SectionRecord])."""
+    import json
+    with open(file_name, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    documents = {doc["doc_id"]: doc for doc in data["documents"]}
+    records = [SectionRecord.from_row(row) for row in data["sections"]]
+    return documents, records
+
+
+def get_dummy_pdf_content():
+
+    # 1. (Optional) Create a dummy PDF content for demonstration
+    dummy_pdf_content = """
+    Guideline for good clinical practice E6(R2)
+    EMA/CHMP/ICH/135/1995 Page 7/68
+
+    This is some introductory text before the first formal section.
+
+    1.  Glossary
+        1.1     Adverse Drug Reaction (ADR)
+    In the pre-approval clinical experience with a new medicinal product or its new usages, particularly as
+    the therapeutic dose(s) may not be established: all noxious and unintended responses to a medicinal
+    product related to any dose should be considered adverse drug reactions. The phrase responses to a
+    medicinal product means that a causal relationship between a medicinal product and an adverse event
+    is at least a reasonable possibility, i.e. the relationship cannot be ruled out.
+    Regarding marketed medicinal products: a response to a drug which is noxious and unintended and
+    which occurs at doses normally used in man for prophylaxis, diagnosis, or therapy of diseases or for
+    modification of physiological function (see the ICH Guideline for Clinical Safety Data Management:
+    Definitions and Standards for Expedited Reporting).
+        1.2. Adverse Event (AE)
+    Any untoward medical occurrence in a patient or clinical investigation subject administered a
+    pharmaceutical product and which does not necessarily have a causal relationship with this treatment.
+    An adverse event (AE) can therefore be any unfavourable and unintended sign (including an abnormal
+    laboratory finding), symptom, or disease temporally associated with the use of a medicinal
+    (investigational) product, whether or not related to the medicinal (investigational) product (see the
+    ICH Guideline for Clinical Safety Data Management: Definitions and Standards for Expedited
+    Reporting).
+    1.3. Amendment (to the protocol)
+    See Protocol Amendment.
+        4. Research Plan
+        4.1     Study Aims
+        Primary Aim: Investigate
+        4.1.1   Sub-Aim 1: First detailed point
+        4.1.2   Sub-Aim 2: Second detailed point
+        4.2     Methods
+        This section discusses the methods used in the study.
+    1.4. Applicable regulatory requirement(s)
+    Any law(s) and regulation(s) addressing the conduct of clinical trials of investigational products.
+    """
+    return dummy_pdf_content
+
+def extract_section_from_data(file_name, section_parser=None, verbose=True, compact_output=False, content_hash=None,
+                              output_format="json", compression=None, lookup_index=False, page_workers=None,
+                              read_from_file=True):
+    """
+    Parses one file into sections and writes the JSON outputs; returns the list of files written.
+    output_format="ndjson" streams nodes straight to parsed_nodes_*.ndjson / extracted_nodes_*.ndjson
+    (optionally compressed: compression="gzip" or "zstd") instead of building indented JSON lists.
+    lookup_index=True also writes a heading-id / page-range lookup index next to the
+    extracted_nodes file (see lookup_index.py).
+    page_workers=N parses the pages of this one file in N processes and stitches them into a
+    document-wide hierarchy (parents and section text carry across page breaks, see page_parallel.py).
+    The node IDs then differ from a per-page parse of the same file (see SectionNodeParser._document_key).
+    Output names follow the input file name; read_from_file=False names them *_dummy_data (for the
+    documents of get_dummy_pdf_content).
+    """
+    if page_workers and compact_output:
+        raise ValueError("compact_output keeps per-page offsets and cannot be combined with page_workers")
+    # PDFs are loaded by the page workers themselves, a batch of pages each
+    load_in_workers = bool(page_workers) and file_name.lower().endswith(".pdf")
+
+    documents = []
+    if not load_in_workers:
+        reader = SimpleDirectoryReader(input_files=[file_name])
+        with instrumentation.span("pdf.load", file=file_name) as span:
+            documents = reader.load_data()
+            span.set(pages=len(documents))
+        instrumentation.count("pages", len(documents))
+        instrumentation.count("bytes", os.path.getsize(file_name))
+
+    # The source file's hash seeds the deterministic node IDs (see SectionNodeParser._document_key)
+    if content_hash is None:
+        content_hash = file_content_hash(file_name)
+    for doc in documents:
+        doc.metadata["content_hash"] = content_hash
+
+    # 3. Initialize your custom SectionNodeParser (unless the caller already has one, e.g. a batch worker)
+    if section_parser is None:
+        section_parser = SectionNodeParser(
+            # The pattern is now handled by the Field default, but you can explicitly pass it here too:
+            # section_heading_pattern=r"^\s*(\d+(\.\d+)*)\s{1,}([^\n]*)$"
+        )
+
+    # Page-parallel parsing hands back a node iterator; otherwise the nodes are parsed below
+    nodes = None
+    if page_workers:
+        from . import page_parallel
+        if load_in_workers:
+            nodes = page_parallel.parse_pdf_pages(file_name, section_parser, max_workers=page_workers,
+                                                  content_hash=content_hash)
+        else:
+            nodes = page_parallel.parse_document_pages(documents, section_parser, max_workers=page_workers)
+
+    if compact_output:
+        # Offset-based records instead of TextNodes: section text is kept once (in the documents)
+        # and only sliced out when the extracted view below is written.
+        return _with_lookup_sidecar(extract_compact_sections(file_name, documents, section_parser, read_from_file),
+                                    lookup_index)
+
+    if output_format == "ndjson":
+        return _with_lookup_sidecar(
+            extract_sections_streaming(file_name, documents, section_parser, compression, verbose, nodes=nodes,
+                                       read_from_file=read_from_file),
+            lookup_index)
+
+    # 4. Parse the nodes using your custom parser
+    if nodes is None:
+        nodes = section_parser.get_nodes_from_documents(documents)
+    else:
+        nodes = list(nodes)
+    
+    if verbose:
+        # Print the entire node information
+        print("all nodes: ", nodes)
+
+        # --- Print nodes to console to inspect hierarchical metadata ---
+        print("--- Extracted Sections with Hierarchy ---")
+        for i, node in enumerate(nodes):
+            print(f"--- Node {i+1} ---")
+            print(f"  Section Title: {node.metadata.get('section')}")
+            print(f"  Heading ID: {node.metadata.get('heading_id')}")
+            print(f"  Heading Level: {node.metadata.get('heading_level')}")
+            # print(f"  Node ID: {node.metadata.get('node_id')}")
+            # print(f"  Parent Node ID: {node.metadata.get('parent_node_id')}")
+            # print(f"  Content (first 100 chars): {node.text[:100]}...")
+            print("-" * 50)
+
+    nodes_as_dicts = [node.dict() for node in nodes]
+
+    # save the nodes to a JSON file
+    import json
+    # Extract the input file name without .pdf extension
+    input_file_name = _output_name(file_name, read_from_file)
+    out_file_name = f"parsed_nodes_{input_file_name}.json"
+    with instrumentation.span("json.write", file=out_file_name), open(out_file_name, "w", encoding="utf-8") as f:
+        json.dump(nodes_as_dicts, f, indent=2, ensure_ascii=False)
+        
+    # --- Extract only particular portions from the full node and convert to JSON format ---
+    extracted_sections_json = []
+    for node in nodes:
+        section_data = {
+            "section_title": node.metadata.get("section", "N/A"),
+            "page_label": node.metadata.get("page_label", "N/A"),
+            "heading_level": node.metadata.get("heading_level", 0),
+            "heading_id": node.metadata.get("heading_id", ""),
+            "parent_node_id": node.metadata.get("parent_node_id", None),
+            "node_id": node.metadata.get("node_id", str(uuid.uuid4())),
+            "content": node.text,
+            # You can add other metadata fields if needed
+            # "id": node.id_
+        }
+        if "page_end" in node.metadata:
+            # Page-parallel parsing: the section runs on to a later page
+            section_data["page_end"] = node.metadata["page_end"]
+        extracted_sections_json.append(section_data)
+    
+    # Save the extracted nodes to a JSON file
+    extract_json_filename = f"extracted_nodes_{input_file_name}.json"
+    with instrumentation.span("json.write", file=extract_json_filename), \
+            open(extract_json_filename, "w", encoding="utf-8") as f:
+        json.dump(extracted_sections_json, f, indent=2, ensure_ascii=False)   
+    
+    return _with_lookup_sidecar([out_file_name, extract_json_filename], lookup_index)
+
+def _output_name(file_name, read_from_file=True):
+    return os.path.splitext(file_name)[0] if read_from_file else "dummy_data"
+
+def _with_lookup_sidecar(outputs, lookup_index):
+    # outputs[1] is always the extracted_nodes file
+    if lookup_index:
+        sidecar = section_lookup.sidecar_path(outputs[1])
+        section_lookup.build_index([outputs[1]], sidecar)
+        outputs = outputs + [sidecar]
+    return outputs
+
+def extract_compact_sections(file_name, documents, section_parser, read_from_file=True):
+    """
+    Compact variant of extract_section_from_data: writes section_records_<name>.json
+    (see write_section_records) in place of parsed_nodes_<name>.json, and the usual
+    extracted_nodes_<name>.json built straight from the records.
+    """
+    import json
+    with instrumentation.span("parse_section_records", documents=len(documents)):
+        records = list(section_parser.iter_section_records(documents))
+    instrumentation.count("nodes_emitted", len(records))
+    documents_by_id = {doc.doc_id: doc for doc in documents}
+
+    input_file_name = _output_name(file_name, read_from_file)
+    records_file_name = f"section_records_{input_file_name}.json"
+    with instrumentation.span("json.write", file=records_file_name):
+        write_section_records(records_file_name, documents, records)
+
+    extracted_sections_json = []
+    for record in records:
+        doc = documents_by_id[record.doc_id]
+        extracted_sections_json.append({
+            "section_title": record.section,
+            "page_label": doc.metadata.get("page_label", "N/A"),
+            "heading_level": record.level,
+            "heading_id": record.heading_id or "",
+            "parent_node_id": record.parent_node_id,
+            "node_id": record.node_id,
+            "content": record.get_text(doc.text),
+        })
+
+    extract_json_filename = f"extracted_nodes_{input_file_name}.json"
+    with instrumentation.span("json.write", file=extract_json_filename), \
+            open(extract_json_filename, "w", encoding="utf-8") as f:
+        json.dump(extracted_sections_json, f, indent=2, ensure_ascii=False)
+
+    return [records_file_name, extract_json_filename]
+
+def extract_sections_streaming(file_name, documents, section_parser, compression=None, verbose=False, nodes=None,
+                               read_from_file=True):
+    """
+    Streaming variant of extract_section_from_data: each node is serialized once, as the parser
+    yields it, into both the full and the extracted NDJSON files (see node_writer.NodeNdjsonWriter).
+    nodes: an already running node iterator (e.g. from page_parallel) to write instead of parsing documents.
+    """
+    if nodes is None:
+        nodes = section_parser.iter_nodes(documents)
+    input_file_name = _output_name(file_name, read_from_file)
+    # Parsing and writing are interleaved here, so they share one span
+    with instrumentation.span("parse_and_write_ndjson", file=file_name) as span, \
+            NodeNdjsonWriter(f"parsed_nodes_{input_file_name}.ndjson", f"extracted_nodes_{input_file_name}.ndjson",
+                             compression=compression) as writer:
+        for node in nodes:
+            writer.write(node)
+            if verbose:
+                print(f"--- Node {writer.count} ---")
+                print(f"  Section Title: {node.metadata.get('section')}")
+                print(f"  Heading ID: {node.metadata.get('heading_id')}")
+                print(f"  Heading Level: {node.metadata.get('heading_level')}")
+                print("-" * 50)
+        span.set(nodes=writer.count)
+    instrumentation.count("nodes_emitted", writer.count)
+    return writer.paths
+
+
+# --- Batch ingestion: fan PDF files out to a process pool ---
+# Each worker process builds its SectionNodeParser once (in the pool initializer)
+# and reuses it for every file it is handed.
+_worker_section_parser = None
+
+def _init_extract_worker(section_heading_pattern=None, heading_grammar=None, trace=False):
+    global _worker_section_parser
+    if trace:
+        # A forked worker starts with a copy of the parent's spans; only send back its own
+        instrumentation.reset()
+        instrumentation.enable()
+    _worker_section_parser = SectionNodeParser(section_heading_pattern=section_heading_pattern,
+                                               heading_grammar=heading_grammar)
+
+def _extract_section_in_worker(file_name, compact_output=False, content_hash=None, output_format="json",
+                               compression=None, lookup_index=False):
+    """
+    Runs extract_section_from_data in a worker; returns (file_name, error or None, output files,
+    the worker's instrumentation for this file or None).
+    """
+    try:
+        outputs = extract_section_from_data(file_name, section_parser=_worker_section_parser, verbose=False,
+                                            compact_output=compact_output, content_hash=content_hash,
+                                            output_format=output_format, compression=compression,
+                                            lookup_index=lookup_index)
+        return file_name, None, outputs, instrumentation.drain()
+    except Exception:
+        # Send the traceback back as text so one bad PDF doesn't take down the whole batch
+        return file_name, traceback.format_exc(), [], instrumentation.drain()
+
+def extract_sections_from_files(file_names, max_workers=None, section_heading_pattern=None, compact_output=False,
+                                heading_grammar=None, content_hashes=None, on_file_done=None,
+                                output_format="json", compression=None, lookup_index=False, section_store=None):
+    """
+    Runs extract_section_from_data over many files in a process pool.
+    Writes the same parsed_nodes_*/extracted_nodes_* files as the serial loop.
+    content_hashes: optional {file_name: hash}, to avoid re-hashing files in the workers.
+    on_file_done: optional callback(file_name, output_files), called for each file that succeeded.
+    section_store: optional directory of a section_store.SectionStore; each extracted_nodes file is
+    added to it (by this process, as files finish), so repeated section bodies are stored once.
+    Returns a dict of {file_name: traceback_text} for the files that failed.
+    """
+    content_hashes = content_hashes or {}
+    store = SectionStore(section_store) if section_store is not None else None
+    file_names = list(file_names)
+    total = len(file_names)
+    failures = {}
+    if total == 0:
+        return failures
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, total))
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_extract_worker,
+        initargs=(section_heading_pattern, heading_grammar, instrumentation.is_enabled()),
+    ) as executor:
+        futures = [
+            executor.submit(_extract_section_in_worker, file_name, compact_output, content_hashes.get(file_name),
+                            output_format, compression, lookup_index)
+            for file_name in file_names
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            file_name, error, outputs, trace = future.result()
+            instrumentation.merge(trace)
+            if error is None:
+                print(f"[{done}/{total}] Done: {file_name}")
+                if store is not None:
+                    store.add_file(outputs[1])
+                if on_file_done is not None:
+                    on_file_done(file_name, outputs)
+            else:
+                failures[file_name] = error
+                print(f"[{done}/{total}] FAILED: {file_name}\n{error}")
+
+    print(f"Batch finished: {total - len(failures)} succeeded, {len(failures)} failed (workers: {max_workers})")
+    return failures
+
+def extract_sections_incremental(file_names, manifest_path="ingest_manifest.json", max_workers=None,
+                                 section_heading_pattern=None, compact_output=False, heading_grammar=None,
+                                 output_format="json", compression=None, lookup_index=False, section_store=None,
+                                 page_workers=None):
+    """
+    Like extract_sections_from_files, but skips files whose content hash and parser configuration
+    match the manifest (and whose outputs still exist). Only new or changed files are parsed.
+    page_workers (only with max_workers=1) parses each file page-parallel, see extract_section_from_data.
+    Returns a dict of {file_name: traceback_text} for the files that failed.
+    """
+    if page_workers and max_workers != 1:
+        raise ValueError("page_workers parses one file at a time and needs max_workers=1")
+    section_parser = SectionNodeParser(section_heading_pattern=section_heading_pattern,
+                                       heading_grammar=heading_grammar)
+    config_hash = hashlib.sha256(
+        f"{section_parser.config_fingerprint()}|compact={compact_output}|{output_format}|{compression}"
+        f"|lookup={lookup_index}|pages={bool(page_workers)}".encode("utf-8")
+    ).hexdigest()
+
+    manifest = IngestManifest(manifest_path)
+    content_hashes = {}
+    for file_name in file_names:
+        content_hash = manifest.content_hash(file_name)
+        if not manifest.is_up_to_date(file_name, content_hash, config_hash):
+            content_hashes[file_name] = content_hash
+
+    skipped = len(file_names) - len(content_hashes)
+    instrumentation.count("manifest_cache_hits", skipped)
+    print(f"Incremental run: {len(content_hashes)} new/changed file(s), {skipped} unchanged (skipped)")
+
+    def on_file_done(file_name, outputs):
+        # Save after every file, so an interrupted run keeps the work already done
+        manifest.record(file_name, content_hashes[file_name], config_hash, outputs)
+        manifest.save()
+
+    if max_workers == 1:
+        failures = {}
+        store = SectionStore(section_store) if section_store is not None else None
+        for file_name, content_hash in content_hashes.items():
+            try:
+                outputs = extract_section_from_data(file_name, section_parser=section_parser, verbose=False,
+                                                    compact_output=compact_output, content_hash=content_hash,
+                                                    output_format=output_format, compression=compression,
+                                                    lookup_index=lookup_index, page_workers=page_workers)
+                if store is not None:
+                    store.add_file(outputs[1])
+                on_file_done(file_name, outputs)
+            except Exception:
+                failures[file_name] = traceback.format_exc()
+                print(f"FAILED: {file_name}\n{failures[file_name]}")
+        return failures
+
+    return extract_sections_from_files(
+        list(content_hashes), max_workers=max_workers, section_heading_pattern=section_heading_pattern,
+        compact_output=compact_output, heading_grammar=heading_grammar,
+        content_hashes=content_hashes, on_file_done=on_file_done,
+        output_format=output_format, compression=compression, lookup_index=lookup_index,
+        section_store=section_store,
+    )
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Split PDFs into hierarchical section nodes and write the JSON outputs.")
+    # Default: all the pdf files in the current directory
+    arg_parser.add_argument("files", nargs="*", help="PDF files to parse (default: *.pdf)")
+    # Number of worker processes for the batch run; 1 processes files one at a time
+    # (default: the CPU count, or 1 with --page-workers)
+    arg_parser.add_argument("--workers", type=int)
+    # Write offset-based section_records_*.json instead of parsed_nodes_*.json (section text stored once)
+    arg_parser.add_argument("--compact", action="store_true")
+    # "json" (indented lists) or "ndjson" (streamed, one node per line); ndjson can be compressed
+    arg_parser.add_argument("--output-format", choices=("json", "ndjson"), default="json")
+    arg_parser.add_argument("--compression", choices=("gzip", "zstd"))
+    # By default PDFs unchanged since the last run (tracked in ingest_manifest.json) are skipped
+    arg_parser.add_argument("--full", action="store_true", help="re-parse every file, ignoring the manifest")
+    # Also write extracted_nodes_*.lookup/ (heading-id and page-range lookups, see lookup_index.py)
+    arg_parser.add_argument("--lookup-index", action="store_true")
+    # Directory of a shared section store (see section_store.py): repeated section bodies are kept once
+    arg_parser.add_argument("--section-store")
+    # Parse the pages of each (large) PDF in this many processes, with a document-wide hierarchy
+    # (see page_parallel.py); files are then processed one at a time
+    arg_parser.add_argument("--page-workers", type=int)
+    args = arg_parser.parse_args(argv)
+    if args.page_workers:
+        if args.workers not in (None, 1):
+            arg_parser.error("--page-workers processes one file at a time; it cannot be combined with --workers > 1")
+        if args.compact:
+            arg_parser.error("--page-workers cannot be combined with --compact")
+        args.workers = 1
+    elif args.workers is None:
+        args.workers = os.cpu_count() or 1
+
+    pdf_files = args.files or glob.glob("*.pdf")
+    options = dict(compact_output=args.compact, output_format=args.output_format,
+                   compression=args.compression, lookup_index=args.lookup_index)
+
+    if not args.full:
+        failures = extract_sections_incremental(pdf_files, max_workers=args.workers,
+                                                section_store=args.section_store, page_workers=args.page_workers,
+                                                **options)
+    elif args.workers > 1:
+        failures = extract_sections_from_files(pdf_files, max_workers=args.workers,
+                                               section_store=args.section_store, **options)
+    else:
+        failures = {}
+        store = SectionStore(args.section_store) if args.section_store is not None else None
+        for done, file_name in enumerate(pdf_files, start=1):
+            # Same reporting as the process pool: a bad PDF is reported and the batch goes on
+            try:
+                outputs = extract_section_from_data(file_name, page_workers=args.page_workers, **options)
+                if store is not None:
+                    store.add_file(outputs[1])
+                print(f"[{done}/{len(pdf_files)}] Done: {file_name}")
+            except Exception:
+                failures[file_name] = traceback.format_exc()
+                print(f"[{done}/{len(pdf_files)}] FAILED: {file_name}\n{failures[file_name]}")
+        print(f"Batch finished: {len(pdf_files) - len(failures)} succeeded, {len(failures)} failed (workers: 1)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
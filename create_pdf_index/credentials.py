@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+LlamaCloud API key lookup.
+
+The key comes from the LLAMA_CLOUD_API_KEY environment variable; a .env file is loaded the
+first time the key is asked for (not at import), and only when python-dotenv is installed.
+"""
+
+import os
+
+_dotenv_loaded = False
+
+
+def load_dotenv():
+    """Loads .env into os.environ once; a no-op without python-dotenv."""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        _dotenv_loaded = True
+        try:
+            import dotenv
+        except ImportError:
+            return
+        dotenv.load_dotenv()
+
+
+def llama_cloud_api_key():
+    """The LlamaCloud API key, or None when it is not set."""
+    load_dotenv()
+    return os.getenv("LLAMA_CLOUD_API_KEY")
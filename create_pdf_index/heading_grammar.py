@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable heading grammar for SectionNodeParser.
+
+Several heading styles (numbered "1.1.", "§ 50.3", "(a)", "(1)", "Chapter N:") are compiled
+into ONE alternation regex, with one named group per style. A single finditer pass gives the
+heading line, its id and its level - no second regex per heading.
+"""
+
+import re
+
+
+class dotted_level:
+    """Level from the number of parts in a dotted id: "4" -> 1, "4.1" -> 2, "4.1.1" -> 3 (plus offset)."""
+    # A class rather than a closure so grammars can be pickled into worker processes
+    __slots__ = ("offset",)
+
+    def __init__(self, offset=0):
+        self.offset = offset
+
+    def __call__(self, heading_id):
+        return heading_id.count(".") + 1 + self.offset
+
+
+# Used when a style has no (?P<id>...) group: same id extraction the parser always used
+_FALLBACK_ID_PATTERN = re.compile(r"(\d+(?:\.\d+)*)")
+
+
+class HeadingStyle:
+    """
+    One kind of heading.
+    pattern: regex for the whole heading line; may contain a (?P<id>...) group for the heading id.
+    level: fixed int level, or a callable taking the heading id and returning the level.
+    """
+    __slots__ = ("name", "pattern", "level")
+
+    def __init__(self, name, pattern, level=None):
+        self.name = name
+        self.pattern = pattern
+        self.level = dotted_level() if level is None else level
+
+    def __repr__(self):
+        return f"HeadingStyle({self.name!r}, {self.pattern!r})"
+
+
+# The parser's original default pattern: "1.", "1.1.", "4.1.1." followed by the title
+NUMBERED = HeadingStyle("numbered", r"^\s*(?P<id>\d+(?:\.\d+)*)\.\s{1,}([^\n]*)$")
+# Regulatory (CFR) styles, in the order used by the LlamaParse prompt in read_pdf_with_llama_parse.py
+SECTION_SIGN = HeadingStyle("section_sign", r"^\s*(?:#+\s*)?§\s*(?P<id>\d+(?:\.\d+)*)[^\n]*$", level=1)
+LETTERED = HeadingStyle("lettered", r"^\s*\((?P<id>[a-z])\)\s+[^\n]*$", level=2)
+PAREN_NUMBERED = HeadingStyle("paren_numbered", r"^\s*\((?P<id>[0-9]+)\)\s+[^\n]*$", level=3)
+CHAPTER = HeadingStyle("chapter", r"^\s*Chapter\s+(?P<id>\d+):[^\n]*$", level=1)
+
+DEFAULT_HEADING_STYLES = (NUMBERED,)
+CFR_HEADING_STYLES = (SECTION_SIGN, LETTERED, PAREN_NUMBERED)
+
+
+class HeadingGrammar:
+    """Compiles a list of HeadingStyles into a single MULTILINE alternation regex."""
+
+    def __init__(self, styles=DEFAULT_HEADING_STYLES):
+        self.styles = tuple(styles)
+        if not self.styles:
+            raise ValueError("HeadingGrammar needs at least one HeadingStyle")
+
+        alternatives = []
+        # group name -> (style, name of its id group or None)
+        self._styles_by_group = {}
+        for i, style in enumerate(self.styles):
+            group = f"s{i}"
+            id_group = None
+            pattern = style.pattern
+            if "(?P<id>" in pattern:
+                # Group names must be unique across the alternation
+                id_group = f"{group}_id"
+                pattern = pattern.replace("(?P<id>", f"(?P<{id_group}>")
+            alternatives.append(f"(?P<{group}>{pattern})")
+            self._styles_by_group[group] = (style, id_group)
+
+        self.pattern = "|".join(alternatives)
+        self.compiled = re.compile(self.pattern, re.MULTILINE)
+
+    @classmethod
+    def from_pattern(cls, section_heading_pattern):
+        """Grammar for a single user-supplied heading regex (ids found the way the parser always did)."""
+        return cls([HeadingStyle("custom", section_heading_pattern)])
+
+    def iter_headings(self, text):
+        """Yields (match, heading_line, heading_id, heading_level) for each heading, in one pass."""
+        styles_by_group = self._styles_by_group
+        for match in self.compiled.finditer(text):
+            # The style's wrapper group is the outermost one, so it is always the last group closed
+            style, id_group = styles_by_group[match.lastgroup]
+            heading_line = match.group(0).strip()
+            if id_group is not None:
+                heading_id = match.group(id_group)
+            else:
+                id_match = _FALLBACK_ID_PATTERN.search(heading_line)
+                if id_match is None:
+                    # No id: level 0, like the parser always did for such headings
+                    yield match, heading_line, "", 0
+                    continue
+                heading_id = id_match.group(1)
+            level = style.level(heading_id) if callable(style.level) else style.level
+            yield match, heading_line, heading_id, level
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time budget check for the package modules.
+
+Each module is imported in a fresh interpreter (best of --repeat runs), inside an empty
+temporary directory, and the check fails if
+  - the import takes longer than the module's budget (BUDGETS, scaled by --scale for slow machines),
+  - a module outside HEAVY_MODULES loads one of the heavy packages (llama_index, llama_parse,
+    dotenv, requests, aiohttp): these must only be imported by the functions that use them,
+  - the import has a side effect: printing, or writing files in the working directory.
+The CLIs import their module before parsing arguments, so these numbers are also their start-up
+overhead (a cached pipeline run or a daemon client call never pays for llama_index).
+
+Run: pdf-index-import-budget [--repeat 3] [--scale 1.0] [modules ...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Packages that cost 10s-1000s of milliseconds to import (llama_index.core alone is ~1.5 s)
+HEAVY_PACKAGES = ("llama_index", "llama_parse", "dotenv", "requests", "aiohttp")
+
+# Modules whose job is parsing with llama_index; they import it at the top on purpose
+HEAVY_MODULES = {"create_index_from_pdf": 5000, "page_parallel": 5000}
+
+# Milliseconds; numpy (~70 ms) is allowed, everything else here should be close to the stdlib cost
+DEFAULT_BUDGET = 150
+BUDGETS = {
+    "bm25_index": 300,
+    "corpus_index": 300,
+    "lookup_index": 300,
+    "section_diff": 300,
+    "section_store": 300,
+    "vector_index": 300,
+    **HEAVY_MODULES,
+}
+
+_PROBE = """
+import json, os, sys, time
+tic = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - tic
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+sys.stderr.write(json.dumps({{"seconds": seconds, "heavy": heavy}}) + "\\n")
+"""
+
+
+def package_modules():
+    """Names of the modules of this package (not including the package itself)."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return sorted(name[:-3] for name in os.listdir(directory)
+                  if name.endswith(".py") and name != "__init__.py")
+
+
+def measure(module, repeat=3):
+    """
+    Imports __package__.module in `repeat` fresh interpreters.
+    Returns {"seconds": best time, "heavy": heavy packages loaded, "side_effects": [...]}.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+    # A trace file at exit would be a side effect of the environment, not of the import
+    env.pop("PDF_INDEX_TRACE", None)
+    code = _PROBE.format(module=f"{__package__}.{module}", heavy=HEAVY_PACKAGES)
+
+    best = None
+    side_effects = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cwd:
+            result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=cwd, env=env,
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+            probe = json.loads(result.stderr.strip().splitlines()[-1])
+            if result.stdout:
+                side_effects.append(f"printed {result.stdout[:60]!r}")
+            written = os.listdir(cwd)
+            if written:
+                side_effects.append(f"wrote {sorted(written)}")
+        if best is None or probe["seconds"] < best["seconds"]:
+            best = probe
+    best["side_effects"] = sorted(set(side_effects))
+    return best
+
+
+def check(modules=None, repeat=3, scale=1.0):
+    """Measures the modules; returns (results, violations) where results is {module: measurement}."""
+    results = {}
+    violations = []
+    for module in modules or package_modules():
+        result = results[module] = measure(module, repeat)
+        budget = BUDGETS.get(module, DEFAULT_BUDGET) * scale
+        if result["seconds"] * 1000 > budget:
+            violations.append(f"{module}: import took {result['seconds'] * 1000:.0f} ms (budget {budget:.0f} ms)")
+        if module not in HEAVY_MODULES and result["heavy"]:
+            violations.append(f"{module}: imports {', '.join(result['heavy'])} at import time")
+        for side_effect in result["side_effects"]:
+            violations.append(f"{module}: {side_effect} at import time")
+    return results, violations
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Check the import time and import-time side effects of the package modules.")
+    arg_parser.add_argument("modules", nargs="*", help="module names (default: all the package modules)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget by this factor")
+    args = arg_parser.parse_args(argv)
+
+    results, violations = check(args.modules, args.repeat, args.scale)
+    for module, result in results.items():
+        budget = BUDGETS.get(module, DEFAULT_BUDGET) * args.scale
+        heavy = f"  [{', '.join(result['heavy'])}]" if result["heavy"] else ""
+        print(f"{module:<34} {result['seconds'] * 1000:8.1f} ms / {budget:6.0f} ms{heavy}")
+    for violation in violations:
+        print(f"FAIL {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""
+Long-lived ingest / lookup daemon on a local Unix socket, plus its small client.
+
+Running a script per request pays the whole cold start every time: importing llama_index,
+building the SectionNodeParser (and compiling its heading grammar), opening indexes, re-reading
+JSON outputs. The daemon does all of that once and keeps it resident:
+  - a process pool of warm parse workers, each holding its SectionNodeParser (the same worker
+    setup as create_index_from_pdf.extract_sections_from_files);
+  - the corpus index (corpus_index.py), an optional vector index and section store;
+  - a cache of tables of contents, keyed by file and modification time.
+A request then costs only its own work. The daemon is the single writer of the corpus index,
+vector index and section store: ingest jobs update them one at a time, while lookups go on in
+parallel. In the vector index a document's sections are named by the extracted_nodes file name
+(as pdf-index-vectors build names them); an ingest replaces them through
+vector_index.update_index, so only new section bodies are embedded, and the updated index is
+swapped in once the vector searches already running on the old one are done.
+
+Protocol: one JSON object per line in each direction, any number of requests per connection.
+    request:  {"op": "search", "query": "informed consent", "k": 5}
+    reply:    {"ok": true, "result": ...}  or  {"ok": false, "error": "..."}
+
+    with DaemonClient() as client:
+        client.ingest(["protocol.pdf"])
+        client.search("adverse drug reaction", k=5)
+
+Outputs of an ingest job are written next to each input file. This module only imports the
+standard library until the server starts, so the client starts fast.
+
+Run: pdf-index-daemon serve [--socket PATH] [--corpus DIR] [--vectors DIR] [--section-store DIR] [--workers N]
+     pdf-index-daemon ingest file.pdf ... [--output-format ndjson] [--lookup-index]
+     pdf-index-daemon search "adverse drug reaction" [-k 10]
+     pdf-index-daemon similar "informed consent of trial subjects" [-k 10]
+     pdf-index-daemon heading <document> <heading_id>
+     pdf-index-daemon pages <document> <first> [<last>]
+     pdf-index-daemon toc extracted_nodes_x.json
+     pdf-index-daemon stats | ping | shutdown
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from . import instrumentation
+
+DEFAULT_SOCKET = os.environ.get("PDF_INDEX_SOCKET", os.path.join(tempfile.gettempdir(), "pdf-index-daemon.sock"))
+
+# Options of extract_section_from_data an ingest job may set
+INGEST_OPTIONS = ("compact_output", "output_format", "compression", "lookup_index")
+
+
+class DaemonError(RuntimeError):
+    """The daemon answered a request with an error."""
+
+
+def _json_default(value):
+    # numpy scalars and arrays from the indexes
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _ingest_in_worker(file_name, options):
+    """
+    Parses one file in a warm worker; outputs go next to the file. Returns the same 4-tuple as
+    create_index_from_pdf._extract_section_in_worker, with absolute output paths.
+    """
+    from . import create_index_from_pdf
+    directory, base_name = os.path.split(file_name)
+    # extract_section_from_data names its outputs after the (relative) input name, in the working
+    # directory; a worker runs one job at a time, so changing directory here is safe
+    os.chdir(directory or ".")
+    file_name, error, outputs, trace = create_index_from_pdf._extract_section_in_worker(base_name, **options)
+    return os.path.join(directory, base_name), error, [os.path.abspath(path) for path in outputs], trace
+
+
+def _warm_up(_):
+    return os.getpid()
+
+
+class IngestDaemon:
+    """The resident state and the request handlers (one method per op)."""
+
+    def __init__(self, corpus=None, vectors=None, section_store=None, workers=None, section_heading_pattern=None):
+        from concurrent.futures import ProcessPoolExecutor
+        from . import create_index_from_pdf
+
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=create_index_from_pdf._init_extract_worker,
+            initargs=(section_heading_pattern, None, instrumentation.is_enabled()),
+        )
+        # Start every worker now (imports, parser setup), before any request is waiting on it
+        list(self.executor.map(_warm_up, range(self.workers)))
+
+        self.corpus = None
+        if corpus is not None:
+            from .corpus_index import CorpusIndex
+            self.corpus = CorpusIndex(corpus)
+        self.vectors = None
+        self._vectors_directory = vectors
+        if vectors is not None:
+            from .vector_index import VectorIndex
+            self.vectors = VectorIndex(vectors)
+        self.section_store = None
+        if section_store is not None:
+            from .section_store import SectionStore
+            self.section_store = SectionStore(section_store)
+
+        # Ingest jobs update the corpus index, vector index and section store one at a time
+        self._write_lock = threading.Lock()
+        # Vector searches running on self.vectors; an update waits for them before swapping it
+        self._vector_searches = 0
+        self._vector_condition = threading.Condition()
+        self._toc_lock = threading.Lock()
+        # (path, mtime_ns, size) -> table of contents
+        self._tocs = {}
+        self._started = time.time()
+        self._requests = 0
+
+    def close(self):
+        self.executor.shutdown()
+        compaction = getattr(self.corpus, "_compaction", None)
+        if compaction is not None:
+            compaction.join()
+
+    def handle(self, request):
+        op = request.get("op")
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            raise ValueError(f"Unknown op {op!r}")
+        self._requests += 1
+        args = {key: value for key, value in request.items() if key != "op"}
+        with instrumentation.span(f"daemon.{op}"):
+            return handler(**args)
+
+    def _require(self, resource, option):
+        if resource is None:
+            raise ValueError(f"The daemon was started without {option}")
+        return resource
+
+    def _update_vectors(self, source, old_records, new_records):
+        """
+        Replaces the sections of `source` in the vector index by new_records (none: removes them).
+        Called with _write_lock held. The update is written next to the index, then swapped in.
+        """
+        from .bm25_index import swap_directory
+        from .section_diff import diff_sections
+        from .vector_index import VectorIndex, update_index
+        staging = f"{self._vectors_directory}.next"
+        update_index(self.vectors, source, diff_sections(old_records, new_records), directory=staging)
+        with self._vector_condition:
+            self._vector_condition.wait_for(lambda: self._vector_searches == 0)
+            swap_directory(staging, self._vectors_directory)
+            self.vectors = VectorIndex(self._vectors_directory, self.vectors.embedder)
+
+    # --- Ops ---
+
+    def op_ping(self):
+        return {"pid": os.getpid()}
+
+    def op_ingest(self, files, force=False, **options):
+        """Parses files in the warm workers, then adds them to the corpus / section store (if any)."""
+        unknown = set(options) - set(INGEST_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown ingest option(s): {sorted(unknown)}")
+        futures = [self.executor.submit(_ingest_in_worker, os.path.abspath(file_name), options)
+                   for file_name in files]
+        results = []
+        for future in futures:
+            file_name, error, outputs, trace = future.result()
+            instrumentation.merge(trace)
+            if error is not None:
+                results.append({"file": file_name, "error": error})
+                continue
+            result = {"file": file_name, "outputs": outputs}
+            # outputs[1] is always the extracted_nodes file
+            with self._write_lock:
+                if self.vectors is not None:
+                    result["vectors"] = self._ingest_vectors(outputs[1])
+                if self.section_store is not None:
+                    result["section_store"] = self.section_store.add_file(outputs[1], force=force)
+                if self.corpus is not None:
+                    result["indexed"] = bool(self.corpus.add_documents([outputs[1]], force=force))
+            results.append(result)
+        if self.corpus is not None:
+            with self._write_lock:
+                self.corpus.maybe_compact()
+        return results
+
+    def _ingest_vectors(self, file_name):
+        from .lookup_index import document_name
+        from .node_writer import iter_node_records
+        # The stored version (before this ingest updates the store) gives an exact section diff;
+        # without it every section counts as added, and bodies already indexed still keep their vectors
+        old_records = []
+        document = document_name(file_name)
+        if self.section_store is not None and document in self.section_store.documents:
+            old_records = self.section_store.records(document)
+        new_records = list(iter_node_records(file_name))
+        self._update_vectors(os.path.basename(file_name), old_records, new_records)
+        return len(new_records)
+
+    def op_remove(self, documents):
+        from .lookup_index import document_name
+        with self._write_lock:
+            removed = self._require(self.corpus, "--corpus").remove_documents(documents)
+            if self.section_store is not None:
+                self.section_store.remove_documents(documents)
+            if self.vectors is not None:
+                for source in self.vectors.sources():
+                    if document_name(source) in removed:
+                        self._update_vectors(source, [], [])
+        return removed
+
+    def op_search(self, query, k=10):
+        return self._require(self.corpus, "--corpus").search(query, k=k)
+
+    def op_heading(self, document, heading_id):
+        return self._require(self.corpus, "--corpus").heading(document, heading_id)
+
+    def op_pages(self, document, first, last=None):
+        return self._require(self.corpus, "--corpus").pages(document, first, last)
+
+    def op_similar(self, queries, k=10, **filters):
+        """Vector search; queries is a list, answered in one batch."""
+        with self._vector_condition:
+            vectors = self._require(self.vectors, "--vectors")
+            self._vector_searches += 1
+        try:
+            return vectors.search_batch(queries, k=k, **filters)
+        finally:
+            with self._vector_condition:
+                self._vector_searches -= 1
+                self._vector_condition.notify_all()
+
+    def op_toc(self, file_name):
+        """Table of contents of an extracted_nodes file, cached until the file changes."""
+        from .table_of_content_from_metadata import build_toc_from_file
+        stat = os.stat(file_name)
+        key = (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+        with self._toc_lock:
+            toc = self._tocs.get(key)
+        if toc is None:
+            toc = build_toc_from_file(file_name)
+            with self._toc_lock:
+                # Only the current version of each file is worth keeping
+                for old_key in [old_key for old_key in self._tocs if old_key[0] == key[0]]:
+                    del self._tocs[old_key]
+                self._tocs[key] = toc
+            instrumentation.count("toc_cache_misses")
+        else:
+            instrumentation.count("toc_cache_hits")
+        return toc
+
+    def op_stats(self):
+        stats = {"pid": os.getpid(), "uptime_s": round(time.time() - self._started, 3),
+                 "requests": self._requests, "workers": self.workers, "cached_tocs": len(self._tocs)}
+        if self.corpus is not None:
+            stats["corpus"] = self.corpus.stats()
+        if self.vectors is not None:
+            stats["vectors"] = {"sections": self.vectors.count, "dim": self.vectors.dim}
+        if self.section_store is not None:
+            stats["section_store"] = self.section_store.stats()
+        if instrumentation.is_enabled():
+            stats["instrumentation"] = instrumentation.summary()
+        return stats
+
+    def op_shutdown(self):
+        # Handled by the connection handler once the reply is sent
+        return True
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            op = None
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                reply = {"ok": True, "result": self.server.daemon.handle(request)}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+            self.wfile.write((json.dumps(reply, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if op == "shutdown" and reply["ok"]:
+                # shutdown() waits for serve_forever to return, so it can't run on this thread
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=DEFAULT_SOCKET, **daemon_options):
+    """Runs the daemon until a shutdown request (or Ctrl+C); daemon_options go to IngestDaemon."""
+    if os.path.exists(socket_path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)  # left behind by a daemon that did not shut down cleanly
+        else:
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+
+    daemon = IngestDaemon(**daemon_options)
+    server = _UnixServer(socket_path, _RequestHandler)
+    server.daemon = daemon
+    os.chmod(socket_path, 0o600)
+    print(f"Listening on {socket_path} (pid {os.getpid()}, {daemon.workers} worker(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        daemon.close()
+
+
+class DaemonClient:
+    """
+    Client side; one connection, reused for every request. Each method returns the op's result
+    or raises DaemonError.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._reader = self._socket.makefile("rb")
+
+    def request(self, op, **args):
+        self._socket.sendall((json.dumps({"op": op, **args}, ensure_ascii=False) + "\n").encode("utf-8"))
+        line = self._reader.readline()
+        if not line:
+            raise DaemonError("The daemon closed the connection")
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise DaemonError(reply["error"])
+        return reply["result"]
+
+    def ingest(self, files, force=False, **options):
+        # The daemon has its own working directory, so send absolute paths
+        return self.request("ingest", files=[os.path.abspath(file_name) for file_name in files], force=force, **options)
+
+    def remove(self, documents):
+        return self.request("remove", documents=list(documents))
+
+    def search(self, query, k=10):
+        return self.request("search", query=query, k=k)
+
+    def similar(self, queries, k=10, **filters):
+        return self.request("similar", queries=list(queries), k=k, **filters)
+
+    def heading(self, document, heading_id):
+        return self.request("heading", document=document, heading_id=heading_id)
+
+    def pages(self, document, first, last=None):
+        return self.request("pages", document=document, first=first, last=last)
+
+    def toc(self, file_name):
+        return self.request("toc", file_name=os.path.abspath(file_name))
+
+    def stats(self):
+        return self.request("stats")
+
+    def ping(self):
+        return self.request("ping")
+
+    def shutdown(self):
+        return self.request("shutdown")
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Warm ingest / lookup daemon on a Unix socket, and its client.")
+    arg_parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"socket path (default {DEFAULT_SOCKET})")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the daemon")
+    serve_parser.add_argument("--corpus", help="corpus index directory to keep open and update")
+    serve_parser.add_argument("--vectors", help="vector index directory to keep open and update")
+    serve_parser.add_argument("--section-store", help="section store directory to update")
+    serve_parser.add_argument("--workers", type=int, help="parse worker processes (default: CPU count)")
+    serve_parser.add_argument("--trace", action="store_true", help="record instrumentation (see stats)")
+    ingest_parser = commands.add_parser("ingest", help="parse files (and index them, with --corpus)")
+    ingest_parser.add_argument("files", nargs="+")
+    ingest_parser.add_argument("--force", action="store_true")
+    ingest_parser.add_argument("--output-format", choices=("json", "ndjson"), default="json")
+    ingest_parser.add_argument("--compression", choices=("gzip", "zstd"))
+    ingest_parser.add_argument("--lookup-index", action="store_true")
+    search_parser = commands.add_parser("search", help="BM25 search of the corpus")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=10)
+    similar_parser = commands.add_parser("similar", help="vector search")
+    similar_parser.add_argument("queries", nargs="+")
+    similar_parser.add_argument("-k", type=int, default=10)
+    heading_parser = commands.add_parser("heading")
+    heading_parser.add_argument("document")
+    heading_parser.add_argument("heading_id")
+    pages_parser = commands.add_parser("pages")
+    pages_parser.add_argument("document")
+    pages_parser.add_argument("first", type=int)
+    pages_parser.add_argument("last", type=int, nargs="?")
+    toc_parser = commands.add_parser("toc")
+    toc_parser.add_argument("file_name")
+    for command in ("stats", "ping", "shutdown"):
+        commands.add_parser(command)
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.trace:
+            instrumentation.enable()
+        serve(args.socket, corpus=args.corpus, vectors=args.vectors, section_store=args.section_store,
+              workers=args.workers)
+        return 0
+
+    try:
+        with DaemonClient(args.socket) as client:
+            if args.command == "ingest":
+                result = client.ingest(args.files, force=args.force, output_format=args.output_format,
+                                       compression=args.compression, lookup_index=args.lookup_index)
+            elif args.command == "search":
+                result = client.search(args.query, k=args.k)
+            elif args.command == "similar":
+                result = client.similar(args.queries, k=args.k)
+            elif args.command == "heading":
+                result = client.heading(args.document, args.heading_id)
+            elif args.command == "pages":
+                result = client.pages(args.document, args.first, args.last)
+            elif args.command == "toc":
+                result = client.toc(args.file_name)
+            else:
+                result = client.request(args.command)
+    except (OSError, DaemonError) as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
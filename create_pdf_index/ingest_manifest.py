@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Manifest for incremental ingestion.
+
+For every source file it remembers the file's content hash, the parser configuration
+fingerprint it was parsed with, and the output files that were written. A file whose
+hash and configuration are unchanged (and whose outputs still exist) can be skipped.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+
+def file_content_hash(file_name, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks so large PDFs are never fully in memory."""
+    sha = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class IngestManifest:
+    """
+    JSON manifest: {file_name: {"content_hash", "config_hash", "size", "mtime_ns", "outputs"}}.
+    size/mtime_ns let content_hash() reuse the stored hash without re-reading an untouched file.
+    """
+
+    def __init__(self, path="ingest_manifest.json"):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def content_hash(self, file_name):
+        """Content hash of file_name, reusing the manifest's value if size and mtime are unchanged."""
+        stat = os.stat(file_name)
+        entry = self.entries.get(file_name)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["content_hash"]
+        return file_content_hash(file_name)
+
+    def is_up_to_date(self, file_name, content_hash, config_hash):
+        entry = self.entries.get(file_name)
+        if not entry:
+            return False
+        if entry["content_hash"] != content_hash or entry["config_hash"] != config_hash:
+            return False
+        # Outputs deleted by hand? Then it has to be re-done.
+        return all(os.path.exists(output) for output in entry.get("outputs", []))
+
+    def record(self, file_name, content_hash, config_hash, outputs):
+        stat = os.stat(file_name)
+        self.entries[file_name] = {
+            "content_hash": content_hash,
+            "config_hash": config_hash,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "outputs": list(outputs),
+        }
+
+    def save(self):
+        # Write to a temp file and rename, so an interrupted run never leaves a half-written manifest
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight timing spans and counters for the ingestion pipeline.
+
+    with instrumentation.span("pdf.load", file=file_name):
+        documents = reader.load_data()
+    instrumentation.count("pages", len(documents))
+
+    @instrumentation.traced("toc.build")
+    def build_toc(headings_data):
+
+Disabled by default: span() then returns one shared no-op object and count() returns at once,
+so instrumented code pays a function call and a flag check. Enable with enable(), or by setting
+PDF_INDEX_TRACE=<output path> in the environment; the trace is then written at exit
+(PDF_INDEX_TRACE_FORMAT=chrome for a Chrome trace / Perfetto file, default a JSON report).
+
+Each process records its own spans; process-pool workers send theirs back with drain() and
+the parent adds them with merge().
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+# (name, start_ns, duration_ns, pid, thread_id, args)
+_spans = []
+_counters = {}
+
+
+class _NullSpan:
+    """Returned by span() while disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start_ns")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        with _lock:
+            _spans.append((self.name, self.start_ns, duration_ns, os.getpid(), threading.get_ident(), self.args))
+        return False
+
+    def set(self, **args):
+        """Adds arguments (e.g. sizes known only at the end) to the span."""
+        self.args.update(args)
+
+
+def span(name, **args):
+    """Context manager timing the block as `name`; args are recorded with it."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def traced(name):
+    """Decorator: runs every call of the function inside span(name)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1):
+    """Adds value to the counter `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def is_enabled():
+    return _enabled
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def drain():
+    """Returns everything recorded so far (picklable) and clears it; None while disabled."""
+    if not _enabled:
+        return None
+    with _lock:
+        recorded = {"spans": list(_spans), "counters": dict(_counters)}
+        _spans.clear()
+        _counters.clear()
+    return recorded
+
+def merge(recorded):
+    """Adds the output of drain() from another process."""
+    if not recorded:
+        return
+    with _lock:
+        _spans.extend(recorded["spans"])
+        for name, value in recorded["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def summary():
+    """{"counters": {...}, "spans": {name: {count, total_s, max_s}}}"""
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    by_name = {}
+    for name, _, duration_ns, _, _, _ in spans:
+        stats = by_name.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["count"] += 1
+        stats["total_s"] += duration_ns / 1e9
+        stats["max_s"] = max(stats["max_s"], duration_ns / 1e9)
+    return {"counters": counters, "spans": by_name}
+
+def export_json(path):
+    """Writes the summary plus every span (start/duration in seconds) as one JSON document."""
+    with _lock:
+        spans = list(_spans)
+    report = summary()
+    report["events"] = [
+        {"name": name, "start_s": start_ns / 1e9, "duration_s": duration_ns / 1e9, "pid": pid, "tid": tid, "args": args}
+        for name, start_ns, duration_ns, pid, tid, args in spans
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+
+def export_chrome_trace(path):
+    """Writes a Chrome trace ("X" complete events, microseconds) for chrome://tracing or Perfetto."""
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    events = [
+        {"name": name, "ph": "X", "ts": start_ns / 1e3, "dur": duration_ns / 1e3, "pid": pid, "tid": tid,
+         "args": args}
+        for name, start_ns, duration_ns, pid, tid, args in spans
+    ]
+    # Counters are totals, shown as one counter event at the end of the trace
+    end_us = max((e["ts"] + e["dur"] for e in events), default=0.0)
+    events.extend({"name": name, "ph": "C", "ts": end_us, "pid": os.getpid(), "args": {name: value}}
+                  for name, value in counters.items())
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+def export(path, trace_format="json"):
+    if trace_format == "chrome":
+        export_chrome_trace(path)
+    elif trace_format == "json":
+        export_json(path)
+    else:
+        raise ValueError(f"Unknown trace format: {trace_format!r} (expected 'json' or 'chrome')")
+
+
+def _export_at_exit(path, trace_format):
+    # Only the process that enabled tracing from the environment writes the file;
+    # forked workers inherit the atexit hook but hand their spans back through drain()
+    if os.getpid() == _owner_pid:
+        export(path, trace_format)
+
+_owner_pid = os.getpid()
+_trace_path = os.environ.get("PDF_INDEX_TRACE")
+if _trace_path:
+    enable()
+    atexit.register(_export_at_exit, _trace_path, os.environ.get("PDF_INDEX_TRACE_FORMAT", "json"))
@@ -0,0 +1,245 @@
+import argparse
+import sys
+import time
+import json # Import json for pretty printing
+import random
+import asyncio
+
+from .credentials import llama_cloud_api_key
+
+# The API key is read from LLAMA_CLOUD_API_KEY (or a .env file) when the first request is made;
+# requests / aiohttp are imported on first use too, so importing this module is cheap
+
+# Example job_id, checked when none is given on the command line
+job_id = "7e0fd391-f00e-4567-af25-c5b10b93d057"
+
+base_url = "https://api.cloud.llamaindex.ai/api/v1/parsing/job/"
+
+def _headers(api_key=None):
+    return {
+        "accept": "application/json",
+        "Authorization": f"Bearer {api_key or llama_cloud_api_key()}"
+    }
+
+# Job states after which there is nothing more to wait for
+FINAL_JOB_STATUSES = {"SUCCESS", "ERROR", "FAILED", "PARTIAL_SUCCESS", "CANCELLED"}
+# HTTP statuses worth retrying (rate limiting and transient server errors)
+RETRYABLE_HTTP_STATUSES = {429, 500, 502, 503, 504}
+
+# One pooled session for the blocking calls, so repeated calls reuse the TLS connection
+_session = None
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+        _session.headers.update(_headers())
+    return _session
+
+def get_job_status(job_id):
+    """Fetches the status of a LlamaParse job."""
+    import requests
+    url = f"{base_url}{job_id}"
+    try:
+        response = _get_session().get(url)
+        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching job status for {job_id}: {e}")
+        return None
+
+def get_job_result(job_id, result_type="markdown"):
+    """Fetches the result (markdown or json) of a successful LlamaParse job."""
+    import requests
+    url = f"{base_url}{job_id}/result/{result_type}"
+    # Even for markdown, they often return a JSON object with a 'markdown' key
+    try:
+        response = _get_session().get(url)
+        response.raise_for_status()
+        return response.json() # Returns a dict like {'markdown': '...', 'job_metadata': {...}}
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching job result for {job_id} (type: {result_type}): {e}")
+        return None
+
+
+class AsyncJobClient:
+    """
+    asyncio client for many LlamaParse jobs at once.
+
+    All requests share one aiohttp session (pooled keep-alive connections), at most
+    max_concurrency requests are in flight, transient errors (429 / 5xx / connection errors)
+    are retried with exponential backoff, and poll_jobs() waits on many job IDs concurrently,
+    backing off the polling interval of each job while it is still pending.
+
+        async with AsyncJobClient() as client:
+            statuses = await client.poll_jobs(job_ids)
+    """
+
+    def __init__(self, api_key=None, base_url=base_url, max_concurrency=20, max_retries=5,
+                 initial_poll_interval=2.0, max_poll_interval=60.0, poll_backoff=1.5, request_timeout=60.0):
+        self.api_key = api_key or llama_cloud_api_key()
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_backoff = poll_backoff
+        self.request_timeout = request_timeout
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        import aiohttp
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = aiohttp.ClientSession(
+            headers=_headers(self.api_key),
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def _get_json(self, url):
+        import aiohttp
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    async with self._session.get(url) as response:
+                        if response.status not in RETRYABLE_HTTP_STATUSES:
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+                        retry_after = response.headers.get("Retry-After")
+                        error = f"HTTP {response.status}"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = repr(e)
+            if attempt == self.max_retries:
+                raise RuntimeError(f"GET {url} failed after {attempt + 1} attempts: {error}")
+            # Honour Retry-After when the server sends one, otherwise exponential backoff with jitter
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay * (1 + random.random())
+            await asyncio.sleep(wait)
+            delay *= 2
+
+    async def get_job_status(self, job_id):
+        """Async version of get_job_status; raises instead of returning None."""
+        return await self._get_json(f"{self.base_url}{job_id}")
+
+    async def get_job_result(self, job_id, result_type="markdown"):
+        """Async version of get_job_result; raises instead of returning None."""
+        return await self._get_json(f"{self.base_url}{job_id}/result/{result_type}")
+
+    async def wait_for_job(self, job_id, timeout=None):
+        """Polls one job until it reaches a final status; the interval grows while it is pending."""
+        interval = self.initial_poll_interval
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job_info = await self.get_job_status(job_id)
+            if job_info.get("status") in FINAL_JOB_STATUSES:
+                return job_info
+            if deadline is not None and time.monotonic() + interval > deadline:
+                return job_info
+            await asyncio.sleep(interval)
+            interval = min(interval * self.poll_backoff, self.max_poll_interval)
+
+    async def poll_jobs(self, job_ids, timeout=None, on_done=None):
+        """
+        Waits for many jobs concurrently. Returns {job_id: last status dict}, or the exception
+        for jobs whose status could not be fetched. on_done(job_id, result) is called as each finishes.
+        """
+        async def wait_one(job_id):
+            try:
+                result = await self.wait_for_job(job_id, timeout=timeout)
+            except Exception as e:
+                result = e
+            if on_done is not None:
+                on_done(job_id, result)
+            return job_id, result
+
+        return dict(await asyncio.gather(*(wait_one(job_id) for job_id in job_ids)))
+
+
+def report_job(job_id):
+    """Prints a job's status and saves its markdown / json results if it succeeded."""
+    print(f"--- Checking Status for Job ID: {job_id} ---")
+    job_info = get_job_status(job_id)
+
+    if job_info:
+        print(f"Current Status: {job_info.get('status')}")
+        print(f"Error Message (if any): {job_info.get('error')}") # Look for this!
+        print(f"Job Type: {job_info.get('job_type')}") # This might show 'json' even if you requested markdown
+
+        if job_info.get('status') == 'SUCCESS':
+            print("\n--- Attempting to retrieve Markdown result ---")
+            md_result = get_job_result(job_id, result_type="markdown")
+            if md_result and 'markdown' in md_result:
+                print("Markdown Result (first 500 chars):\n")
+                print(md_result['markdown'][:500])
+                with open(f"retrieved_job_{job_id}.md", "w", encoding="utf-8") as f:
+                    f.write(md_result['markdown'])
+                print(f"\nFull Markdown result saved to retrieved_job_{job_id}.md")
+            else:
+                print("Failed to retrieve Markdown result or result was empty.")
+
+            # You can also try retrieving the JSON result to see what's there
+            print("\n--- Attempting to retrieve JSON result (for comparison) ---")
+            json_result = get_job_result(job_id, result_type="json")
+            if json_result and 'json' in json_result:
+                print("JSON Result (first 500 chars):\n")
+                print(json.dumps(json_result['json'], indent=2)[:500])
+                with open(f"retrieved_job_{job_id}.json", "w", encoding="utf-8") as f:
+                    json.dump(json_result['json'], f, indent=4, ensure_ascii=False)
+                print(f"\nFull JSON result saved to retrieved_job_{job_id}.json")
+            else:
+                print("Failed to retrieve JSON result or result was empty.")
+
+        elif job_info.get('status') == 'FAILED':
+            print(f"\nJob FAILED. Error details from LlamaParse: {job_info.get('error_message', 'No specific error message provided.')}")
+            print("This is the 'log' or diagnostic information you're looking for directly from LlamaParse.")
+        else:
+            print("\nJob is still pending or processing. You might need to wait and re-run this script.")
+    else:
+        print("Could not retrieve job information.")
+
+async def fetch_many_jobs(job_ids, result_type="markdown", **client_kwargs):
+    """Waits for all job_ids concurrently and saves each successful job's result to retrieved_job_<id>.md."""
+    async with AsyncJobClient(**client_kwargs) as client:
+        def on_done(job_id, result):
+            status = result.get("status") if isinstance(result, dict) else f"error: {result}"
+            print(f"{job_id}: {status}")
+
+        statuses = await client.poll_jobs(job_ids, on_done=on_done)
+
+        async def save_result(job_id):
+            md_result = await client.get_job_result(job_id, result_type=result_type)
+            with open(f"retrieved_job_{job_id}.md", "w", encoding="utf-8") as f:
+                f.write(md_result.get(result_type, ""))
+
+        succeeded = [j for j, s in statuses.items() if isinstance(s, dict) and s.get("status") == "SUCCESS"]
+        await asyncio.gather(*(save_result(j) for j in succeeded))
+        print(f"{len(succeeded)}/{len(job_ids)} job(s) succeeded; results saved as retrieved_job_<id>.md")
+        return statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check LlamaParse jobs and save their results.")
+    # With more than one job ID they are polled concurrently
+    parser.add_argument("job_ids", nargs="*", default=[job_id])
+    args = parser.parse_args(argv)
+
+    if not llama_cloud_api_key():
+        print("Error: LLAMA_CLOUD_API_KEY environment variable not set.")
+        return 1
+
+    if len(args.job_ids) == 1:
+        report_job(args.job_ids[0])
+    else:
+        asyncio.run(fetch_many_jobs(args.job_ids))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Heading-ID and page-range lookup index over extracted_nodes records.
+
+Answers "section 4.1.1 of document X" (hash lookup by (document, heading_id)) and "sections of
+document X that span pages 37-38" (interval query) without scanning the node list. Everything is
+a flat array memory-mapped at open time, so opening costs one small JSON read, whatever the size.
+
+Index directory layout:
+    meta.json                 version, row count, document names, hash table size
+    rows.ndjson(.offsets)     stored fields of each section; rows are grouped by document and
+                              sorted by first page within a document
+    document_rows.u64         rows of document d are [document_rows[d], document_rows[d + 1])
+    page_first.i32            first page of each row (page_label as int, -1 if not a number)
+    page_last.i32             last page of each row ("page_end" when the record has one)
+    page_last_max.i32         running max of page_last within each document
+    hash_keys.u64             open-addressing table keyed by blake2b("document\\0heading_id")
+    hash_rows.u32             row + 1 for each slot (0 = empty slot)
+
+Sorted first pages plus the running max of last pages make an interval index: the sections of a
+document overlapping [lo, hi] all lie between two binary-search positions.
+
+Run: pdf-index-lookup build <index_dir> extracted_nodes_*.json
+     pdf-index-lookup heading <index_dir> <document> <heading_id>
+     pdf-index-lookup pages <index_dir> <document> <first> [<last>]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+
+import numpy as np
+
+from .bm25_index import map_array, swap_directory
+from .node_writer import RecordNdjsonWriter, iter_node_records
+from . import instrumentation
+
+INDEX_FORMAT_VERSION = 1
+
+ROW_FIELDS = ("heading_id", "node_id", "parent_node_id", "section_title", "heading_level", "page_label", "page_end")
+
+_NODE_FILE_SUFFIXES = (".gz", ".zst", ".json", ".ndjson")
+
+
+def document_name(file_name):
+    """Document name of an extracted_nodes file: "extracted_nodes_ich-gcp.json.gz" -> "ich-gcp"."""
+    name = os.path.basename(file_name)
+    for suffix in _NODE_FILE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name[len("extracted_nodes_"):] if name.startswith("extracted_nodes_") else name
+
+
+def page_number(page_label):
+    try:
+        return int(page_label)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _key_hash(document, heading_id):
+    digest = hashlib.blake2b(f"{document}\0{heading_id}".encode("utf-8"), digest_size=8).digest()
+    # 0 marks an empty slot, so it is never used as a key
+    return int.from_bytes(digest, "little") or 1
+
+
+class LookupIndex:
+    """
+    Read side of the index.
+
+        index = LookupIndex("lookup_index")
+        index.heading("ich-gcp-r2-step-5", "4.1.1")     # [row dict, ...] (a heading id can repeat)
+        index.pages("ich-gcp-r2-step-5", 37)            # sections on page 37
+        index.pages("ich-gcp-r2-step-5", 37, 40)        # sections overlapping pages 37-40
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{directory}: index format {self.meta.get('version')}, expected {INDEX_FORMAT_VERSION}")
+        self.documents = self.meta["documents"]
+        self._document_ids = {name: i for i, name in enumerate(self.documents)}
+
+        path = lambda name: os.path.join(directory, name)
+        self._document_rows = map_array(path("document_rows.u64"), np.uint64)
+        self._page_first = map_array(path("page_first.i32"), np.int32)
+        self._page_last = map_array(path("page_last.i32"), np.int32)
+        self._page_last_max = map_array(path("page_last_max.i32"), np.int32)
+        self._hash_keys = map_array(path("hash_keys.u64"), np.uint64)
+        self._hash_rows = map_array(path("hash_rows.u32"), np.uint32)
+        self._row_offsets = map_array(path("rows.ndjson.offsets"), np.uint64)
+        with open(path("rows.ndjson"), "rb") as f:
+            self._rows = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path("rows.ndjson")) else b""
+
+    def __len__(self):
+        return len(self._row_offsets)
+
+    def row(self, row):
+        """Stored fields of one row, plus "document"."""
+        start = int(self._row_offsets[row])
+        end = self._rows.find(b"\n", start)
+        return json.loads(self._rows[start:end if end != -1 else len(self._rows)])
+
+    def heading(self, document, heading_id):
+        """All sections of `document` with this heading_id (usually one), in document order."""
+        key = _key_hash(document, heading_id)
+        mask = len(self._hash_keys) - 1
+        slot = key & mask
+        rows = []
+        # Linear probing: every entry with this key sits between its home slot and the next empty slot
+        while self._hash_rows[slot]:
+            if int(self._hash_keys[slot]) == key:
+                row = self.row(int(self._hash_rows[slot]) - 1)
+                # The 64-bit hash makes a collision unlikely, but check the actual key anyway
+                if row["document"] == document and row["heading_id"] == heading_id:
+                    rows.append(row)
+            slot = (slot + 1) & mask
+        return rows
+
+    def document_records(self, document):
+        """All rows of `document` (sorted by first page), or [] if it is not in the index."""
+        document_id = self._document_ids.get(document)
+        if document_id is None:
+            return []
+        start, end = int(self._document_rows[document_id]), int(self._document_rows[document_id + 1])
+        return [self.row(row) for row in range(start, end)]
+
+    def page_rows(self, document, first, last=None):
+        """Row numbers of the sections of `document` overlapping pages [first, last]."""
+        last = first if last is None else last
+        document_id = self._document_ids.get(document)
+        if document_id is None:
+            return np.zeros(0, dtype=np.int64)
+        start, end = int(self._document_rows[document_id]), int(self._document_rows[document_id + 1])
+        # Rows before lo_row all end before `first` (running max of page_last < first);
+        # rows from hi_row on all start after `last`.
+        lo_row = start + int(np.searchsorted(self._page_last_max[start:end], first, side="left"))
+        hi_row = start + int(np.searchsorted(self._page_first[start:end], last, side="right"))
+        if lo_row >= hi_row:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.arange(lo_row, hi_row)
+        return candidates[self._page_last[lo_row:hi_row] >= first]
+
+    def pages(self, document, first, last=None):
+        """Sections of `document` overlapping pages [first, last] (just `first` when last is None)."""
+        return [self.row(int(row)) for row in self.page_rows(document, first, last)]
+
+
+def build_index(file_names, directory):
+    """
+    Builds a LookupIndex in `directory` from extracted_nodes files, one document per file
+    (named by document_name). Written to a temporary directory and swapped in.
+    Returns the opened index.
+    """
+    file_names = list(file_names)
+    return build_index_from_records(
+        ((document_name(file_name), iter_node_records(file_name)) for file_name in file_names), directory)
+
+
+def build_index_from_records(documents_records, directory):
+    """build_index from (document name, iterable of extracted_nodes records or rows) pairs."""
+    documents = []
+    seen = set()
+    document_rows = array("Q", [0])
+    page_first = array("i")
+    page_last = array("i")
+    page_last_max = array("i")
+    keys = []
+
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp_directory)
+    try:
+        with instrumentation.span("lookup.build"), \
+                RecordNdjsonWriter(os.path.join(tmp_directory, "rows.ndjson")) as rows_writer:
+            for document, records in documents_records:
+                if document in seen:
+                    raise ValueError(f"Duplicate document name {document!r}")
+                seen.add(document)
+                documents.append(document)
+                rows = []
+                for record in records:
+                    row = {field: record.get(field) for field in ROW_FIELDS}
+                    row["document"] = document
+                    first = page_number(record.get("page_label"))
+                    last = page_number(record.get("page_end", record.get("page_label")))
+                    rows.append((first, max(first, last), row))
+                # Stable sort, so sections on the same page stay in document order
+                rows.sort(key=lambda entry: entry[0])
+
+                running_max = -1
+                for first, last, row in rows:
+                    running_max = max(running_max, last)
+                    page_first.append(first)
+                    page_last.append(last)
+                    page_last_max.append(running_max)
+                    if row["heading_id"]:
+                        keys.append((_key_hash(document, row["heading_id"]), rows_writer.count))
+                    rows_writer.write(row)
+                document_rows.append(rows_writer.count)
+
+        # Open-addressing hash table at most half full
+        table_size = 1
+        while table_size < 2 * len(keys) + 1:
+            table_size *= 2
+        hash_keys = np.zeros(table_size, dtype=np.uint64)
+        hash_rows = np.zeros(table_size, dtype=np.uint32)
+        mask = table_size - 1
+        for key, row in keys:
+            slot = key & mask
+            while hash_rows[slot]:
+                slot = (slot + 1) & mask
+            hash_keys[slot] = key
+            hash_rows[slot] = row + 1
+
+        path = lambda name: os.path.join(tmp_directory, name)
+        hash_keys.tofile(path("hash_keys.u64"))
+        hash_rows.tofile(path("hash_rows.u32"))
+        for name, values in (("document_rows.u64", document_rows), ("page_first.i32", page_first),
+                             ("page_last.i32", page_last), ("page_last_max.i32", page_last_max)):
+            with open(path(name), "wb") as f:
+                values.tofile(f)
+        meta = {"version": INDEX_FORMAT_VERSION, "rows": len(page_first), "documents": documents,
+                "table_size": table_size}
+        with open(path("meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+        swap_directory(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    return LookupIndex(directory)
+
+
+def sidecar_path(extracted_file_name):
+    """Where extract_section_from_data puts the lookup index of one extracted_nodes file."""
+    return extracted_file_name + ".lookup"
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Heading-ID and page-range lookups over extracted_nodes files.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="index extracted_nodes files")
+    build_parser.add_argument("directory")
+    build_parser.add_argument("files", nargs="+")
+    heading_parser = commands.add_parser("heading", help="look up a section by heading id")
+    heading_parser.add_argument("directory")
+    heading_parser.add_argument("document")
+    heading_parser.add_argument("heading_id")
+    pages_parser = commands.add_parser("pages", help="list the sections overlapping a page range")
+    pages_parser.add_argument("directory")
+    pages_parser.add_argument("document")
+    pages_parser.add_argument("first", type=int)
+    pages_parser.add_argument("last", type=int, nargs="?")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_index(args.files, args.directory)
+        print(f"Indexed {len(index)} sections of {len(index.documents)} document(s) into {args.directory}")
+        return 0
+
+    index = LookupIndex(args.directory)
+    if args.command == "heading":
+        rows = index.heading(args.document, args.heading_id)
+    else:
+        rows = index.pages(args.document, args.first, args.last)
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
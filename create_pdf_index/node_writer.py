@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Single-pass NDJSON writer for parsed nodes.
+
+Each node is converted to a dict once and written straight away as one line of the full
+(parsed_nodes) file and one line of the extracted (extracted_nodes) file, so nothing is
+accumulated in memory. Files can be plain, gzip (.gz) or zstd (.zst, needs the optional
+`zstandard` package). Plain files also get a .offsets sidecar (byte offset of every line),
+so a reader can seek straight to record i.
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+from array import array
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_node_file(path, mode="r"):
+    """Opens a (possibly .gz / .zst compressed) NDJSON/JSON file in text mode ("r" or "w")."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading/writing .zst files needs the 'zstandard' package (pip install zstandard)")
+        if mode == "w":
+            raw = zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+        else:
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    # newline="" so "\n" is written as-is on every platform (the .offsets are byte positions)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def extracted_view(node_dict):
+    """The extracted_nodes record for one node, built from its already-serialized dict."""
+    metadata = node_dict.get("metadata", {})
+    record = {
+        "section_title": metadata.get("section", "N/A"),
+        "page_label": metadata.get("page_label", "N/A"),
+        "heading_level": metadata.get("heading_level", 0),
+        "heading_id": metadata.get("heading_id", ""),
+        "parent_node_id": metadata.get("parent_node_id", None),
+        "node_id": metadata.get("node_id", node_dict.get("id_")),
+        "content": node_dict.get("text", ""),
+    }
+    if "page_end" in metadata:
+        # Sections stitched across pages (page_parallel.py) also record their last page
+        record["page_end"] = metadata["page_end"]
+    return record
+
+
+class NodeNdjsonWriter:
+    """
+    Writes nodes to full and extracted NDJSON files as they are produced.
+    Use as a context manager; write() takes one TextNode at a time.
+    """
+
+    def __init__(self, full_path, extracted_path, compression=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression {compression!r}; use one of {list(COMPRESSION_SUFFIXES)}")
+        self.full_path = full_path + COMPRESSION_SUFFIXES[compression]
+        self.extracted_path = extracted_path + COMPRESSION_SUFFIXES[compression]
+        self.compression = compression
+        self.count = 0
+        self._full = open_node_file(self.full_path, "w")
+        self._extracted = open_node_file(self.extracted_path, "w")
+        # Byte offsets of each line, only for plain files (compressed streams can't be seeked cheaply)
+        self._full_offsets = array("Q") if compression is None else None
+        self._extracted_offsets = array("Q") if compression is None else None
+        self._full_pos = 0
+        self._extracted_pos = 0
+
+    def write(self, node):
+        node_dict = node.dict()
+        self._full_pos = self._write_line(self._full, node_dict, self._full_offsets, self._full_pos)
+        self._extracted_pos = self._write_line(self._extracted, extracted_view(node_dict),
+                                               self._extracted_offsets, self._extracted_pos)
+        self.count += 1
+
+    @staticmethod
+    def _write_line(f, record, offsets, pos):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        f.write(line)
+        if offsets is None:
+            return pos
+        offsets.append(pos)
+        return pos + len(line.encode("utf-8"))
+
+    @property
+    def paths(self):
+        """All files written (data files and, for plain output, their .offsets sidecars)."""
+        paths = [self.full_path, self.extracted_path]
+        if self.compression is None:
+            paths += [self.full_path + ".offsets", self.extracted_path + ".offsets"]
+        return paths
+
+    def close(self):
+        self._full.close()
+        self._extracted.close()
+        for path, offsets in ((self.full_path, self._full_offsets), (self.extracted_path, self._extracted_offsets)):
+            if offsets is not None:
+                with open(path + ".offsets", "wb") as f:
+                    offsets.tofile(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RecordNdjsonWriter:
+    """Writes plain dict records to one NDJSON file, with the same .offsets sidecar as NodeNdjsonWriter."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open_node_file(path, "w")
+        self._offsets = array("Q")
+        self._pos = 0
+
+    def write(self, record):
+        self._pos = NodeNdjsonWriter._write_line(self._file, record, self._offsets, self._pos)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        with open(self.path + ".offsets", "wb") as f:
+            self._offsets.tofile(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_ndjson(path):
+    """Streams the records of an NDJSON file (plain, .gz or .zst)."""
+    with open_node_file(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_node_records(path, chunk_size=1 << 16):
+    """
+    Streams the record dicts of a node file: a JSON array (as written by extract_section_from_data)
+    or NDJSON (one record per line), plain or .gz / .zst compressed.
+    The file is read in chunks and only one record is decoded at a time, so memory does not grow
+    with the file size.
+    """
+    with open_node_file(path, "r") as f:
+        first_chunk = f.read(chunk_size).lstrip("\ufeff")
+        stripped = first_chunk.lstrip()
+        if not stripped:
+            return
+        if stripped[0] == "[":
+            records = _iter_json_array(f, first_chunk, chunk_size)
+        elif stripped[0] == "{":
+            records = _iter_ndjson_lines(f, first_chunk)
+        else:
+            raise ValueError(f"{path}: expected a JSON array or NDJSON records")
+
+        for record in records:
+            if isinstance(record, dict):
+                yield record
+
+
+_ARRAY_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _iter_json_array(f, buffer, chunk_size):
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    eof = False
+    while True:
+        pos = _ARRAY_SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos < len(buffer):
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                # Most likely the record runs past the end of the buffer
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError("Unterminated JSON array")
+
+        # Drop what has been consumed and read more; read at least as much as is buffered,
+        # so a very long record is re-tried a logarithmic number of times, not once per chunk.
+        more = f.read(max(chunk_size, len(buffer) - pos))
+        eof = not more
+        buffer = buffer[pos:] + more
+        pos = 0
+
+
+def _iter_ndjson_lines(f, first_chunk):
+    # Finish the partially read line, then go line by line. Split on "\n" only: str.splitlines
+    # also splits on U+2028, U+2029 and \x85, which ensure_ascii=False leaves unescaped in strings.
+    lines = (first_chunk + f.readline()).split("\n")
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_ndjson_record(path, index):
+    """Reads record `index` of a plain NDJSON file by seeking via its .offsets sidecar."""
+    offsets = array("Q")
+    with open(path + ".offsets", "rb") as f:
+        # Only the one 8-byte offset that is needed is read
+        f.seek(index * offsets.itemsize)
+        offsets.frombytes(f.read(offsets.itemsize))
+    if not offsets:
+        raise IndexError(f"{path} has no record {index}")
+    with open(path, "rb") as f:
+        f.seek(offsets[0])
+        return json.loads(f.readline())
+
+
+def count_ndjson_records(path):
+    """Number of records in a plain NDJSON file, from its .offsets sidecar (no need to read the data)."""
+    return os.path.getsize(path + ".offsets") // array("Q").itemsize
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Page-parallel parsing of one large PDF, with a document-wide section hierarchy.
+
+SectionNodeParser treats every page Document on its own: the heading stack is reset per page, so
+a "4.1.1" heading on page 12 loses its "4.1" parent on page 11, and text at the top of a page is
+cut off from the section it continues. Here the pages are split into batches that worker
+processes load (straight from the PDF with pypdf, so text extraction is parallel too) and scan for
+headings. A sequential merge then stitches the batches together, which only walks the headings:
+  - text before the first heading of a batch is appended to the section still open at the end
+    of the previous batch;
+  - the heading stack (and the per-path occurrence counts behind the node IDs) carries over from
+    one batch to the next, so parents are found across page boundaries.
+
+The output is the same as SectionNodeParser would give for the whole document as one text (pages
+joined by "\\n"), except that each node keeps the page_label of the page its heading is on and,
+when the section runs onto later pages, a "page_end" with the label of the last page it covers.
+Headings are matched within a page, so a heading line split across a page break is not found.
+Node IDs are seeded with "<content hash>|document" rather than the per-page "<content hash>|<page
+index>|<page label>", so switching between page-parallel and per-page parsing changes every
+node_id of a file.
+
+    nodes = list(parse_pdf_pages("large.pdf", max_workers=8))
+    nodes = list(parse_document_pages(page_documents))      # pages already loaded
+
+extract_section_from_data(file_name, page_workers=N) writes these nodes as its usual outputs.
+"""
+
+import hashlib
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from . import instrumentation
+from .create_index_from_pdf import SectionNodeParser, SectionRecord, _NODE_ID_NAMESPACE, _NON_WHITESPACE
+from .ingest_manifest import file_content_hash
+
+PAGE_SEPARATOR = "\n"
+
+
+def page_count(file_name):
+    """Number of pages of a PDF (needs pypdf, which SimpleDirectoryReader also uses for PDFs)."""
+    import pypdf
+    return len(pypdf.PdfReader(file_name).pages)
+
+
+def load_pages(file_name, first, last, reader=None):
+    """(page_label, text) for pages [first, last) of a PDF, extracted the way SimpleDirectoryReader does."""
+    if reader is None:
+        import pypdf
+        reader = pypdf.PdfReader(file_name)
+    return [(reader.page_labels[page], reader.pages[page].extract_text()) for page in range(first, last)]
+
+
+def scan_pages(heading_grammar, pages):
+    """
+    Splits a batch of consecutive (page_label, text) pages at their headings.
+    Returns (lead, sections): lead is the [(page_label, text), ...] chunks before the batch's first
+    heading; sections is one (heading_id, level, heading_line, page_label, chunks) per heading, where
+    chunks is the text after the heading up to the next heading or the end of the batch.
+    """
+    lead = []
+    sections = []
+    chunks = lead
+    for page_label, text in pages:
+        pos = 0
+        for match, heading_line, heading_id, heading_level in heading_grammar.iter_headings(text):
+            chunks.append((page_label, text[pos:match.start()]))
+            chunks = []
+            sections.append((heading_id, heading_level, heading_line, page_label, chunks))
+            pos = match.end()
+        chunks.append((page_label, text[pos:]))
+    return lead, sections
+
+
+class HierarchyStitcher:
+    """
+    Sequential merge of scanned page batches (see scan_pages), fed in page order.
+    add_batch() yields the nodes whose sections the batch closes; finish() yields the rest.
+    Follows SectionNodeParser._iter_document_records, with the stack kept across batches.
+    """
+
+    def __init__(self, section_parser, doc_key):
+        self.section_parser = section_parser
+        self.doc_key = doc_key
+        self.path_counts = {}
+        # Entries: (heading_level, node_id, heading_path), levels strictly increasing bottom to top
+        self.parent_stack = []
+        # [heading_id, level, heading_line, node_id, parent_node_id, page_label, chunks] or None
+        self.open_section = None
+        self.preamble_chunks = []
+        self.heading_count = 0
+
+    def make_node_id(self, path):
+        occurrence = self.path_counts.get(path, 0)
+        self.path_counts[path] = occurrence + 1
+        return str(uuid.uuid5(_NODE_ID_NAMESPACE, f"{self.doc_key}|{path}|{occurrence}"))
+
+    def add_batch(self, lead, sections):
+        if self.open_section is not None:
+            self.open_section[6].extend(lead)
+        else:
+            self.preamble_chunks.extend(lead)
+
+        for heading_id, heading_level, heading_line, page_label, chunks in sections:
+            if self.open_section is not None:
+                yield self._close(self.open_section)
+            else:
+                preamble = self._preamble_node()
+                if preamble is not None:
+                    yield preamble
+
+            while self.parent_stack and self.parent_stack[-1][0] >= heading_level:
+                self.parent_stack.pop()
+            parent_node_id = None
+            heading_path = heading_id
+            if self.parent_stack:
+                _, parent_node_id, parent_path = self.parent_stack[-1]
+                if parent_path:
+                    heading_path = f"{parent_path}/{heading_id}"
+            node_id = self.make_node_id(heading_path)
+            self.parent_stack.append((heading_level, node_id, heading_path))
+
+            self.open_section = [heading_id, heading_level, heading_line, node_id, parent_node_id,
+                                 page_label, list(chunks)]
+            self.heading_count += 1
+
+    def finish(self):
+        instrumentation.count("headings_matched", self.heading_count)
+        if self.open_section is not None:
+            yield self._close(self.open_section)
+            self.open_section = None
+            return
+        # No headings at all: the whole document is one node
+        text, first_page, last_page = _join_chunks(self.preamble_chunks)
+        if text:
+            record = SectionRecord(None, 0, len(text), None, 0, -1, "Full Document Content",
+                                   self.make_node_id("#document"))
+            yield self._to_node(record, text, first_page, last_page)
+
+    def _preamble_node(self):
+        text, first_page, last_page = _join_chunks(self.preamble_chunks)
+        self.preamble_chunks = []
+        if not text:
+            return None
+        record = SectionRecord(None, 0, len(text), None, 0, -1, "Document Preamble",
+                               self.make_node_id("#preamble"))
+        # The preamble is the level 0 parent of the first headings
+        self.parent_stack.append((0, record.node_id, ""))
+        return self._to_node(record, text, first_page, last_page)
+
+    def _close(self, section):
+        heading_id, heading_level, heading_line, node_id, parent_node_id, page_label, chunks = section
+        text, _, last_page = _join_chunks(chunks)
+        record = SectionRecord(None, 0, len(text), heading_id, heading_level, -1, heading_line,
+                               node_id, parent_node_id)
+        return self._to_node(record, text, page_label, last_page or page_label)
+
+    def _to_node(self, record, text, page_label, page_end):
+        node = self.section_parser._record_to_node(record, text, page_label)
+        if page_end != page_label:
+            node.metadata["page_end"] = page_end
+        return node
+
+
+def _join_chunks(chunks):
+    """(stripped text, first page label, last page label) of a section's chunks; labels are of non-blank chunks."""
+    text = PAGE_SEPARATOR.join(chunk for _, chunk in chunks).strip()
+    if not text:
+        return "", None, None
+    pages = [page_label for page_label, chunk in chunks if _NON_WHITESPACE.search(chunk)]
+    return text, pages[0], pages[-1]
+
+
+# --- Worker side: each process keeps the grammar (and the open PDF) between batches ---
+_worker_heading_grammar = None
+_worker_pdf = None
+
+def _init_page_worker(heading_grammar, trace=False):
+    global _worker_heading_grammar, _worker_pdf
+    if trace:
+        instrumentation.reset()
+        instrumentation.enable()
+    _worker_heading_grammar = heading_grammar
+    _worker_pdf = None
+
+def _scan_pdf_batch(file_name, first, last):
+    """Loads and scans pages [first, last) of a PDF; returns (lead, sections, the worker's instrumentation)."""
+    global _worker_pdf
+    if _worker_pdf is None or _worker_pdf[0] != file_name:
+        import pypdf
+        _worker_pdf = (file_name, pypdf.PdfReader(file_name))
+    with instrumentation.span("pdf.load", file=file_name, first=first, last=last):
+        pages = load_pages(file_name, first, last, reader=_worker_pdf[1])
+    with instrumentation.span("page_batch.scan", pages=len(pages)):
+        lead, sections = scan_pages(_worker_heading_grammar, pages)
+    return lead, sections, instrumentation.drain()
+
+def _scan_text_batch(pages):
+    with instrumentation.span("page_batch.scan", pages=len(pages)):
+        lead, sections = scan_pages(_worker_heading_grammar, pages)
+    return lead, sections, instrumentation.drain()
+
+
+def _batch_bounds(total_pages, max_workers, batch_pages):
+    if batch_pages is None:
+        # A few batches per worker evens out pages of different sizes, without much merge overhead
+        batch_pages = max(1, -(-total_pages // (4 * max_workers)))
+    return [(first, min(first + batch_pages, total_pages)) for first in range(0, total_pages, batch_pages)]
+
+
+def _iter_stitched(section_parser, doc_key, scanned_batches):
+    stitcher = HierarchyStitcher(section_parser, doc_key)
+    node_count = 0
+    for lead, sections, trace in scanned_batches:
+        instrumentation.merge(trace)
+        with instrumentation.span("page_batch.stitch", headings=len(sections)):
+            nodes = list(stitcher.add_batch(lead, sections))
+        node_count += len(nodes)
+        yield from nodes
+    nodes = list(stitcher.finish())
+    instrumentation.count("nodes_emitted", node_count + len(nodes))
+    yield from nodes
+
+
+def parse_pdf_pages(file_name, section_parser=None, max_workers=None, batch_pages=None, content_hash=None):
+    """
+    Yields the TextNodes of one PDF, parsed page batch by page batch in a process pool and stitched
+    into one document-wide hierarchy (see the module docstring). Node IDs are seeded by the file's
+    content hash, as in extract_section_from_data.
+    """
+    if section_parser is None:
+        section_parser = SectionNodeParser()
+    if content_hash is None:
+        content_hash = file_content_hash(file_name)
+    total_pages = page_count(file_name)
+    instrumentation.count("pages", total_pages)
+    instrumentation.count("bytes", os.path.getsize(file_name))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    bounds = _batch_bounds(total_pages, max_workers, batch_pages)
+    max_workers = max(1, min(max_workers, len(bounds)))
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_page_worker,
+        initargs=(section_parser._heading_grammar, instrumentation.is_enabled()),
+    ) as executor:
+        # map() hands results back in page order, as soon as each next batch is done
+        scanned = executor.map(_scan_pdf_batch, [file_name] * len(bounds),
+                               [first for first, _ in bounds], [last for _, last in bounds])
+        yield from _iter_stitched(section_parser, f"{content_hash}|document", scanned)
+
+
+def parse_document_pages(documents, section_parser=None, max_workers=None, batch_pages=None):
+    """
+    parse_pdf_pages for pages that are already loaded: one Document per page, in page order
+    (e.g. from SimpleDirectoryReader). max_workers=1 scans in this process. Scanning loaded text is
+    cheap next to extracting it, so the pool mostly pays off in parse_pdf_pages.
+    """
+    if section_parser is None:
+        section_parser = SectionNodeParser()
+    documents = list(documents)
+    pages = [(doc.metadata.get("page_label", "N/A"), doc.text) for doc in documents]
+    content_hash = documents[0].metadata.get("content_hash") if documents else None
+    if content_hash is None:
+        content_hash = hashlib.sha256(PAGE_SEPARATOR.join(text for _, text in pages).encode("utf-8")).hexdigest()
+    doc_key = f"{content_hash}|document"
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    bounds = _batch_bounds(len(pages), max_workers, batch_pages)
+
+    if max_workers == 1 or len(bounds) <= 1:
+        grammar = section_parser._heading_grammar
+        scanned = (scan_pages(grammar, pages[first:last]) + (None,) for first, last in bounds)
+        yield from _iter_stitched(section_parser, doc_key, scanned)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(bounds)),
+        initializer=_init_page_worker,
+        initargs=(section_parser._heading_grammar, instrumentation.is_enabled()),
+    ) as executor:
+        scanned = executor.map(_scan_text_batch, (pages[first:last] for first, last in bounds))
+        yield from _iter_stitched(section_parser, doc_key, scanned)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache for LlamaParse results.
+
+Entries are keyed by the PDF's content hash plus the parser options that affect the output
+(result_type, page_separator, system_prompt_append, schema, ...), so an unchanged PDF parsed
+with the same options is read back from disk instead of being uploaded again.
+Writes are atomic (temp file + rename); the cache is kept under max_bytes by evicting the
+least recently used entries (an entry's mtime is bumped on every hit).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .ingest_manifest import file_content_hash
+from . import instrumentation
+
+
+class ParseCache:
+
+    def __init__(self, directory=".llamaparse_cache", max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, file_name, options):
+        options_json = json.dumps(options, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{file_content_hash(file_name)}\n{options_json}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, file_name, options):
+        """Returns the cached list of document texts, or None on a miss."""
+        path = self._path(self.key(file_name, options))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            instrumentation.count("parse_cache_misses")
+            return None
+        # Mark as recently used for LRU eviction
+        os.utime(path)
+        self.hits += 1
+        instrumentation.count("parse_cache_hits")
+        return entry["documents"]
+
+    def put(self, file_name, options, documents):
+        """Stores a list of document texts for (file_name contents, options)."""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"file_name": os.path.basename(file_name), "options": options, "documents": list(documents)}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(self.key(file_name, options)))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def _entries(self):
+        """[(mtime, size, path)] for every cache entry."""
+        entries = []
+        for dir_entry in os.scandir(self.directory):
+            if dir_entry.name.endswith(".json"):
+                stat = dir_entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        # Oldest access first
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for _, _, path in self._entries():
+                os.remove(path)
+
+    def stats(self):
+        entries = self._entries() if os.path.isdir(self.directory) else []
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
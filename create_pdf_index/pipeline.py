@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Staged PDF -> markdown -> cleaned markdown -> sections -> TOC pipeline with per-stage caching.
+
+Each Stage declares the artifacts it reads and the one it writes. A stage's output is cached
+under a fingerprint of (its input fingerprints, its code, its config), so after changing one
+late stage (or its config) only that stage and the ones after it re-run; everything upstream
+is served from .pipeline_cache/. Independent documents are run in parallel processes.
+
+Run: pdf-index-pipeline [pdf files or directories ...]
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .ingest_manifest import file_content_hash
+from . import instrumentation
+
+
+class Stage:
+    """
+    One pipeline step: func(*input_paths, output_path, **config).
+    inputs: names of artifacts it reads ("pdf" is the source document); output: name of the artifact it writes.
+    code_modules: modules whose source is part of the fingerprint (the module defining func always is);
+    names are resolved relative to this package, and their source is read without importing them.
+    """
+
+    def __init__(self, name, func, inputs, output, suffix, config=None, code_modules=(), export_suffix=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.output = output
+        self.suffix = suffix
+        self.config = dict(config or {})
+        self.code_modules = tuple(code_modules)
+        self.export_suffix = export_suffix
+        self._code_hash = None
+
+    def code_hash(self):
+        # Source of the module defining func plus any declared modules, so edits to the stage
+        # (or to the code it calls) invalidate its cached outputs
+        if self._code_hash is None:
+            sha = hashlib.sha256(self.func.__qualname__.encode("utf-8"))
+            module_names = [self.func.__module__] + [f"{__package__}.{name}" for name in self.code_modules]
+            for module_name in module_names:
+                spec = importlib.util.find_spec(module_name)
+                with open(spec.origin, "rb") as f:
+                    sha.update(f.read())
+            self._code_hash = sha.hexdigest()
+        return self._code_hash
+
+    def fingerprint(self, input_fingerprints):
+        key = json.dumps([self.name, self.code_hash(), self.config, list(input_fingerprints)], sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# --- Stage functions ---
+# The heavy modules are imported inside the functions, so a run that hits the cache never loads them.
+
+def markdown_stage(pdf_path, output_path):
+    from .read_pdf_with_llama_parse import parse_pdf_to_markdown_texts
+    doc_texts = parse_pdf_to_markdown_texts(pdf_path)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for doc_text in doc_texts:
+            f.write(doc_text)
+
+def clean_markdown_stage(markdown_path, output_path, page_delimiter_base="---PAGE_BREAK__",
+                         header_footer_threshold_percentage=0.75, header_footer_max_words=10):
+    from .proccess_markdown_data import pre_process_llamaparse_markdown_streaming
+    pre_process_llamaparse_markdown_streaming(
+        markdown_path, output_path, page_delimiter_base=page_delimiter_base,
+        header_footer_threshold_percentage=header_footer_threshold_percentage,
+        header_footer_max_words=header_footer_max_words,
+    )
+
+def sections_stage(markdown_path, output_path):
+    from .read_pdf_with_llama_parse import parse_markdown_to_sections
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        sections = parse_markdown_to_sections(f.read())
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"sections": sections}, f, indent=4, ensure_ascii=False)
+
+def toc_stage(sections_path, output_path):
+    from .table_of_content_from_metadata import toc_from_sections
+    with open(sections_path, "r", encoding="utf-8") as f:
+        sections = json.load(f)["sections"]
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(toc_from_sections(sections), f, indent=2, ensure_ascii=False)
+
+
+DEFAULT_STAGES = (
+    Stage("markdown", markdown_stage, ["pdf"], "markdown", ".md",
+          code_modules=["read_pdf_with_llama_parse", "parse_cache"], export_suffix=".md"),
+    Stage("clean_markdown", clean_markdown_stage, ["markdown"], "clean_markdown", ".md",
+          config={"page_delimiter_base": "---PAGE_BREAK__"},
+          code_modules=["proccess_markdown_data"], export_suffix="_clean.md"),
+    Stage("sections", sections_stage, ["clean_markdown"], "sections", ".json",
+          code_modules=["read_pdf_with_llama_parse"], export_suffix=".json"),
+    Stage("toc", toc_stage, ["sections"], "toc", ".json",
+          code_modules=["table_of_content_from_metadata"], export_suffix="_toc.json"),
+)
+
+
+def run_document(pdf_path, stages=DEFAULT_STAGES, cache_dir=".pipeline_cache", out_dir=None):
+    """
+    Runs the stages for one document. Returns {stage name: "cached" | "ran"} and
+    {artifact name: path}. With out_dir, each stage's output is also copied there as
+    <document name><export_suffix>.
+    """
+    artifacts = {"pdf": pdf_path}
+    fingerprints = {"pdf": file_content_hash(pdf_path)}
+    status = {}
+
+    for stage in stages:
+        fingerprint = stage.fingerprint(fingerprints[name] for name in stage.inputs)
+        stage_dir = os.path.join(cache_dir, stage.name)
+        output_path = os.path.join(stage_dir, fingerprint + stage.suffix)
+
+        if os.path.exists(output_path):
+            status[stage.name] = "cached"
+            instrumentation.count("pipeline_cache_hits")
+        else:
+            os.makedirs(stage_dir, exist_ok=True)
+            # Write under a temporary name and rename, so a crash never leaves a "cached" partial output
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+            try:
+                with instrumentation.span(f"stage.{stage.name}", file=pdf_path):
+                    stage.func(*(artifacts[name] for name in stage.inputs), tmp_path, **stage.config)
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            status[stage.name] = "ran"
+            instrumentation.count("pipeline_cache_misses")
+
+        artifacts[stage.output] = output_path
+        fingerprints[stage.output] = fingerprint
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        document_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        for stage in stages:
+            if stage.export_suffix:
+                shutil.copyfile(artifacts[stage.output], os.path.join(out_dir, document_name + stage.export_suffix))
+
+    return status, artifacts
+
+
+def _init_pipeline_worker(trace=False):
+    if trace:
+        # A forked worker starts with a copy of the parent's spans; only send back its own
+        instrumentation.reset()
+        instrumentation.enable()
+
+def _run_document_in_worker(pdf_path, stages, cache_dir, out_dir):
+    try:
+        status, artifacts = run_document(pdf_path, stages, cache_dir, out_dir)
+        return pdf_path, status, None, instrumentation.drain()
+    except Exception:
+        return pdf_path, None, traceback.format_exc(), instrumentation.drain()
+
+
+def run_pipeline(pdf_paths, stages=DEFAULT_STAGES, cache_dir=".pipeline_cache", out_dir=".", max_workers=None):
+    """
+    Runs run_document for every PDF, in parallel processes. Prints per-document stage status
+    and returns {pdf_path: traceback_text} for the documents that failed.
+    """
+    pdf_paths = list(pdf_paths)
+    failures = {}
+    if not pdf_paths:
+        return failures
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(pdf_paths)))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pipeline_worker,
+                             initargs=(instrumentation.is_enabled(),)) as executor:
+        futures = [executor.submit(_run_document_in_worker, pdf_path, stages, cache_dir, out_dir)
+                   for pdf_path in pdf_paths]
+        for done, future in enumerate(as_completed(futures), start=1):
+            pdf_path, status, error, trace = future.result()
+            instrumentation.merge(trace)
+            if error is None:
+                summary = ", ".join(f"{name}: {state}" for name, state in status.items())
+                print(f"[{done}/{len(pdf_paths)}] {pdf_path} ({summary})")
+            else:
+                failures[pdf_path] = error
+                print(f"[{done}/{len(pdf_paths)}] FAILED {pdf_path}\n{error}")
+    return failures
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run the PDF -> markdown -> sections -> TOC pipeline.")
+    arg_parser.add_argument("paths", nargs="*", default=["source"], help="PDF files or directories of PDFs")
+    arg_parser.add_argument("--out-dir", default=".", help="where the final artifacts are copied")
+    arg_parser.add_argument("--cache-dir", default=".pipeline_cache")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--trace", help="write timings and counters to this file")
+    arg_parser.add_argument("--trace-format", choices=("json", "chrome"), default="json")
+    args = arg_parser.parse_args(argv)
+    if args.trace:
+        instrumentation.enable()
+
+    pdf_paths = []
+    for path in args.paths:
+        pdf_paths.extend(sorted(glob.glob(os.path.join(path, "*.pdf"))) if os.path.isdir(path) else [path])
+    failures = run_pipeline(pdf_paths, cache_dir=args.cache_dir, out_dir=args.out_dir, max_workers=args.workers)
+    if args.trace:
+        instrumentation.export(args.trace, args.trace_format)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
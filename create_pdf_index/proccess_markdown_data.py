@@ -0,0 +1,334 @@
+import re
+from collections import Counter, deque
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from . import instrumentation
+
+
+@instrumentation.traced("preprocess")
+def pre_process_llamaparse_markdown_with_header_footer_removal_and_robust_page_breaks(
+    markdown_text, 
+    page_delimiter_base="---PAGE_BREAK___", # Base string for the delimiter
+    header_footer_threshold_percentage=0.75, # e.g., 75% of pages
+    header_footer_max_words=10 # Heuristic: headers/footers usually short
+):
+    # Regex to find the page delimiter, allowing for page number and surrounding text/whitespace
+    # It captures the full line containing the page break, so we can clean it later.
+    page_delimiter_regex = re.compile(rf'.*{re.escape(page_delimiter_base)}\d*.*', re.IGNORECASE)
+
+    # Split the document into lines first to easily iterate and clean
+    lines = markdown_text.split('\n')
+    
+    # Identify page break lines and store their indices
+    page_break_line_indices = [i for i, line in enumerate(lines) if page_delimiter_regex.search(line)]
+
+    # If no page breaks detected, treat as a single page or handle accordingly
+    if not page_break_line_indices:
+        print("Warning: No distinct page breaks found. Treating document as a single page for header/footer analysis.")
+        pages_content = [lines] # List containing one list of lines
+    else:
+        # Reconstruct pages based on detected page break lines
+        pages_content = []
+        start_idx = 0
+        for pb_idx in page_break_line_indices:
+            pages_content.append(lines[start_idx:pb_idx])
+            start_idx = pb_idx + 1 # Start next page after the page break line
+        pages_content.append(lines[start_idx:]) # Add the last page
+
+    # --- Header/Footer Identification (from previous logic) ---
+    header_candidates = Counter()
+    footer_candidates = Counter()
+    
+    num_pages = len(pages_content)
+    if num_pages == 0: return "" # Handle empty document
+    
+    for page_lines_list in pages_content:
+        # Clean each page's lines: strip whitespace and remove empty lines for analysis
+        cleaned_page_lines = [line.strip() for line in page_lines_list if line.strip()]
+        _count_header_footer_candidates(cleaned_page_lines[:3], cleaned_page_lines[-3:],
+                                        header_candidates, footer_candidates)
+
+    common_headers, common_footers = _select_common_headers_footers(
+        header_candidates, footer_candidates, num_pages,
+        header_footer_threshold_percentage, header_footer_max_words
+    )
+    
+    # --- Main Processing Loop ---
+    processed_lines = []
+    
+    for line_idx, line in enumerate(lines):
+        stripped_line = line.strip()
+
+        # 1. Handle lines containing the page delimiter
+        if page_delimiter_regex.search(line):
+            # This line contains the page break. We want to replace it with a clean page break marker
+            # if we are actually splitting by pages for the downstream processing,
+            # or just remove it if we just want cleaned markdown.
+            # For header/footer removal, we usually just want to remove the full line.
+            # If you still want a clean page break for other reasons, uncomment the next line:
+            # processed_lines.append(page_delimiter_base.replace('___', '')) # e.g., ---PAGE_BREAK---
+            continue # Skip this line as it's a page break marker with attached text
+
+        # 2. Check if the line matches a common header or footer pattern
+        if stripped_line in common_headers or stripped_line in common_footers:
+            continue # Skip this line
+
+        # 3. Apply your existing heading correction rules (from previous pre_process_llamaparse_markdown)
+        processed_lines.append(_correct_heading_line(line))
+
+    return "\n".join(processed_lines)
+
+
+def _count_header_footer_candidates(first_lines, last_lines, header_candidates, footer_candidates):
+    # first_lines / last_lines: the first and last (up to) 3 stripped, non-empty lines of one page
+    for line in first_lines: # Check first N lines
+        header_candidates[line] += 1
+    for line in last_lines: # Check last N lines
+        footer_candidates[line] += 1
+
+def _select_common_headers_footers(header_candidates, footer_candidates, num_pages,
+                                   header_footer_threshold_percentage, header_footer_max_words):
+    header_footer_threshold = num_pages * header_footer_threshold_percentage
+    common_headers = {
+        h for h, count in header_candidates.items() 
+        if count >= header_footer_threshold and len(h.split()) < header_footer_max_words
+    }
+    common_footers = {
+        f for f, count in footer_candidates.items() 
+        if count >= header_footer_threshold and len(f.split()) < header_footer_max_words
+    }
+    return common_headers, common_footers
+
+_H2_LETTERED = re.compile(r'^##\s*\(([a-z])\)\s*(.*)')
+_H3_NUMBERED = re.compile(r'^###\s*\(([0-9])\)\s*(.*)')
+_H2_SECTION = re.compile(r'^##\s*(§\s*\d+\.\d+)\s*(.*)')
+
+def _correct_heading_line(line):
+    # Ensure these are robust enough not to accidentally convert headers/footers that were NOT removed
+    # but were very consistently formatted.
+
+    # If LlamaParse makes a lettered subsection into an H2
+    match_h2_lettered = _H2_LETTERED.match(line)
+    if match_h2_lettered:
+        return f"({match_h2_lettered.group(1)}) {match_h2_lettered.group(2)}"
+
+    # If LlamaParse makes a numbered sub-subsection into an H3
+    match_h3_numbered = _H3_NUMBERED.match(line)
+    if match_h3_numbered:
+        return f"({match_h3_numbered.group(1)}) {match_h3_numbered.group(2)}"
+
+    # If LlamaParse incorrectly makes a main section into an H2 instead of H1
+    match_h2_section = _H2_SECTION.match(line)
+    if match_h2_section:
+        return f"# {match_h2_section.group(1)} {match_h2_section.group(2)}"
+
+    # If none of the above, keep the line
+    return line
+
+
+# --- Streaming version: bounded memory for very large documents ---
+
+@instrumentation.traced("preprocess")
+def pre_process_llamaparse_markdown_streaming(
+    source,
+    output,
+    page_delimiter_base="---PAGE_BREAK___",
+    header_footer_threshold_percentage=0.75,
+    header_footer_max_words=10
+):
+    """
+    Same cleaning as pre_process_llamaparse_markdown_with_header_footer_removal_and_robust_page_breaks,
+    but in two streaming passes, so only about one page is in memory at a time:
+      pass 1 counts header/footer candidates page by page,
+      pass 2 writes the cleaned lines to `output` as it goes.
+    source: a file path, a callable returning a fresh iterable, or a one-shot iterable (spooled to a
+            temporary file, one line per line, during pass 1). An iterable may give lines or
+            multi-line chunks such as pages, with or without their trailing newline: each item is
+            taken as whole lines, and a newline at the end of the last item ends the text with one.
+    output: a file path or a writable text file object.
+    The text written is identical to what the in-memory function returns.
+    Returns a dict with the page count and the header/footer lines that were removed.
+    """
+    page_delimiter_regex = re.compile(rf'.*{re.escape(page_delimiter_base)}\d*.*', re.IGNORECASE)
+    spool = None
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            open_lines = lambda: _iter_split_lines(open(source, 'r', encoding='utf-8'))
+        elif callable(source):
+            open_lines = lambda: _iter_split_lines(source())
+        else:
+            # A plain iterable can only be read once: keep a copy on disk for the second pass
+            spool = tempfile.TemporaryFile('w+', encoding='utf-8', newline='\n')
+            first_pass_lines = _tee_to_file(source, spool)
+            def open_lines():
+                spool.seek(0)
+                return (line[:-1] for line in spool)
+
+        # --- Pass 1: header/footer candidates, one page at a time ---
+        header_candidates = Counter()
+        footer_candidates = Counter()
+        num_pages = 0
+        page_breaks = 0
+        first_lines = []
+        last_lines = deque(maxlen=3)
+        for line in (first_pass_lines if spool is not None else open_lines()):
+            if page_delimiter_regex.search(line):
+                _count_header_footer_candidates(first_lines, last_lines, header_candidates, footer_candidates)
+                num_pages += 1
+                page_breaks += 1
+                first_lines = []
+                last_lines.clear()
+                continue
+            stripped_line = line.strip()
+            if stripped_line:
+                if len(first_lines) < 3:
+                    first_lines.append(stripped_line)
+                last_lines.append(stripped_line)
+        _count_header_footer_candidates(first_lines, last_lines, header_candidates, footer_candidates)
+        num_pages += 1
+
+        if page_breaks == 0:
+            print("Warning: No distinct page breaks found. Treating document as a single page for header/footer analysis.")
+
+        common_headers, common_footers = _select_common_headers_footers(
+            header_candidates, footer_candidates, num_pages,
+            header_footer_threshold_percentage, header_footer_max_words
+        )
+        del header_candidates, footer_candidates
+
+        # --- Pass 2: write cleaned lines incrementally ---
+        out = open(output, 'w', encoding='utf-8') if isinstance(output, (str, os.PathLike)) else output
+        try:
+            first = True
+            for line in open_lines():
+                if page_delimiter_regex.search(line):
+                    continue
+                stripped_line = line.strip()
+                if stripped_line in common_headers or stripped_line in common_footers:
+                    continue
+                if not first:
+                    out.write("\n")
+                out.write(_correct_heading_line(line))
+                first = False
+        finally:
+            if out is not output:
+                out.close()
+    finally:
+        if spool is not None:
+            spool.close()
+
+    instrumentation.count("preprocess_pages", num_pages)
+    return {"pages": num_pages, "headers": sorted(common_headers), "footers": sorted(common_footers)}
+
+def _iter_split_lines(items):
+    """
+    Turns an iterable of lines or multi-line chunks into exactly the pieces
+    markdown_text.split('\n') would give. Each item is one or more whole lines whose trailing
+    newline is optional; a newline at the end of the last item gives the final '' of a text that
+    ends with a newline (as for the lines read from a file). Closes `items` when done if it is a file.
+    """
+    try:
+        last = None
+        for last in items:
+            yield from (last[:-1] if last.endswith('\n') else last).split('\n')
+        if last is None or last.endswith('\n'):
+            yield ''
+    finally:
+        close = getattr(items, 'close', None)
+        if close is not None:
+            close()
+
+def _tee_to_file(items, spool):
+    """Yields the lines of `items` (see _iter_split_lines), writing each one to `spool` with a '\n' after it."""
+    for line in _iter_split_lines(items):
+        spool.write(line + '\n')
+        yield line
+
+# --- Example Usage (modified) ---
+# Ensure you configure LlamaParse with `page_separator` that includes `{pageNumber}`
+# Example LlamaParse initialization:
+# parser = LlamaParse(
+#     api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
+#     result_type="markdown",
+#     page_separator="---PAGE_BREAK__{pageNumber}---", # This will be the base delimiter
+#     system_prompt_append=(
+#         "Prioritize '§ X.X' as the highest level heading (level 1). "
+#         "Lines starting with '(a)', '(b)', '(c)' should always be treated as nested subsections "
+#         "under the nearest '§ X.X' section, and should not be standalone headings. "
+#         "Lines starting with '(1)', '(2)', '(3)' should always be treated as sub-subsections "
+#         "under the nearest '(a)/(b)/...' subsection."
+#     )
+# )
+# documents = parser.load_data(file_path="your_input_document.pdf")
+# raw_llamaparse_markdown = documents[0].text
+
+# For demonstration, simulating the problematic LlamaParse output
+_EXAMPLE_LLAMAPARSE_MARKDOWN = """
+(n) Assent means a child's affirmative agreement to participate in a clinical investigation. Mere failure to object should not, absent affirmative agreement, be construed as assent.
+
+21 CFR 50.23(d)(4) (enhanced display) page 8 of 17---PAGE_BREAK__9---21 CFR Part 50 (up to date as of 5/02/2025)
+
+# § 50.3 Definitions
+This is content for section 50.3.
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean LlamaParse markdown (page breaks, repeated headers/footers) and extract its sections.")
+    parser.add_argument("markdown_file", nargs="?", help="raw LlamaParse markdown; the built-in example when omitted")
+    # Base of the page delimiter used in LlamaParse (note the double underscore)
+    parser.add_argument("--page-delimiter-base", default="---PAGE_BREAK__")
+    parser.add_argument("--output", default="extracted_regulatory_sections_from_markdown_fixed.json")
+    args = parser.parse_args(argv)
+
+    # The section parser lives with the LlamaParse reader; its import does not load llama_parse
+    from .read_pdf_with_llama_parse import parse_markdown_to_sections
+
+    # --- Main script flow ---
+    # 1. Read (or save) the raw LlamaParse output
+    if args.markdown_file:
+        with open(args.markdown_file, 'r', encoding='utf-8') as f:
+            raw_llamaparse_markdown = f.read()
+        document_title = os.path.splitext(os.path.basename(args.markdown_file))[0]
+    else:
+        raw_llamaparse_markdown = _EXAMPLE_LLAMAPARSE_MARKDOWN
+        document_title = "Example_CFR_Section_Parsed_Fixed"
+        intermediate_markdown_file_path = "intermediate_llamaparse_output.md"
+        with open(intermediate_markdown_file_path, 'w', encoding='utf-8') as f:
+            f.write(raw_llamaparse_markdown)
+        print(f"Raw LlamaParse (or initial) markdown saved to '{intermediate_markdown_file_path}'")
+
+    # 2. Apply robust pre-processing (including header/footer removal and page break handling)
+    cleaned_markdown_content = pre_process_llamaparse_markdown_with_header_footer_removal_and_robust_page_breaks(
+        raw_llamaparse_markdown, 
+        page_delimiter_base=args.page_delimiter_base
+    )
+
+    # 3. Save the pre-processed markdown
+    preprocessed_markdown_file_path = "preprocessed_markdown_for_json_parser.md"
+    with open(preprocessed_markdown_file_path, 'w', encoding='utf-8') as f:
+        f.write(cleaned_markdown_content)
+    print(f"Pre-processed markdown saved to '{preprocessed_markdown_file_path}'")
+
+    # 4. Parse the cleaned markdown content into JSON
+    extracted_sections_json = parse_markdown_to_sections(cleaned_markdown_content)
+
+    # 5. Wrap it in the desired top-level JSON structure and save
+    final_json_output = {
+        "document_title": document_title,
+        "sections": extracted_sections_json
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(final_json_output, f, indent=4, ensure_ascii=False)
+
+    print(f"Final structured JSON saved to '{args.output}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+# This file reads a pdf document with Llama parse library, and stores the data in local
+# (llama_parse is imported only when a PDF actually has to be parsed, so cache hits and the
+# markdown-only helpers never load it)
+import argparse
+import time
+import json
+import os
+import re
+import sys
+import glob
+import asyncio
+import statistics
+from .parse_cache import ParseCache
+from .rate_limit import TokenBucket
+from .credentials import llama_cloud_api_key
+from . import instrumentation
+
+# Default input of the command line run
+# file_name = "source/ich-gcp-r2-step-5.pdf"
+# file_name = "source/21 CFR Part 50_test.pdf"
+DEFAULT_FILE_NAME = "source/21 CFR Part 50.pdf"
+
+def _llama_parse(**kwargs):
+    from llama_parse import LlamaParse
+    return LlamaParse(api_key=llama_cloud_api_key(), **kwargs)
+
+def _extracted_name(file_name):
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+# Parsed results are cached on disk by PDF content hash + parser options,
+# so re-running on an unchanged PDF does not upload it to LlamaParse again.
+# Pass cache=None to the read_* functions to always re-parse.
+parse_cache = ParseCache()
+
+# LlamaParse options for markdown conversion.
+# Everything here changes the parsed output, so it is all part of the cache key
+MARKDOWN_PARSE_OPTIONS = dict(
+   result_type="markdown",  # "markdown" and "text" are available
+   page_separator="---PAGE_BREAK__{pageNumber}---",
+   system_prompt_append=("Prioritize '§ X.X' as the highest level heading (level 1). Lines starting with '(a)', '(b)', '(c)' should always be treated as nested subsections under the nearest '§ X.X' section, and should not be standalone headings. Lines starting with '(1)', '(2)', '(3)' should always be treated as sub-subsections under the nearest '(a)/(b)/...' subsection."),
+   )
+
+def read_as_markdown(file_name, cache=parse_cache):
+    
+    doc_texts = parse_pdf_to_markdown_texts(file_name, cache=cache)
+
+    # Write the output to a file
+    fname = _extracted_name(file_name)+".md"
+    with open(fname, "w", encoding="utf-8") as f:
+       for doc_text in doc_texts:
+           f.write(doc_text)
+
+def parse_pdf_to_markdown_texts(file_name, cache=parse_cache, extra_info=None):
+    """Markdown text of each parsed document of file_name (from the parse cache when possible)."""
+    parse_options = MARKDOWN_PARSE_OPTIONS
+    doc_texts = cache.get(file_name, parse_options) if cache is not None else None
+
+    if doc_texts is None:
+        parser = _llama_parse(
+           verbose = True,
+           **parse_options
+           )
+        with instrumentation.span("llamaparse.load", file=file_name), open(file_name, "rb") as f:
+           # must provide extra_info with file_name key with passing file object
+           documents = parser.load_data(f, extra_info=extra_info or {"file_name": file_name})
+        instrumentation.count("pages", len(documents))
+        instrumentation.count("bytes", os.path.getsize(file_name))
+        doc_texts = [doc.text for doc in documents]
+        if cache is not None:
+            cache.put(file_name, parse_options, doc_texts)
+    return doc_texts
+
+async def read_many_as_markdown(file_names, out_dir=".", max_in_flight=4, requests_per_minute=60,
+                                cache=parse_cache, parse_file=None, base_url=None):
+    """
+    Converts many PDFs to markdown concurrently, writing <out_dir>/<name>.md as each one finishes.
+    - max_in_flight: how many files are being parsed at the same time
+    - requests_per_minute: token-bucket limit on new uploads, to stay inside the API quota
+    - parse_file: optional coroutine file_name -> list of page texts, replacing LlamaParse
+      (e.g. a local stand-in for offline runs); base_url points LlamaParse at another server
+    Returns a summary dict with throughput and per-file latencies.
+    """
+    if parse_file is None:
+        parser_kwargs = {"base_url": base_url} if base_url else {}
+        parser = _llama_parse(verbose=False, **parser_kwargs, **MARKDOWN_PARSE_OPTIONS)
+
+        async def parse_file(file_name):
+            documents = await parser.aload_data(file_name, extra_info={"file_name": file_name})
+            return [doc.text for doc in documents]
+
+    limiter = TokenBucket.per_minute(requests_per_minute)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    os.makedirs(out_dir, exist_ok=True)
+    latencies = {}
+
+    async def convert(file_name):
+        try:
+            doc_texts = cache.get(file_name, MARKDOWN_PARSE_OPTIONS) if cache is not None else None
+            if doc_texts is None:
+                async with in_flight:
+                    await limiter.acquire()
+                    start = time.perf_counter()
+                    doc_texts = await parse_file(file_name)
+                    latencies[file_name] = time.perf_counter() - start
+                if cache is not None:
+                    cache.put(file_name, MARKDOWN_PARSE_OPTIONS, doc_texts)
+            out_file = os.path.join(out_dir, os.path.splitext(os.path.basename(file_name))[0] + ".md")
+            with open(out_file, "w", encoding="utf-8") as f:
+                for doc_text in doc_texts:
+                    f.write(doc_text)
+            return file_name, None
+        except Exception as e:
+            return file_name, e
+
+    tic = time.perf_counter()
+    failures = {}
+    total = len(file_names)
+    for done, task in enumerate(asyncio.as_completed([convert(f) for f in file_names]), start=1):
+        file_name, error = await task
+        if error is None:
+            print(f"[{done}/{total}] {file_name} ({latencies.get(file_name, 0.0):.1f}s)")
+        else:
+            failures[file_name] = error
+            print(f"[{done}/{total}] FAILED {file_name}: {error}")
+    wall_time = time.perf_counter() - tic
+
+    times = sorted(latencies.values())
+    summary = {
+        "files": total,
+        "succeeded": total - len(failures),
+        "failed": len(failures),
+        "cache_hits": total - len(failures) - len(times),
+        "wall_time_s": wall_time,
+        "files_per_minute": 60.0 * (total - len(failures)) / wall_time if wall_time else 0.0,
+        "latency_s": {
+            "min": times[0] if times else None,
+            "median": statistics.median(times) if times else None,
+            "p95": times[min(len(times) - 1, int(0.95 * len(times)))] if times else None,
+            "max": times[-1] if times else None,
+        },
+        "per_file_latency_s": latencies,
+        "failures": {f: repr(e) for f, e in failures.items()},
+    }
+    print(f"Converted {summary['succeeded']}/{total} file(s) in {wall_time:.1f}s "
+          f"({summary['files_per_minute']:.1f} files/min, {summary['cache_hits']} from cache)")
+    return summary
+
+def read_directory_as_markdown(directory, **kwargs):
+    """Blocking wrapper: converts every PDF in `directory` with read_many_as_markdown."""
+    pdf_files = sorted(glob.glob(os.path.join(directory, "*.pdf")))
+    return asyncio.run(read_many_as_markdown(pdf_files, **kwargs))
+           
+def pre_process_llamaparse_markdown(markdown_text):
+    lines = markdown_text.split('\n')
+    processed_lines = []
+
+    for line in lines:
+        # Check for lines that LlamaParse might have incorrectly made into '##' (H2)
+        # but should be just '(a)' or '(b)' etc.
+        match_h2_lettered = re.match(r'^##\s*\(([a-z])\)\s*(.*)', line)
+        if match_h2_lettered:
+            # Revert to just the (a) format, removing the '##'
+            processed_lines.append(f"({match_h2_lettered.group(1)}) {match_h2_lettered.group(2)}")
+            continue
+
+        # Check for lines that LlamaParse might have incorrectly made into '###' (H3)
+        # but should be just '(1)' or '(2)' etc.
+        match_h3_numbered = re.match(r'^###\s*\(([0-9])\)\s*(.*)', line)
+        if match_h3_numbered:
+            # Revert to just the (1) format, removing the '###'
+            processed_lines.append(f"({match_h3_numbered.group(1)}) {match_h3_numbered.group(2)}")
+            continue
+
+        # You might also need to adjust if it makes '§ X.X' into '##' instead of '#':
+        match_h2_section = re.match(r'^##\s*(§\s*\d+\.\d+)\s*(.*)', line)
+        if match_h2_section:
+            # Change '##' to '#' for main sections if they are identified as H2
+            processed_lines.append(f"# {match_h2_section.group(1)} {match_h2_section.group(2)}")
+            continue
+
+        # Add other specific clean-up rules as you observe patterns in LlamaParse's output
+        # For example, if it adds extra blank lines or odd characters.
+
+        processed_lines.append(line)
+        
+    # Save the raw LlamaParse output (or your initial markdown content)
+    with open("chk.md", 'w', encoding='utf-8') as f:
+        f.write("\n".join(processed_lines))
+    # print(f"Raw LlamaParse (or initial) markdown saved to '{intermediate_markdown_file_path}'")
+
+    return "\n".join(processed_lines)
+
+# --- How to integrate this ---
+# 1. Get markdown_content from LlamaParse
+# markdown_content = llamaparse_response_data
+
+# 2. Pre-process the markdown
+# cleaned_markdown_content = pre_process_llamaparse_markdown(markdown_content)
+
+# 3. Then pass to your fixed parser
+# extracted_sections_json = parse_regulatory_markdown_to_sections_fixed(cleaned_markdown_content)
+
+def read_pdf_as_json(file_name, cache=parse_cache):   
+    json_schema_dict_simple = {
+        "type": "object",
+        "properties": {
+            "document_title": {"type": "string"},
+            "parts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "heading": {"type": "string"},
+                        "text_content": {"type": "string"}
+                    },
+                    "required": ["heading", "text_content"]
+                }
+            }
+        },
+        "required": ["document_title", "parts"]
+    }
+    json_schema_string_simple = json.dumps(json_schema_dict_simple)
+    # Pass this simple string to LlamaParse
+
+    json_schema_dict = {
+        "type": "object",
+        "properties": {
+            "document_title": {"type": "string"},
+            "sections": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "content": {"type": "string"},
+                        "subsections": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "title": {"type": "string"},
+                                    "content": {"type": "string"},
+                                    # You can nest further if needed
+                                },
+                                "required": ["title", "content"]
+                            }
+                        }
+                    },
+                    "required": ["title", "content"]
+                }
+            }
+        },
+        "required": ["document_title", "sections"]
+    }
+
+    # Convert the Python dictionary schema to a JSON string
+    json_schema_string = json.dumps(json_schema_dict)
+        
+    # The options (including the schema) are the cache key along with the PDF contents
+    parse_options = dict(
+        result_type="json", # Request JSON output
+        structured_output_json_schema=json_schema_string_simple, # Provide your schema
+        # Add any other parsing options here, e.g., for tables, etc.
+    )
+    
+    tic = time.time()
+    
+    try:
+        doc_texts = cache.get(file_name, parse_options) if cache is not None else None
+        if doc_texts is None:
+            parser = _llama_parse(
+                verbose=True,
+                **parse_options
+            )
+            with open(f"./{file_name}", "rb") as f:
+                # Load data with the parser. It will attempt to match the schema.
+                documents = parser.load_data(f, extra_info={"file_name": file_name})
+            doc_texts = [doc.text for doc in documents]
+            if cache is not None:
+                cache.put(file_name, parse_options, doc_texts)
+    
+        # LlamaParse returns a list of Document objects.
+        # When `result_type="json"` and `structured_output_json_schema` is used,
+        # the `doc.text` will contain the JSON string.
+    
+        parsed_json_data = []
+        for doc_text in doc_texts:
+            try:
+                # The 'text' attribute of the document will contain the JSON string
+                json_content = json.loads(doc_text)
+                parsed_json_data.append(json_content)
+            except json.JSONDecodeError as e:
+                print(f"Error decoding JSON from LlamaParse output: {e}")
+                print(f"Problematic text: {doc_text[:500]}...") # Print first 500 chars for debugging
+                # If parsing fails for a doc, you might want to log it or handle it.
+    
+        # Write the extracted JSON to a file
+        output_json_file = _extracted_name(file_name) + ".json"
+        with open(output_json_file, "w", encoding="utf-8") as f:
+            json.dump(parsed_json_data, f, indent=4, ensure_ascii=False)
+    
+        print(f"Extracted content and sections saved to '{output_json_file}'")
+    
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        print("Please ensure your LLAMA_CLOUD_API_KEY is correctly set.")
+    
+    toc = time.time()
+    print(f"time: {toc-tic}")   
+
+
+# A markdown (ATX) heading: 1-6 '#' characters, then the title
+_MARKDOWN_HEADING = re.compile(r'^(#{1,6})(?!#)\s*(.*)')
+
+@instrumentation.traced("sectionize")
+def parse_markdown_to_sections(markdown_text, include_preamble=True):
+    """
+    Parses markdown text into a hierarchical dictionary based on headings.
+    Handles H1-H6 at any depth in a single pass over the lines: every section is
+    {"title", "level", "content", "subsections"}, nested under the nearest preceding
+    heading of a higher level (a skipped level, e.g. H1 -> H3, nests directly under the H1).
+    Content before the first heading becomes a level 0 "Preamble" section.
+    """
+    sections_data = []
+    all_sections = []
+    # Open sections, levels strictly increasing from bottom to top: (level, section)
+    stack = []
+    # Content lines are collected in lists and joined once at the end (no repeated string +=)
+    preamble_lines = []
+    current_lines = preamble_lines
+
+    for line in markdown_text.split('\n'):
+        heading_match = _MARKDOWN_HEADING.match(line) if line.startswith('#') else None
+        if heading_match is None:
+            # This line is content. Append it to the deepest active section/subsection.
+            current_lines.append(line)
+            continue
+
+        level = len(heading_match.group(1))
+        current_lines = []
+        section = {"title": heading_match.group(2).strip(), "level": level,
+                   "content": current_lines, "subsections": []}
+        all_sections.append(section)
+
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        (stack[-1][1]["subsections"] if stack else sections_data).append(section)
+        stack.append((level, section))
+
+    # Post-processing: Clean up content (remove excessive newlines, leading/trailing whitespace)
+    for section in all_sections:
+        section["content"] = "\n".join(section["content"]).strip()
+
+    instrumentation.count("headings_matched", len(all_sections))
+
+    preamble = "\n".join(preamble_lines).strip()
+    if include_preamble and preamble:
+        sections_data.insert(0, {"title": "Preamble", "level": 0, "content": preamble, "subsections": []})
+
+    return sections_data
+
+# --- Example Usage ---
+
+# Write the main function to read the PDF and convert it to markdown
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a PDF to markdown with LlamaParse and extract its sections.")
+    parser.add_argument("file_name", nargs="?", default=DEFAULT_FILE_NAME)
+    args = parser.parse_args(argv)
+    extracted_name = _extracted_name(args.file_name)
+
+    # Read the PDF and convert it to markdown
+    tic = time.time()
+    
+    # Read the file using LLama Parse, and save to markdown
+    read_as_markdown(args.file_name)
+
+    # Assume this markdown_file_path is the output from LlamaParse's markdown conversion
+    markdown_file_path = extracted_name + ".md"    # This should exist from your LlamaParse run
+
+    if not os.path.exists(markdown_file_path):
+        print(f"Error: Markdown file not found at '{markdown_file_path}'")
+        return 1
+    else:
+        with open(markdown_file_path, 'r', encoding='utf-8') as f:
+            markdown_content = f.read()
+
+        # Get the document title from the filename (or you could extract from the markdown itself)
+        document_title = os.path.splitext(os.path.basename(markdown_file_path))[0]
+        
+        # Preprocess the markdown
+        processd_markdown = pre_process_llamaparse_markdown(markdown_content)
+        # Parse the markdown content
+        extracted_sections_json = parse_markdown_to_sections(processd_markdown)
+
+        # Wrap it in the desired top-level JSON structure
+        final_json_output = {
+            "document_title": document_title,
+            "sections": extracted_sections_json
+        }
+
+        # Save the structured data to a JSON file
+        output_json_file_path = extracted_name + ".json"
+        with open(output_json_file_path, 'w', encoding='utf-8') as f:
+            json.dump(final_json_output, f, indent=4, ensure_ascii=False)
+
+        print(f"Sections extracted and saved to '{output_json_file_path}'")
+
+        # Example of how to access content for a specific section
+        # This part would require knowing the exact title or a pattern.
+        # For instance, finding "Introduction"
+        # for section in final_json_output["sections"]:
+        #     if "Introduction" in section["title"]:
+        #         print(f"\nContent of Introduction:\n{section['content']}")
+        #         break
+    toc = time.time()
+    print(f"Total time taken: {toc - tic} seconds")
+    print(f"Parse cache: {parse_cache.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
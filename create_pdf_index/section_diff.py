@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Section-level diff between two versions of a document's extracted_nodes output.
+
+When a guideline gets a new revision, most of its sections are unchanged. The diff aligns the
+sections of the old and new versions so that only the changed ones need to be embedded again:
+vector_index.update_index(index, source, diff) embeds changed_records() only and carries the
+vectors of the unchanged sections over. (The keyword indexes, corpus_index and bm25_index,
+re-index a changed document as a whole; tokenising is cheap next to embedding.) Sections are aligned in three passes, each a
+dictionary lookup per section, so the whole diff is linear in the number of sections:
+  1. same heading key and same body              -> unchanged (or modified, if only the title changed)
+  2. same (non-empty) body under another heading  -> moved (e.g. renumbered after an insertion)
+  3. same heading key, different body             -> modified
+Whatever is left is added (new version only) or removed (old version only).
+The heading key is the heading_id plus its occurrence count (ids can repeat within a document);
+sections without an id (preamble, full document) use their title. Bodies are compared by their
+section_store.body_hash, so whitespace-only changes do not count.
+
+Node IDs are seeded by the source file's content hash, so every section of a new revision gets
+a new node_id; node_id_map() maps the old IDs of aligned sections to the new ones.
+
+    diff = diff_files("extracted_nodes_ich-gcp-r2.json", "extracted_nodes_ich-gcp-r3.json")
+    diff.summary()              # {"added": 12, "removed": 3, "modified": 40, "moved": 7, "unchanged": 950}
+    diff.changed_records()      # new-version records to re-embed
+
+Run: pdf-index-diff <old extracted_nodes file> <new extracted_nodes file> [--changes out.ndjson]
+"""
+
+import argparse
+import json
+import sys
+from collections import deque
+
+from .node_writer import RecordNdjsonWriter, iter_node_records
+from .section_store import body_hash
+from . import instrumentation
+
+_EMPTY_BODY = body_hash("")
+
+
+def heading_keys(records):
+    """(heading_id or "#" + title, occurrence) for each record, in order."""
+    occurrences = {}
+    keys = []
+    for record in records:
+        heading = record.get("heading_id") or f"#{record.get('section_title', '')}"
+        occurrence = occurrences.get(heading, 0)
+        occurrences[heading] = occurrence + 1
+        keys.append((heading, occurrence))
+    return keys
+
+
+class SectionDiff:
+    """
+    Result of diff_sections. added / removed are lists of records; modified, moved and unchanged
+    are lists of (old record, new record) pairs. All lists are in document order (new version
+    order where there is a new record); new_records is the whole new version.
+    """
+
+    def __init__(self, new_records, added, removed, modified, moved, unchanged, changed):
+        self.new_records = new_records
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.moved = moved
+        self.unchanged = unchanged
+        self._changed = changed
+
+    def summary(self):
+        return {"added": len(self.added), "removed": len(self.removed), "modified": len(self.modified),
+                "moved": len(self.moved), "unchanged": len(self.unchanged)}
+
+    def changed_records(self):
+        """New-version records that downstream stages have to see again: added, modified and moved."""
+        return list(self._changed)
+
+    def removed_node_ids(self):
+        """node_ids of the old version that no longer exist (removed sections)."""
+        return [record.get("node_id") for record in self.removed]
+
+    def node_id_map(self):
+        """{old node_id: new node_id} for every section present in both versions."""
+        return {old.get("node_id"): new.get("node_id")
+                for pairs in (self.unchanged, self.modified, self.moved) for old, new in pairs}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified or self.moved)
+
+
+def diff_sections(old_records, new_records):
+    """Aligns two versions' extracted_nodes records (see the module docstring); returns a SectionDiff."""
+    old_records = list(old_records)
+    new_records = list(new_records)
+    with instrumentation.span("section_diff", old=len(old_records), new=len(new_records)):
+        old_keys = heading_keys(old_records)
+        new_keys = heading_keys(new_records)
+        old_bodies = [body_hash(record.get("content", "")) for record in old_records]
+        new_bodies = [body_hash(record.get("content", "")) for record in new_records]
+
+        old_match = [None] * len(old_records)  # old index -> matched new index
+        new_match = [None] * len(new_records)
+        kinds = {}                              # new index -> "unchanged" / "modified" / "moved"
+
+        # Pass 1: same heading key, same body
+        old_by_key = {key: i for i, key in enumerate(old_keys)}
+        for j, key in enumerate(new_keys):
+            i = old_by_key.get(key)
+            if i is not None and old_bodies[i] == new_bodies[j]:
+                old_match[i], new_match[j] = j, i
+                same_title = old_records[i].get("section_title") == new_records[j].get("section_title")
+                kinds[j] = "unchanged" if same_title else "modified"
+
+        # Pass 2: same body under another heading; repeated bodies pair up in document order
+        old_by_body = {}
+        for i, body in enumerate(old_bodies):
+            if old_match[i] is None and body != _EMPTY_BODY:
+                old_by_body.setdefault(body, deque()).append(i)
+        for j, body in enumerate(new_bodies):
+            if new_match[j] is None and body in old_by_body:
+                candidates = old_by_body[body]
+                i = candidates.popleft()
+                if not candidates:
+                    del old_by_body[body]
+                old_match[i], new_match[j] = j, i
+                kinds[j] = "moved"
+
+        # Pass 3: same heading key, different body
+        for j, key in enumerate(new_keys):
+            if new_match[j] is None:
+                i = old_by_key.get(key)
+                if i is not None and old_match[i] is None:
+                    old_match[i], new_match[j] = j, i
+                    kinds[j] = "modified"
+
+        added, modified, moved, unchanged, changed = [], [], [], [], []
+        pairs_by_kind = {"modified": modified, "moved": moved, "unchanged": unchanged}
+        for j, new in enumerate(new_records):
+            i = new_match[j]
+            if i is None:
+                added.append(new)
+            else:
+                pairs_by_kind[kinds[j]].append((old_records[i], new))
+            if i is None or kinds[j] != "unchanged":
+                changed.append(new)
+        removed = [old for i, old in enumerate(old_records) if old_match[i] is None]
+
+    diff = SectionDiff(new_records, added, removed, modified, moved, unchanged, changed)
+    for kind, size in diff.summary().items():
+        instrumentation.count(f"sections_{kind}", size)
+    return diff
+
+
+def diff_files(old_file_name, new_file_name):
+    """diff_sections over two extracted_nodes files (JSON or NDJSON, plain or compressed)."""
+    return diff_sections(iter_node_records(old_file_name), iter_node_records(new_file_name))
+
+
+def write_changes(diff, file_name):
+    """Writes the changed new-version records (SectionDiff.changed_records) as NDJSON; returns how many."""
+    with RecordNdjsonWriter(file_name) as writer:
+        for record in diff.changed_records():
+            writer.write(record)
+    return writer.count
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Section-level diff of two extracted_nodes files.")
+    arg_parser.add_argument("old")
+    arg_parser.add_argument("new")
+    arg_parser.add_argument("--changes", help="write the added/modified/moved new records to this NDJSON file")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="list every changed section")
+    args = arg_parser.parse_args(argv)
+
+    diff = diff_files(args.old, args.new)
+    if args.verbose:
+        for record in diff.added:
+            print(f"+ {record.get('heading_id') or '-'}  {record.get('section_title')}")
+        for record in diff.removed:
+            print(f"- {record.get('heading_id') or '-'}  {record.get('section_title')}")
+        for old, new in diff.modified:
+            print(f"~ {new.get('heading_id') or '-'}  {new.get('section_title')}")
+        for old, new in diff.moved:
+            print(f"> {old.get('heading_id') or '-'} -> {new.get('heading_id') or '-'}  {new.get('section_title')}")
+    if args.changes:
+        print(f"Wrote {write_changes(diff, args.changes)} changed section(s) to {args.changes}")
+    print(json.dumps(diff.summary()))
+    return 0 if not diff else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed store of section bodies, shared by every document of a corpus.
+
+Protocols repeat the same boilerplate (ICH glossary definitions, CFR citations, sponsor template
+text) many times. Here each section body is hashed after normalisation (NFC, whitespace runs
+collapsed, stripped) and stored once; a document is kept as its list of section references
+(heading metadata plus the body hash), so the store grows with the unique content, not with the
+number of copies. Vector indexes key their embeddings on the same body_hash (see vector_index.py),
+so embedding the store's bodies (iter_bodies) costs one call per unique body.
+
+The store is a sidecar: extraction still writes the extracted_nodes files, and the store is an
+optional deduplicated copy of them (add_file / --section-store), e.g. to keep a corpus after the
+per-document outputs are deleted. records() gives back exactly the records that were added.
+
+Store directory layout:
+    store.json                      version, body file generation, documents
+    bodies-<gen>.ndjson(.offsets)   {"hash", "content"} per unique body, append-only
+    bodies-<gen>.hashes             16-byte blake2b digest per body; appended last, so it is the
+                                    commit record (a torn append is cut back on the next open)
+    documents/<document>.ndjson     one reference per section: the extracted_nodes record without
+                                    "content", plus "body_hash"
+
+A body keeps the text of its first occurrence; a section whose text differs from it only in
+what normalisation removes keeps its own text in its reference ("content"), so records()
+round-trips. Bodies no document refers to any more (after a
+document is replaced or removed) stay until compact() rewrites the body files.
+One process should write to a store at a time; any number may read.
+
+Run: pdf-index-store <store_dir> add extracted_nodes_*.json
+     pdf-index-store <store_dir> show <document>
+     pdf-index-store <store_dir> remove <document> ...
+     pdf-index-store <store_dir> compact | stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import unicodedata
+from array import array
+
+from .ingest_manifest import file_content_hash
+from .lookup_index import document_name
+from .node_writer import iter_ndjson, iter_node_records
+from . import instrumentation
+
+STORE_FORMAT_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s+")
+DIGEST_SIZE = 16
+
+
+def normalize_body(text):
+    """The form two section bodies are compared in: NFC, whitespace runs collapsed to one space, stripped."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def body_digest(text):
+    return hashlib.blake2b(normalize_body(text).encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def body_hash(text):
+    """Hex content address of a section body (see normalize_body)."""
+    return body_digest(text).hex()
+
+
+class SectionStore:
+    """
+        store = SectionStore("section_store")
+        store.add_file("extracted_nodes_protocol-a.json")
+        store.records("protocol-a")          # the extracted_nodes records again, content included
+        store.iter_bodies()                  # (body_hash, content) once per unique body
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "documents"), exist_ok=True)
+        self._manifest_path = os.path.join(directory, "store.json")
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("version") != STORE_FORMAT_VERSION:
+                raise ValueError(f"{directory}: store format {self.manifest.get('version')}, "
+                                 f"expected {STORE_FORMAT_VERSION}")
+        else:
+            # documents: {name: {"sections": n, "content_hash": hash of the ingested file or None}}
+            self.manifest = {"version": STORE_FORMAT_VERSION, "generation": 0, "documents": {}}
+        self._load_bodies()
+
+    # --- Body files ---
+
+    def _bodies_path(self, suffix="", generation=None):
+        generation = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.directory, f"bodies-{generation:06d}.ndjson{suffix}")
+
+    def _load_bodies(self):
+        """Reads the digests and offsets (not the bodies), cutting back a torn append."""
+        digests = b""
+        if os.path.exists(self._bodies_path(".hashes")):
+            with open(self._bodies_path(".hashes"), "rb") as f:
+                digests = f.read()
+        count = len(digests) // DIGEST_SIZE
+        self._offsets = array("Q")
+        if os.path.exists(self._bodies_path(".offsets")):
+            with open(self._bodies_path(".offsets"), "rb") as f:
+                self._offsets.frombytes(f.read())
+        del self._offsets[count:]
+        # The committed bodies end where the line of the last committed body ends
+        self._body_end = 0
+        if self._offsets:
+            with open(self._bodies_path(), "rb") as f:
+                f.seek(self._offsets[-1])
+                f.readline()
+                self._body_end = f.tell()
+        for suffix, size in ((".hashes", count * DIGEST_SIZE), (".offsets", count * self._offsets.itemsize),
+                             ("", self._body_end)):
+            path = self._bodies_path(suffix)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        self._rows = {digests[i:i + DIGEST_SIZE]: row
+                      for row, i in enumerate(range(0, count * DIGEST_SIZE, DIGEST_SIZE))}
+
+    def _append_bodies(self, bodies):
+        """Appends [(digest, content)] of new bodies: data, then offsets, then digests."""
+        if not bodies:
+            return
+        offsets = array("Q")
+        with open(self._bodies_path(), "ab") as f:
+            for digest, content in bodies:
+                line = (json.dumps({"hash": digest.hex(), "content": content}, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(self._body_end)
+                f.write(line)
+                self._body_end += len(line)
+        with open(self._bodies_path(".offsets"), "ab") as f:
+            offsets.tofile(f)
+        with open(self._bodies_path(".hashes"), "ab") as f:
+            f.write(b"".join(digest for digest, _ in bodies))
+        for (digest, _), offset in zip(bodies, offsets):
+            self._rows[digest] = len(self._offsets)
+            self._offsets.append(offset)
+
+    def _body_size(self, row):
+        end = self._offsets[row + 1] if row + 1 < len(self._offsets) else self._body_end
+        return end - self._offsets[row]
+
+    def body(self, body_hash):
+        """Content of one body by its hex hash (KeyError if it is not stored)."""
+        return self.bodies([body_hash])[body_hash]
+
+    def bodies(self, body_hashes):
+        """{body_hash: content} for several bodies, read with one open file."""
+        body_hashes = list(body_hashes)
+        found = {}
+        if not body_hashes:
+            return found
+        with open(self._bodies_path(), "rb") as f:
+            for body_hash in body_hashes:
+                if body_hash in found:
+                    continue
+                row = self._rows[bytes.fromhex(body_hash)]
+                f.seek(self._offsets[row])
+                found[body_hash] = json.loads(f.readline())["content"]
+        return found
+
+    def iter_bodies(self):
+        """(body_hash, content) of every stored body, in the order they were first seen."""
+        if self._offsets:
+            for body in iter_ndjson(self._bodies_path()):
+                yield body["hash"], body["content"]
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, body_hash):
+        return bytes.fromhex(body_hash) in self._rows
+
+    # --- Documents ---
+
+    @property
+    def documents(self):
+        return list(self.manifest["documents"])
+
+    def _document_path(self, document):
+        return os.path.join(self.directory, "documents", f"{document}.ndjson")
+
+    def _save_manifest(self):
+        _atomic_write(self._manifest_path, lambda f: json.dump(self.manifest, f, indent=2, ensure_ascii=False),
+                      self.directory)
+
+    def add_records(self, document, records, content_hash=None):
+        """
+        Stores (or replaces) a document given its extracted_nodes records.
+        Returns {"sections": n, "new_bodies": bodies not stored before}.
+        """
+        references = []
+        contents = []
+        new_bodies = {}
+        with instrumentation.span("section_store.add", document=document):
+            for record in records:
+                content = record.get("content", "")
+                digest = body_digest(content)
+                if digest not in self._rows and digest not in new_bodies:
+                    new_bodies[digest] = content
+                reference = {field: value for field, value in record.items() if field != "content"}
+                reference["body_hash"] = digest.hex()
+                references.append(reference)
+                contents.append(content)
+
+            # A text that is not byte-identical to its stored body is kept in the reference
+            stored = self.bodies({reference["body_hash"] for reference in references
+                                  if bytes.fromhex(reference["body_hash"]) in self._rows})
+            stored.update((digest.hex(), content) for digest, content in new_bodies.items())
+            for reference, content in zip(references, contents):
+                if stored[reference["body_hash"]] != content:
+                    reference["content"] = content
+
+            # Bodies first, so a document never refers to a body that is not stored
+            self._append_bodies(list(new_bodies.items()))
+
+            def write_references(f):
+                for reference in references:
+                    f.write(json.dumps(reference, ensure_ascii=False) + "\n")
+            _atomic_write(self._document_path(document), write_references, self.directory)
+            self.manifest["documents"][document] = {"sections": len(references), "content_hash": content_hash}
+            self._save_manifest()
+
+        instrumentation.count("section_bodies_stored", len(new_bodies))
+        instrumentation.count("section_bodies_deduplicated", len(references) - len(new_bodies))
+        return {"sections": len(references), "new_bodies": len(new_bodies)}
+
+    def add_file(self, file_name, force=False):
+        """
+        Stores the extracted_nodes file of one document (named by lookup_index.document_name).
+        Unchanged files (same content hash as last time) are skipped unless force=True.
+        Returns add_records' counts, or None when skipped.
+        """
+        document = document_name(file_name)
+        content_hash = file_content_hash(file_name)
+        entry = self.manifest["documents"].get(document)
+        if not force and entry is not None and entry.get("content_hash") == content_hash:
+            return None
+        return self.add_records(document, iter_node_records(file_name), content_hash)
+
+    def remove_documents(self, documents):
+        """Drops documents (their bodies stay until compact()); returns the ones that were stored."""
+        removed = [document for document in documents if document in self.manifest["documents"]]
+        for document in removed:
+            del self.manifest["documents"][document]
+        if removed:
+            self._save_manifest()
+            for document in removed:
+                os.remove(self._document_path(document))
+        return removed
+
+    def references(self, document):
+        """
+        The stored references of a document: extracted_nodes records with "body_hash" instead of
+        "content" (which is only kept when the text differs from the stored body, see above).
+        """
+        if document not in self.manifest["documents"]:
+            raise KeyError(document)
+        return list(iter_ndjson(self._document_path(document)))
+
+    def records(self, document):
+        """The extracted_nodes records of a document, content included (each body is read once)."""
+        references = self.references(document)
+        contents = self.bodies(reference["body_hash"] for reference in references if "content" not in reference)
+        records = []
+        for reference in references:
+            record = {field: value for field, value in reference.items() if field != "body_hash"}
+            if "content" not in record:
+                record["content"] = contents[reference["body_hash"]]
+            records.append(record)
+        return records
+
+    # --- Maintenance ---
+
+    def _referenced_rows(self):
+        counts = {}
+        for document in self.manifest["documents"]:
+            for reference in iter_ndjson(self._document_path(document)):
+                row = self._rows[bytes.fromhex(reference["body_hash"])]
+                counts[row] = counts.get(row, 0) + 1
+        return counts
+
+    def stats(self):
+        counts = self._referenced_rows()
+        return {
+            "documents": len(self.manifest["documents"]),
+            "references": sum(counts.values()),
+            "bodies": len(self._offsets),
+            "unreferenced_bodies": len(self._offsets) - len(counts),
+            "stored_bytes": self._body_end,
+            # What the bodies would take with one copy per reference
+            "referenced_bytes": sum(self._body_size(row) * count for row, count in counts.items()),
+        }
+
+    def compact(self):
+        """Rewrites the body files without unreferenced bodies; returns how many were dropped."""
+        counts = self._referenced_rows()
+        dropped = len(self._offsets) - len(counts)
+        if dropped == 0:
+            return 0
+        old_generation = self.manifest["generation"]
+        new_generation = old_generation + 1
+        kept = sorted(counts)
+        offsets = array("Q")
+        digests = []
+        position = 0
+        with instrumentation.span("section_store.compact", kept=len(kept), dropped=dropped), \
+                open(self._bodies_path(), "rb") as source, \
+                open(self._bodies_path(generation=new_generation), "wb") as target:
+            for row in kept:
+                source.seek(self._offsets[row])
+                line = source.readline()
+                offsets.append(position)
+                target.write(line)
+                position += len(line)
+                digests.append(bytes.fromhex(json.loads(line)["hash"]))
+        with open(self._bodies_path(".offsets", new_generation), "wb") as f:
+            offsets.tofile(f)
+        with open(self._bodies_path(".hashes", new_generation), "wb") as f:
+            f.write(b"".join(digests))
+
+        # Switching generations in store.json is the commit point
+        self.manifest["generation"] = new_generation
+        self._save_manifest()
+        for suffix in ("", ".offsets", ".hashes"):
+            path = self._bodies_path(suffix, old_generation)
+            if os.path.exists(path):
+                os.remove(path)
+        self._load_bodies()
+        return dropped
+
+
+def _atomic_write(path, write, directory):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Content-addressed store of section bodies across documents.")
+    arg_parser.add_argument("directory")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="add or replace documents from extracted_nodes files")
+    add_parser.add_argument("files", nargs="+")
+    add_parser.add_argument("--force", action="store_true", help="re-store even if unchanged")
+    show_parser = commands.add_parser("show", help="print a document's records, content included")
+    show_parser.add_argument("document")
+    remove_parser = commands.add_parser("remove", help="remove documents")
+    remove_parser.add_argument("documents", nargs="+")
+    commands.add_parser("compact")
+    commands.add_parser("stats")
+    args = arg_parser.parse_args(argv)
+
+    store = SectionStore(args.directory)
+    if args.command == "add":
+        for file_name in args.files:
+            added = store.add_file(file_name, force=args.force)
+            if added is None:
+                print(f"Unchanged: {file_name}")
+            else:
+                print(f"Stored {file_name}: {added['sections']} sections, {added['new_bodies']} new bodies")
+    elif args.command == "show":
+        for record in store.records(args.document):
+            print(json.dumps(record, ensure_ascii=False))
+        return 0
+    elif args.command == "remove":
+        print(f"Removed {len(store.remove_documents(args.documents))} document(s)")
+    elif args.command == "compact":
+        print(f"Dropped {store.compact()} unreferenced bodies")
+    print(json.dumps(store.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded generator of synthetic regulatory documents, for benchmarks.
+
+A document is a list of pages with ICH-style numbered headings ("4.1.1. Title") or CFR-style
+headings ("§ 50.3", "(a)", "(1)"), body text, optional running headers/footers and the
+LlamaParse page break marker. The same content is available as:
+  - page_texts: one plain-text string per page (what SimpleDirectoryReader gives SectionNodeParser),
+  - markdown: the LlamaParse-style markdown of the whole document ("#" headings, page breaks),
+  - documents(): llama_index Documents, one per page with a page_label.
+The same seed always gives the same document.
+"""
+
+import random
+
+HEADING_STYLES = ("numbered", "cfr")
+
+_WORDS = (
+    "trial subject investigator sponsor protocol adverse drug reaction informed consent monitoring "
+    "audit record clinical safety efficacy product investigational review board ethics committee "
+    "data report procedure documentation compliance regulatory requirement assessment randomization"
+).split()
+
+_TITLES = (
+    "Introduction", "Glossary", "Principles of GCP", "Institutional Review Board", "Investigator",
+    "Sponsor", "Clinical Trial Protocol", "Investigator's Brochure", "Essential Documents",
+    "Informed Consent of Trial Subjects", "Records and Reports", "Safety Information",
+    "Adverse Drug Reaction Reporting", "Monitoring", "Audit", "Noncompliance", "Definitions",
+)
+
+
+class SyntheticDocument:
+    """Output of generate_document; see the module docstring."""
+
+    def __init__(self, page_texts, markdown, heading_count, heading_style):
+        self.page_texts = page_texts
+        self.markdown = markdown
+        self.heading_count = heading_count
+        self.heading_style = heading_style
+
+    @property
+    def text_bytes(self):
+        return sum(len(text.encode("utf-8")) for text in self.page_texts)
+
+    @property
+    def markdown_bytes(self):
+        return len(self.markdown.encode("utf-8"))
+
+    def documents(self, file_name="synthetic.pdf"):
+        from llama_index.core.schema import Document
+        return [Document(text=text, metadata={"file_name": file_name, "page_label": str(page)})
+                for page, text in enumerate(self.page_texts, start=1)]
+
+
+def _sentence(rnd, words=(8, 20)):
+    sentence = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(*words)))
+    return sentence[0].upper() + sentence[1:] + "."
+
+def _heading_line(style, counters, level, title):
+    """Heading text for the current counters, e.g. "4.1.2. Title" or "(b) Title"."""
+    if style == "numbered":
+        return f"{'.'.join(str(c) for c in counters[:level])}. {title}"
+    if level == 1:
+        return f"§ 50.{counters[0]} {title}"
+    if level == 2:
+        return f"({chr(ord('a') + (counters[1] - 1) % 26)}) {title}"
+    return f"({counters[level - 1]}) {title}"
+
+
+def generate_document(pages=20, max_depth=4, heading_style="numbered", headings_per_page=(1, 4),
+                      body_lines=(2, 12), header_footer_noise=True, page_break_marker="---PAGE_BREAK__{n}---",
+                      preamble=True, seed=0):
+    """
+    Builds a SyntheticDocument of `pages` pages.
+    max_depth: deepest heading level (CFR style is capped at 3: §, (a), (1)).
+    headings_per_page / body_lines: (min, max) headings per page and body lines after each heading.
+    header_footer_noise: add a running header, a constant footer and a "Page N of M" line to every page.
+    page_break_marker: placed between pages in the markdown; "{n}" is replaced by the page number.
+    """
+    if heading_style not in HEADING_STYLES:
+        raise ValueError(f"Unknown heading_style {heading_style!r}; expected one of {HEADING_STYLES}")
+    if heading_style == "cfr":
+        max_depth = min(max_depth, 3)
+
+    rnd = random.Random(seed)
+    counters = [0] * max_depth
+    level = 0
+    heading_count = 0
+    page_texts = []
+    markdown_pages = []
+
+    for page in range(1, pages + 1):
+        lines = []
+        markdown_lines = []
+        if header_footer_noise:
+            markdown_lines.append("Protocol SYN-001 | Confidential")
+
+        if page == 1 and preamble:
+            for _ in range(rnd.randint(*body_lines)):
+                sentence = _sentence(rnd)
+                lines.append(sentence)
+                markdown_lines.append(sentence)
+
+        for _ in range(rnd.randint(*headings_per_page)):
+            # Walk the outline: go one level deeper, stay, or climb back up
+            level = max(1, min(max_depth, level + rnd.choice((-2, -1, 0, 0, 1))))
+            counters[level - 1] += 1
+            for deeper in range(level, max_depth):
+                counters[deeper] = 0
+            for parent in range(level - 1):
+                counters[parent] = max(counters[parent], 1)
+
+            heading = _heading_line(heading_style, counters, level, rnd.choice(_TITLES))
+            heading_count += 1
+            lines.append(heading)
+            markdown_lines.append(f"{'#' * level} {heading}")
+            for _ in range(rnd.randint(*body_lines)):
+                sentence = _sentence(rnd)
+                lines.append(sentence)
+                markdown_lines.append(sentence)
+
+        if header_footer_noise:
+            markdown_lines.append("Version 2.0 Final")
+            markdown_lines.append(f"Page {page} of {pages}")
+        page_texts.append("\n".join(lines))
+        markdown_pages.append("\n".join(markdown_lines))
+
+    separators = [f"\n{page_break_marker.format(n=page)}\n" for page in range(1, pages)]
+    markdown_parts = [markdown_pages[0]]
+    for separator, markdown_page in zip(separators, markdown_pages[1:]):
+        markdown_parts.append(separator)
+        markdown_parts.append(markdown_page)
+
+    return SyntheticDocument(page_texts, "".join(markdown_parts), heading_count, heading_style)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun 23 21:01:00 2025
+
+@author: Admin
+"""
+
+import argparse
+import json
+import sys
+
+from .node_writer import iter_node_records
+from . import instrumentation
+
+# The only fields of an extracted_nodes record the TOC needs; section content is dropped on load
+TOC_FIELDS = ("node_id", "parent_node_id", "heading_level", "heading_id", "page_label", "section_title")
+
+@instrumentation.traced("toc.build")
+def build_toc(headings_data):
+    # Filter out heading_level 0 as they appear to be page/document metadata
+    # Also create a map for quick lookup by node_id for parent/child linking
+    heading_map = {h['node_id']: h for h in headings_data if h.get('heading_level') != 0}
+
+    # Build the parent -> children index in one pass (instead of scanning every heading for every parent),
+    # and pick out the true top-level sections on the way.
+    children_by_parent = {}
+    top_level_headings = []
+    for h in heading_map.values():
+        parent_id = h.get('parent_node_id')
+        if parent_id is not None:
+            children_by_parent.setdefault(parent_id, []).append(h)
+
+        # Top-level: heading_level 1 with no parent, or whose parent is not in the TOC (e.g. a level 0 preamble)
+        if h['heading_level'] == 1 and (parent_id is None or parent_id not in heading_map):
+            top_level_headings.append(h)
+
+    # Sort top-level headings by page_label and then by their original order (approximate)
+    # Using 'heading_id' for secondary sort if it's numerical and sequential
+    top_level_headings.sort(key=_toc_sort_key)
+
+    # Initialize a structure for the TOC (e.g., a list of dictionaries)
+    toc = []
+
+    # Assemble the tree iteratively (no recursion, so deep nesting can't hit the recursion limit).
+    # Each stack item is (heading, list its entry should be appended to); siblings are pushed in
+    # reverse so they are popped - and appended - in sorted order.
+    stack = [(h, toc) for h in reversed(top_level_headings)]
+    while stack:
+        current_heading, siblings = stack.pop()
+        section_entry = {
+            "title": current_heading["section_title"],
+            "page": current_heading["page_label"],
+            "level": current_heading["heading_level"],
+            "subsections": []
+        }
+        siblings.append(section_entry)
+
+        # Children will have a heading_level one greater than the parent
+        # and their parent_node_id will match the current heading's node_id.
+        child_level = current_heading['heading_level'] + 1
+        children = [
+            h for h in children_by_parent.get(current_heading['node_id'], ())
+            if h.get('heading_level') == child_level
+        ]
+        # Sort children to maintain order
+        children.sort(key=_toc_sort_key) # Sort by page and heading_id
+
+        stack.extend((child, section_entry["subsections"]) for child in reversed(children))
+
+    return toc
+
+def _toc_sort_key(h):
+    return (int(h.get('page_label', 0)), h.get('heading_id', ''))
+
+@instrumentation.traced("toc.build")
+def toc_from_sections(sections, page="N/A"):
+    """
+    TOC in the same shape as build_toc, from the nested output of parse_markdown_to_sections
+    (which is already a tree, so no parent/child linking is needed). Level 0 (preamble) sections are skipped.
+    """
+    toc = []
+    stack = [(section, toc) for section in reversed(sections) if section.get("level") != 0]
+    while stack:
+        section, siblings = stack.pop()
+        entry = {"title": section["title"], "page": page, "level": section["level"], "subsections": []}
+        siblings.append(entry)
+        stack.extend((child, entry["subsections"]) for child in reversed(section.get("subsections", [])))
+    return toc
+
+def print_toc(toc_list, indent_level=0):
+    for entry in toc_list:
+        # Use an appropriate symbol or just indentation
+        prefix = "  " * indent_level
+        print(f"{prefix}{entry['title']} (Page: {entry['page']})")
+        if entry["subsections"]:
+            print_toc(entry["subsections"], indent_level + 1)
+
+def load_headings(fname, chunk_size=1 << 16):
+    """
+    Streams the heading fields (TOC_FIELDS) of each record in an extracted_nodes file.
+    Accepts a JSON array (as written by extract_section_from_data) or NDJSON (one record per line),
+    plain or .gz / .zst compressed.
+    The file is read in chunks and only one record is decoded at a time, so memory does not grow
+    with the file size; everything except TOC_FIELDS is discarded straight away.
+    """
+    for record in iter_node_records(fname, chunk_size):
+        yield {k: record[k] for k in TOC_FIELDS if k in record}
+
+def build_toc_from_file(fname):
+    """build_toc for an extracted_nodes JSON / NDJSON file, without loading section content."""
+    return build_toc(load_headings(fname))
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build a table of contents from an extracted_nodes file.")
+    arg_parser.add_argument("fname", nargs="?", default="extracted_nodes_ich-gcp-r2-step-5.json",
+                            help="extracted_nodes JSON array or NDJSON file")
+    arg_parser.add_argument("--indent", type=int, default=3, help="starting indent level when printing")
+    arg_parser.add_argument("--json", dest="json_output", help="write the TOC as JSON to this file instead of printing")
+    args = arg_parser.parse_args(argv)
+
+    # Build the table of contents
+    table_of_contents = build_toc_from_file(args.fname)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(table_of_contents, f, indent=2, ensure_ascii=False)
+        return 0
+
+    # Print the table of contents
+    print("---")
+    print("Extracted Table of Contents:")
+    print("---")
+    print_toc(table_of_contents, args.indent)
+    print("---")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
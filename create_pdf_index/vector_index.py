@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Offline vector index over SectionNodeParser sections, with NumPy top-k search.
+
+Each section is embedded by its body (its title when the body is empty), so vectors are keyed by
+section_store.body_hash just like the bodies of a section store, and a body repeated under several
+titles is embedded once. Sections are embedded in batches by a pluggable embedder: any callable taking a list of texts
+and returning an (n, dim) float array. The default HashingEmbedder needs no model download and
+gives the same vectors on every machine. Wrap a llama_index embedding model with
+LlamaIndexEmbedder to use real embeddings instead.
+
+Index directory layout:
+    meta.json                 count, unique vector count, dim, embedder description, distinct page labels
+    vectors.f32               (vectors, dim) float32, L2-normalised rows (dot product = cosine); one
+                              row per distinct body (see section_store.normalize_body)
+    vector_rows.u32           row of vectors.f32 holding each section's embedding
+    vector_digests.bin        16-byte section_store.body_digest of the body behind each vector row
+    heading_levels.i16        heading_level of each section
+    page_numbers.i32          page_label as an int (-1 when it is not a number)
+    page_label_codes.u32      page_label as a position in meta["page_labels"]
+    sections.ndjson(.offsets) stored fields of each section (same as bm25_index)
+
+Repeated boilerplate sections are embedded and stored once and shared through vector_rows.
+A rebuild can take the previous index (build_index(..., previous=...)): bodies it already holds
+are copied over. For a new revision of one document, update_index applies its section diff
+(section_diff.py): only the changed sections are embedded, nothing else is re-read or re-hashed.
+Everything is memory-mapped when the index is opened. A batch of queries is one matrix
+multiply per block of sections (over the block's distinct vectors), then an argpartition per query row.
+
+Run: pdf-index-vectors build <index_dir> extracted_nodes_*.json
+     pdf-index-vectors update <index_dir> <old extracted_nodes file> <new extracted_nodes file>
+     pdf-index-vectors search <index_dir> "informed consent of trial subjects" [-k 10] [--max-level 2]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import shutil
+import sys
+from array import array
+
+import numpy as np
+
+from .bm25_index import tokenize, stored_fields, map_array, swap_directory
+from .node_writer import RecordNdjsonWriter, extracted_view, iter_ndjson, iter_node_records, read_ndjson_record
+from .section_store import DIGEST_SIZE, body_digest, normalize_body
+from . import instrumentation
+
+INDEX_FORMAT_VERSION = 4
+
+
+class HashingEmbedder:
+    """
+    Deterministic hashing-vectorizer embedding: word unigrams and bigrams are hashed (blake2b,
+    not the per-process salted hash()) into `dim` signed buckets, weighted by 1 + log(tf).
+    """
+
+    def __init__(self, dim=512, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+        self._buckets = {}
+
+    def describe(self):
+        return {"name": "hashing", "dim": self.dim, "bigrams": self.bigrams}
+
+    def _bucket(self, feature):
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            # Low bits pick the column, the top bit the sign (keeps unrelated collisions from adding up)
+            bucket = self._buckets[feature] = (digest % self.dim, 1.0 if digest >> 63 else -1.0)
+        return bucket
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] if self.bigrams else tokens
+            counts = {}
+            for feature in features:
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, tf in counts.items():
+                column, sign = self._bucket(feature)
+                vectors[row, column] += sign * (1.0 + math.log(tf))
+        return vectors
+
+
+class LlamaIndexEmbedder:
+    """Adapter for a llama_index embedding model (anything with get_text_embedding_batch)."""
+
+    def __init__(self, embed_model, name=None):
+        self.embed_model = embed_model
+        self.name = name or type(embed_model).__name__
+
+    def describe(self):
+        return {"name": self.name, "model": getattr(self.embed_model, "model_name", None)}
+
+    def __call__(self, texts):
+        return np.asarray(self.embed_model.get_text_embedding_batch(list(texts)), dtype=np.float32)
+
+
+def _describe(embedder):
+    return embedder.describe() if hasattr(embedder, "describe") else {"name": type(embedder).__name__}
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _page_number(page_label):
+    try:
+        return int(page_label)
+    except (TypeError, ValueError):
+        return -1
+
+
+class VectorIndex:
+    """
+    Read side of the index.
+
+        index = VectorIndex("vector_index")
+        hits = index.search("informed consent", k=5, max_heading_level=2)
+        batch = index.search_batch(["monitoring visits", "adverse drug reaction"], k=5)
+
+    The embedder must be the one the index was built with (the default matches the default build).
+    """
+
+    def __init__(self, directory, embedder=None):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{directory}: index format {self.meta.get('version')}, expected {INDEX_FORMAT_VERSION}")
+        self.embedder = embedder or HashingEmbedder(self.meta["dim"])
+        if _describe(self.embedder) != self.meta["embedder"]:
+            raise ValueError(f"{directory} was built with embedder {self.meta['embedder']}, "
+                             f"not {_describe(self.embedder)}")
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        self.page_labels = self.meta["page_labels"]
+
+        path = lambda name: os.path.join(directory, name)
+        self.vectors = map_array(path("vectors.f32"), np.float32).reshape(self.meta["vectors"], self.dim)
+        self.vector_rows = map_array(path("vector_rows.u32"), np.uint32)
+        self.heading_levels = map_array(path("heading_levels.i16"), np.int16)
+        self.page_numbers = map_array(path("page_numbers.i32"), np.int32)
+        self.page_label_codes = map_array(path("page_label_codes.u32"), np.uint32)
+        self._sections_path = path("sections.ndjson")
+        self._digests_path = path("vector_digests.bin")
+
+    def vector_digests(self):
+        """body_digest of the body behind each row of self.vectors."""
+        with open(self._digests_path, "rb") as f:
+            digests = f.read()
+        return [digests[i:i + DIGEST_SIZE] for i in range(0, len(digests), DIGEST_SIZE)]
+
+    def vector_rows_by_digest(self):
+        """{body_digest of an embedded body: its row in self.vectors}."""
+        return {digest: row for row, digest in enumerate(self.vector_digests())}
+
+    def sources(self):
+        """The distinct source names of the indexed sections, in index order."""
+        return list(dict.fromkeys(stored["source"] for stored in iter_ndjson(self._sections_path)))
+
+    def filter_mask(self, heading_level=None, max_heading_level=None, page_label=None, page_range=None):
+        """
+        Boolean mask of the sections passing every given filter (None when there are none):
+        heading_level: an int or a collection of ints; max_heading_level: heading_level <= this;
+        page_label: a label or a collection of labels; page_range: (first, last) page numbers, inclusive.
+        """
+        mask = None
+
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if heading_level is not None:
+            levels = [heading_level] if isinstance(heading_level, int) else list(heading_level)
+            narrow(np.isin(self.heading_levels, levels))
+        if max_heading_level is not None:
+            narrow(self.heading_levels <= max_heading_level)
+        if page_label is not None:
+            labels = {page_label} if isinstance(page_label, str) else set(page_label)
+            codes = [code for code, label in enumerate(self.page_labels) if label in labels]
+            narrow(np.isin(self.page_label_codes, codes))
+        if page_range is not None:
+            first, last = page_range
+            narrow((self.page_numbers >= first) & (self.page_numbers <= last))
+        return mask
+
+    def search_batch(self, queries, k=10, block_size=1 << 16, **filters):
+        """
+        Top k sections for each query: a list (one per query) of lists of stored fields plus "score".
+        All queries are embedded in one call and scored with one matrix multiply per block of
+        block_size sections; filters are the keyword arguments of filter_mask.
+        """
+        with instrumentation.span("vector.search", queries=len(queries)):
+            query_vectors = _normalise(np.asarray(self.embedder(list(queries)), dtype=np.float32))
+            mask = self.filter_mask(**filters)
+
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for start in range(0, self.count, block_size):
+                # Score each distinct vector of the block once, then spread to the sections sharing it
+                vector_rows, inverse = np.unique(self.vector_rows[start:start + block_size], return_inverse=True)
+                block_scores = (query_vectors @ self.vectors[vector_rows].T)[:, inverse]
+                if mask is not None:
+                    block_scores[:, ~mask[start:start + block_size]] = -np.inf
+                # Keep only each row's top k of this block, then merge with the running best
+                block_k = min(k, block_scores.shape[1])
+                top = np.argpartition(-block_scores, block_k - 1, axis=1)[:, :block_k]
+                best_scores = np.concatenate([best_scores, np.take_along_axis(block_scores, top, axis=1)], axis=1)
+                best_rows = np.concatenate([best_rows, top + start], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            hits = []
+            for score, row in zip(scores, rows):
+                if score == -np.inf:
+                    break
+                hit = read_ndjson_record(self._sections_path, int(row))
+                hit["score"] = float(score)
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    def search(self, query, k=10, **filters):
+        return self.search_batch([query], k=k, **filters)[0]
+
+
+def build_index(records, directory, embedder=None, batch_size=256, previous=None):
+    """
+    Builds a VectorIndex in `directory` from (source name, extracted_nodes record) pairs, embedding
+    section bodies (see embedded_text) in batches of batch_size. A body seen before (after normalisation)
+    reuses its vector instead of being embedded again, and so does a body found in `previous`
+    (an opened VectorIndex built with the same embedder; it may be the one in `directory`).
+    Written to a temporary directory and swapped in. Returns the opened index.
+    """
+    entries = ((stored_fields(record, source), record.get("heading_level"), record.get("page_label", "N/A"),
+                embedded_text(record), None) for source, record in records)
+    return _write_index(entries, directory, embedder or HashingEmbedder(), batch_size, previous)
+
+
+def update_index(previous, source, diff, new_source=None, directory=None, batch_size=256):
+    """
+    Applies a section_diff.SectionDiff between two versions of document `source` to `previous`
+    (an opened VectorIndex holding the old version). The old version's sections are dropped and
+    the new version's added in their place: only diff.changed_records() are embedded (and even
+    those reuse a vector when their body is already indexed, e.g. moved sections), and the
+    unchanged sections and every other document keep their vector rows without being re-read
+    or re-hashed. The document's sections go after those of the other documents, under
+    new_source (default: source) when the new version comes from another file.
+    Written to `directory` (default: previous.directory). Returns the opened index.
+    """
+    digests = previous.vector_digests()
+    old_node_ids = {old.get("node_id") for old, _ in diff.unchanged}
+    kept_rows = {}  # old node_id of an unchanged section -> its row in previous
+
+    def kept_entries():
+        for row, stored in enumerate(iter_ndjson(previous._sections_path)):
+            if stored["source"] != source:
+                yield (stored, int(previous.heading_levels[row]), stored.get("page_label"), None,
+                       digests[previous.vector_rows[row]])
+            elif stored["node_id"] in old_node_ids:
+                kept_rows[stored["node_id"]] = row
+
+    def new_entries():
+        unchanged = {id(new): old for old, new in diff.unchanged}
+        for record in diff.new_records:
+            old = unchanged.get(id(record))
+            row = kept_rows.get(old.get("node_id")) if old is not None else None
+            # Unchanged sections take the digest of their old vector; the rest are hashed (and embedded if new)
+            text, digest = (embedded_text(record), None) if row is None else (None, digests[previous.vector_rows[row]])
+            yield (stored_fields(record, new_source), record.get("heading_level"), record.get("page_label", "N/A"),
+                   text, digest)
+
+    new_source = source if new_source is None else new_source
+    directory = previous.directory if directory is None else directory
+    with instrumentation.span("vector.update", document=source, changed=len(diff.changed_records()),
+                              removed=len(diff.removed)):
+        return _write_index(itertools.chain(kept_entries(), new_entries()), directory, previous.embedder,
+                            batch_size, previous)
+
+
+def _write_index(entries, directory, embedder, batch_size, previous):
+    """
+    Writes an index from (stored fields, heading_level, page_label, text, digest) entries. An entry
+    with text=None has no text to embed: its digest must name a vector of `previous`.
+    """
+    previous_rows = {}
+    if previous is not None:
+        if _describe(previous.embedder) != _describe(embedder):
+            raise ValueError(f"previous index was built with embedder {_describe(previous.embedder)}, "
+                             f"not {_describe(embedder)}")
+        previous_rows = previous.vector_rows_by_digest()
+    vector_rows = array("I")
+    # body_digest of each embedded body -> its row in vectors.f32
+    vector_row_of = {}
+    embedded = 0
+    heading_levels = array("h")
+    page_numbers = array("i")
+    page_label_codes = array("I")
+    page_label_index = {}
+    count = 0
+    dim = None
+
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp_directory)
+    try:
+        with instrumentation.span("vector.build"), \
+                open(os.path.join(tmp_directory, "vectors.f32"), "wb") as vectors_file, \
+                open(os.path.join(tmp_directory, "vector_digests.bin"), "wb") as digests_file, \
+                RecordNdjsonWriter(os.path.join(tmp_directory, "sections.ndjson")) as sections:
+
+            # New vector rows not written yet, in order: (text to embed, None) or (None, row of previous)
+            pending = []
+            texts = []
+
+            def flush():
+                nonlocal dim, embedded
+                new_vectors = iter(_normalise(np.asarray(embedder(texts), dtype=np.float32)) if texts else ())
+                vectors = np.stack([next(new_vectors) if text is not None else previous.vectors[previous_row]
+                                    for text, previous_row in pending]).astype(np.float32, copy=False)
+                if dim is None:
+                    dim = vectors.shape[1]
+                vectors.tofile(vectors_file)
+                embedded += len(texts)
+                pending.clear()
+                texts.clear()
+
+            for stored, heading_level, page_label, text, digest in entries:
+                if digest is None:
+                    digest = body_digest(text)
+                vector_row = vector_row_of.get(digest)
+                if vector_row is None:
+                    vector_row = vector_row_of[digest] = len(vector_row_of)
+                    digests_file.write(digest)
+                    previous_row = previous_rows.get(digest)
+                    if previous_row is None:
+                        pending.append((text, None))
+                        texts.append(text)
+                    else:
+                        pending.append((None, previous_row))
+                vector_rows.append(vector_row)
+                sections.write(stored)
+                heading_levels.append(int(heading_level or 0))
+                page_label = str(page_label)
+                page_numbers.append(_page_number(page_label))
+                page_label_codes.append(page_label_index.setdefault(page_label, len(page_label_index)))
+                count += 1
+                # Copied vectors cost nothing to produce, but still bound how many are held
+                if len(texts) == batch_size or len(pending) >= 16 * batch_size:
+                    flush()
+            if pending:
+                flush()
+
+        for name, values in (("vector_rows.u32", vector_rows), ("heading_levels.i16", heading_levels),
+                             ("page_numbers.i32", page_numbers), ("page_label_codes.u32", page_label_codes)):
+            with open(os.path.join(tmp_directory, name), "wb") as f:
+                values.tofile(f)
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "count": count,
+            "vectors": len(vector_row_of),
+            "dim": dim if dim is not None else getattr(embedder, "dim", 0),
+            "embedder": _describe(embedder),
+            "page_labels": list(page_label_index),
+        }
+        with open(os.path.join(tmp_directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+        swap_directory(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    instrumentation.count("sections_embedded", embedded)
+    instrumentation.count("embeddings_reused", count - embedded)
+    return VectorIndex(directory, embedder)
+
+
+def embedded_text(record):
+    """The text a section is embedded by: its body, or its title when the body is empty."""
+    content = record.get("content", "")
+    return content if normalize_body(content) else record.get("section_title", "")
+
+
+def records_from_files(file_names):
+    """(source, record) pairs from extracted_nodes files, for build_index."""
+    for file_name in file_names:
+        source = os.path.basename(file_name)
+        for record in iter_node_records(file_name):
+            yield source, record
+
+
+def records_from_nodes(nodes, source):
+    """(source, record) pairs straight from SectionNodeParser TextNodes, for build_index."""
+    for node in nodes:
+        yield source, extracted_view(node.dict())
+
+
+def records_from_store(store, documents=None):
+    """(source, record) pairs of the documents of a section_store.SectionStore (all by default)."""
+    for document in store.documents if documents is None else documents:
+        for record in store.records(document):
+            yield document, record
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build or query an offline vector index over extracted_nodes files.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="embed and index extracted_nodes files")
+    build_parser.add_argument("directory")
+    build_parser.add_argument("files", nargs="+")
+    build_parser.add_argument("--dim", type=int, default=512)
+    build_parser.add_argument("--reuse", action="store_true",
+                              help="copy the vectors of unchanged texts from the index already in the directory")
+    update_parser = commands.add_parser("update", help="replace one document by its new version, embedding only the changed sections")
+    update_parser.add_argument("directory")
+    update_parser.add_argument("old")
+    update_parser.add_argument("new")
+    search_parser = commands.add_parser("search", help="query an index")
+    search_parser.add_argument("directory")
+    search_parser.add_argument("queries", nargs="+")
+    search_parser.add_argument("-k", type=int, default=10)
+    search_parser.add_argument("--heading-level", type=int, nargs="+")
+    search_parser.add_argument("--max-level", type=int)
+    search_parser.add_argument("--pages", type=int, nargs=2, metavar=("FIRST", "LAST"))
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "build":
+        embedder = HashingEmbedder(args.dim)
+        previous = None
+        if args.reuse and os.path.exists(os.path.join(args.directory, "meta.json")):
+            previous = VectorIndex(args.directory, embedder)
+        index = build_index(records_from_files(args.files), args.directory, embedder, previous=previous)
+        print(f"Embedded {index.count} sections ({index.meta['vectors']} distinct, dim {index.dim}) "
+              f"into {args.directory}")
+        return 0
+    if args.command == "update":
+        from .section_diff import diff_files
+        diff = diff_files(args.old, args.new)
+        # Sections are stored under their file name
+        previous = VectorIndex(args.directory)
+        index = update_index(previous, os.path.basename(args.old), diff, new_source=os.path.basename(args.new))
+        print(f"{json.dumps(diff.summary())}: {index.count} sections ({index.meta['vectors']} distinct) "
+              f"in {args.directory}")
+        return 0
+
+    index = VectorIndex(args.directory)
+    results = index.search_batch(args.queries, k=args.k, heading_level=args.heading_level,
+                                 max_heading_level=args.max_level, page_range=args.pages)
+    for query, hits in zip(args.queries, results):
+        print(f"--- {query}")
+        for hit in hits:
+            print(f"{hit['score']:6.3f}  {hit['source']}  {hit['heading_id'] or '-'}  "
+                  f"{hit['section_title']} (page {hit['page_label']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+
+from create_pdf_index import bm25_index
+from create_pdf_index.corpus_index import CorpusIndex
+
+
+def _write_document(directory, name, texts):
+    records = [{"section_title": f"{i}. Section", "page_label": "1", "heading_level": 1, "heading_id": str(i),
+                "parent_node_id": None, "node_id": f"{name}-{i}", "content": text}
+               for i, text in enumerate(texts, 1)]
+    path = os.path.join(directory, f"extracted_nodes_{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    return path
+
+
+def _segments_on_disk(corpus):
+    return sorted(os.listdir(os.path.join(corpus.directory, "segments")))
+
+
+def test_search_survives_compaction_between_scoring_and_reading(tmp_path, monkeypatch):
+    corpus = CorpusIndex(str(tmp_path / "corpus"))
+    corpus.add_documents([_write_document(str(tmp_path), "a", ["informed consent form", "safety reporting"])])
+    corpus.add_documents([_write_document(str(tmp_path), "b", ["consent of minors", "monitoring visits"])])
+    old_segments = _segments_on_disk(corpus)
+    assert len(old_segments) == 2
+
+    original_section = bm25_index.BM25Index.section
+    compacted = []
+
+    def section_after_compaction(self, section_number):
+        # A compaction finishing while the search reads its hits (outside the corpus lock)
+        # (merge_indexes reads sections too, so the guard is set before the compaction starts)
+        if not compacted:
+            compacted.append(True)
+            thread = threading.Thread(target=corpus.compact)
+            thread.start()
+            thread.join()
+            # The segments this search reads from stay on disk until it is done
+            assert set(old_segments) <= set(_segments_on_disk(corpus))
+        return original_section(self, section_number)
+
+    monkeypatch.setattr(bm25_index.BM25Index, "section", section_after_compaction)
+    hits = corpus.search("consent", k=5)
+    assert sorted(hit["node_id"] for hit in hits) == ["a-1", "b-1"]
+    assert compacted
+    # ... and are deleted once it finishes
+    assert len(_segments_on_disk(corpus)) == 1
+    assert not set(old_segments) & set(_segments_on_disk(corpus))
+    assert sorted(hit["node_id"] for hit in corpus.search("consent", k=5)) == ["a-1", "b-1"]
+
+
+def test_replaced_document_is_tombstoned(tmp_path):
+    corpus = CorpusIndex(str(tmp_path / "corpus"))
+    corpus.add_documents([_write_document(str(tmp_path), "a", ["informed consent form"])])
+    corpus.add_documents([_write_document(str(tmp_path), "a", ["revised consent form"])])
+    assert [hit["node_id"] for hit in corpus.search("consent")] == ["a-1"]
+    assert corpus.search("informed") == []
+    assert corpus.stats()["dead_sections"] == 1
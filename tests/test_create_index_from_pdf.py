@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from llama_index.core.schema import Document
+
+from create_pdf_index import create_index_from_pdf, page_parallel
+
+
+TEXT = "1. Introduction\nThis guideline applies.\n1.1 Scope\nClinical trials.\n2. Definitions\nTerms.\n"
+
+
+def test_serial_batch_reports_a_bad_file_and_goes_on(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "good.txt").write_text(TEXT, encoding="utf-8")
+
+    status = create_index_from_pdf.main(["--full", "--workers", "1", "missing.pdf", "good.txt"])
+
+    assert status == 1
+    output = capsys.readouterr().out
+    assert "[1/2] FAILED: missing.pdf" in output
+    assert "[2/2] Done: good.txt" in output
+    with open(tmp_path / "extracted_nodes_good.json", encoding="utf-8") as f:
+        assert [record["section_title"] for record in json.load(f)][-1] == "2. Definitions"
+
+
+def test_page_workers_rejects_a_file_pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as error:
+        create_index_from_pdf.main(["--workers", "2", "--page-workers", "2", "good.txt"])
+    assert error.value.code == 2
+
+
+def test_page_workers_is_used_by_the_incremental_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "good.txt").write_text(TEXT, encoding="utf-8")
+    calls = []
+    parse_document_pages = page_parallel.parse_document_pages
+
+    def spy(documents, section_parser=None, max_workers=None, batch_pages=None):
+        calls.append(max_workers)
+        return parse_document_pages(documents, section_parser, max_workers, batch_pages)
+
+    monkeypatch.setattr(page_parallel, "parse_document_pages", spy)
+    assert create_index_from_pdf.main(["--page-workers", "2", "good.txt"]) == 0
+    assert calls == [2]
+    assert (tmp_path / "extracted_nodes_good.json").exists()
+
+
+def test_pages_with_the_same_label_get_distinct_node_ids():
+    # Front matter pages often repeat a label (or have none) and can hold the same heading text
+    documents = [Document(text="1. Foreword\nText.\n", metadata={"page_label": "i", "content_hash": "h"})
+                 for _ in range(2)]
+    nodes = create_index_from_pdf.SectionNodeParser().get_nodes_from_documents(documents)
+    node_ids = [node.metadata["node_id"] for node in nodes]
+    assert len(node_ids) == 2 and len(set(node_ids)) == 2
+    # Still deterministic
+    again = create_index_from_pdf.SectionNodeParser().get_nodes_from_documents(documents)
+    assert [node.metadata["node_id"] for node in again] == node_ids
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from create_pdf_index import import_budget
+
+
+def test_package_modules_import_within_budget():
+    # Shared CI runners are slower than a workstation: scale the budgets there, e.g.
+    # IMPORT_BUDGET_SCALE=3, or set it to 0 to skip the timing part of the check.
+    scale = float(os.environ.get("IMPORT_BUDGET_SCALE", "2")) or float("inf")
+    results, violations = import_budget.check(repeat=2, scale=scale)
+    assert set(results) == set(import_budget.package_modules())
+    assert not violations, "\n".join(violations)
+
+
+def test_heavy_packages_are_detected():
+    result = import_budget.measure("create_index_from_pdf", repeat=1)
+    if not result["heavy"]:
+        pytest.skip("llama_index is not installed")
+    assert "llama_index" in result["heavy"]
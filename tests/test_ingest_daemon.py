@@ -0,0 +1,53 @@
+import threading
+import time
+
+from create_pdf_index import ingest_daemon, vector_index
+
+
+TEXT = "1. Informed consent\nSubjects sign the informed consent form before enrolment.\n" \
+       "2. Monitoring\nThe sponsor monitors the trial sites.\n"
+REVISED = "1. Informed consent\nSubjects sign the informed consent form before enrolment.\n" \
+          "2. Safety reporting\nInvestigators report serious adverse events within a day.\n"
+
+
+def _connect(socket_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return ingest_daemon.DaemonClient(str(socket_path), timeout=timeout)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def test_round_trip_over_a_socket(tmp_path):
+    socket_path = tmp_path / "d.sock"
+    vectors = str(tmp_path / "vectors")
+    vector_index.build_index([], vectors)
+    source = tmp_path / "guideline.txt"
+    source.write_text(TEXT, encoding="utf-8")
+
+    server = threading.Thread(target=ingest_daemon.serve, args=(str(socket_path),),
+                              kwargs={"vectors": vectors, "workers": 1})
+    server.start()
+    try:
+        with _connect(socket_path) as client:
+            assert client.ping()["pid"]
+            [result] = client.ingest([str(source)])
+            assert "error" not in result and result["vectors"] == 2
+            [hits] = client.similar(["serious adverse events"], k=5)
+            assert {hit["section_title"] for hit in hits} == {"1. Informed consent", "2. Monitoring"}
+
+            # A new revision replaces the document's sections in the running daemon
+            source.write_text(REVISED, encoding="utf-8")
+            client.ingest([str(source)])
+            [hits] = client.similar(["serious adverse events"], k=5)
+            assert hits[0]["section_title"] == "2. Safety reporting"
+            assert {hit["section_title"] for hit in hits} == {"1. Informed consent", "2. Safety reporting"}
+            assert client.stats()["vectors"]["sections"] == 2
+            assert client.shutdown() is True
+    finally:
+        server.join(timeout=60)
+    assert not server.is_alive()
+    assert not socket_path.exists()
@@ -0,0 +1,18 @@
+from create_pdf_index.node_writer import RecordNdjsonWriter, iter_node_records
+
+
+RECORDS = [
+    {"node_id": "a", "content": "line\u2028separator and paragraph\u2029separator"},
+    {"node_id": "b", "content": "next\x85line"},
+    {"node_id": "c", "content": "plain"},
+]
+
+
+def test_ndjson_keeps_unicode_line_separators(tmp_path):
+    path = str(tmp_path / "nodes.ndjson")
+    with RecordNdjsonWriter(path) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert list(iter_node_records(path)) == RECORDS
+    # The separators fall both in the first chunk and in the lines read after it
+    assert list(iter_node_records(path, chunk_size=16)) == RECORDS
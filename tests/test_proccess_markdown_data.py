@@ -0,0 +1,71 @@
+import io
+import re
+
+import pytest
+
+from create_pdf_index.proccess_markdown_data import (
+    pre_process_llamaparse_markdown_streaming,
+    pre_process_llamaparse_markdown_with_header_footer_removal_and_robust_page_breaks,
+)
+from create_pdf_index.synthetic_documents import generate_document
+
+PAGE_DELIMITER_BASE = "---PAGE_BREAK__"
+
+
+@pytest.fixture(scope="module", params=["", "\n"], ids=["no-final-newline", "final-newline"])
+def markdown(request):
+    return generate_document(pages=30, heading_style="cfr", seed=3).markdown + request.param
+
+
+def _streamed(source):
+    out = io.StringIO()
+    pre_process_llamaparse_markdown_streaming(source, out, page_delimiter_base=PAGE_DELIMITER_BASE)
+    return out.getvalue()
+
+
+def _pages(markdown):
+    # One chunk per page, each ending with its page-break line (as LlamaParse pages are joined)
+    return re.split(r"(?<=---\n)(?=.)", markdown)
+
+
+SOURCES = {
+    "keepends-lines": lambda text: text.splitlines(keepends=True),
+    "bare-lines": lambda text: text.splitlines(),
+    "pages": _pages,
+}
+
+
+def _expected(markdown):
+    return pre_process_llamaparse_markdown_with_header_footer_removal_and_robust_page_breaks(
+        markdown, page_delimiter_base=PAGE_DELIMITER_BASE)
+
+
+def test_path_matches_in_memory(markdown, tmp_path):
+    source = tmp_path / "doc.md"
+    source.write_text(markdown, encoding="utf-8")
+    assert _streamed(source) == _expected(markdown)
+
+
+@pytest.mark.parametrize("kind", ["iterator", "callable"])
+@pytest.mark.parametrize("split", list(SOURCES))
+def test_lines_and_pages_match_in_memory(markdown, kind, split):
+    if split == "bare-lines" and markdown.endswith("\n"):
+        pytest.skip("bare lines cannot carry a final newline")
+    source = iter(SOURCES[split](markdown)) if kind == "iterator" else lambda: SOURCES[split](markdown)
+    assert _expected(markdown)
+    assert _streamed(source) == _expected(markdown)
+
+
+def test_open_file_object_matches_in_memory(markdown, tmp_path):
+    expected = _expected(markdown)
+    assert expected.endswith("\n") == markdown.endswith("\n")
+    path = tmp_path / "doc.md"
+    path.write_text(markdown, encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        assert _streamed(f) == expected
+
+
+def test_pages_split_on_page_breaks(markdown):
+    pages = _pages(markdown)
+    assert len(pages) == 30
+    assert "".join(pages) == markdown
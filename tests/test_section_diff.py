@@ -0,0 +1,115 @@
+import numpy as np
+
+from create_pdf_index.section_diff import diff_sections
+from create_pdf_index.vector_index import HashingEmbedder, build_index, update_index
+
+
+def _record(node_id, heading_id, title, content):
+    return {"section_title": title, "page_label": "1", "heading_level": heading_id.count(".") + 1,
+            "heading_id": heading_id, "parent_node_id": None, "node_id": node_id, "content": content}
+
+
+def _version(prefix, sections):
+    return [_record(f"{prefix}{i}", heading_id, f"{heading_id} {title}", content)
+            for i, (heading_id, title, content) in enumerate(sections)]
+
+
+OLD = _version("old", [
+    ("1.", "Introduction", "Why this guideline exists."),
+    ("2.", "Scope", "Applies to clinical trials."),
+    ("3.", "Definitions", "Terms used in this guideline."),
+    ("4.", "Monitoring", "Sponsors monitor trials."),
+])
+
+
+def _pairs(pairs):
+    return [(old["node_id"], new["node_id"]) for old, new in pairs]
+
+
+def test_identical_versions_are_unchanged():
+    new = _version("new", [(r["heading_id"], r["section_title"].split(" ", 1)[1], r["content"]) for r in OLD])
+    diff = diff_sections(OLD, new)
+    assert not diff
+    assert diff.summary() == {"added": 0, "removed": 0, "modified": 0, "moved": 0, "unchanged": 4}
+    assert diff.node_id_map() == {f"old{i}": f"new{i}" for i in range(4)}
+
+
+def test_insertion_renumbers_later_sections_as_moved():
+    new = _version("new", [
+        ("1.", "Introduction", "Why this guideline exists."),
+        ("2.", "Background", "A new section."),
+        ("3.", "Scope", "Applies to clinical trials."),
+        ("4.", "Definitions", "Terms used in this guideline."),
+        ("5.", "Monitoring", "Sponsors monitor trials."),
+    ])
+    diff = diff_sections(OLD, new)
+    assert diff.summary() == {"added": 1, "removed": 0, "modified": 0, "moved": 3, "unchanged": 1}
+    assert [r["node_id"] for r in diff.added] == ["new1"]
+    assert _pairs(diff.moved) == [("old1", "new2"), ("old2", "new3"), ("old3", "new4")]
+    assert [r["node_id"] for r in diff.changed_records()] == ["new1", "new2", "new3", "new4"]
+
+
+def test_moved_section_and_modified_and_removed():
+    new = _version("new", [
+        ("1.", "Introduction", "Why this guideline exists, revised."),
+        ("2.", "Monitoring", "Sponsors monitor trials."),
+        ("3.", "Definitions", "Terms used in this guideline."),
+    ])
+    diff = diff_sections(OLD, new)
+    assert _pairs(diff.modified) == [("old0", "new0")]
+    assert _pairs(diff.moved) == [("old3", "new1")]
+    assert _pairs(diff.unchanged) == [("old2", "new2")]
+    assert diff.removed_node_ids() == ["old1"]
+
+
+def test_title_only_change_is_modified():
+    new = [dict(record, node_id=f"new{i}") for i, record in enumerate(OLD)]
+    new[1]["section_title"] = "2. Scope of the guideline"
+    diff = diff_sections(OLD, new)
+    assert _pairs(diff.modified) == [("old1", "new1")]
+    assert len(diff.unchanged) == 3
+
+
+def test_duplicate_headings_pair_by_occurrence():
+    old = _version("old", [("(a)", "General", "First (a)."), ("(a)", "General", "Second (a)."),
+                           ("(a)", "General", "Boilerplate."), ("(b)", "Other", "Boilerplate.")])
+    new = _version("new", [("(a)", "General", "First (a)."), ("(a)", "General", "Second (a), changed."),
+                           ("(a)", "General", "Boilerplate."), ("(b)", "Other", "Boilerplate.")])
+    diff = diff_sections(old, new)
+    assert _pairs(diff.unchanged) == [("old0", "new0"), ("old2", "new2"), ("old3", "new3")]
+    assert _pairs(diff.modified) == [("old1", "new1")]
+    assert not diff.moved and not diff.added and not diff.removed
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return super().__call__(texts)
+
+
+def test_update_index_embeds_only_changed_sections(tmp_path):
+    other = [("other.json", _record("x", "1.", "1. Other", "Another document."))]
+    directory = str(tmp_path / "vectors")
+    previous = build_index(other + [("v1.json", record) for record in OLD], directory, CountingEmbedder())
+    new = _version("new", [
+        ("1.", "Introduction", "Why this guideline exists."),
+        ("2.", "Scope", "Applies to clinical trials, revised."),
+        ("3.", "Definitions", "Terms used in this guideline."),
+        ("4.", "Safety", "A new section."),
+    ])
+    diff = diff_sections(OLD, new)
+
+    embedder = CountingEmbedder()
+    previous.embedder = embedder
+    updated = update_index(previous, "v1.json", diff, new_source="v2.json")
+    assert embedder.texts == ["Applies to clinical trials, revised.", "A new section."]
+
+    fresh = build_index(other + [("v2.json", record) for record in new], str(tmp_path / "fresh"), CountingEmbedder())
+    assert updated.count == fresh.count == 5
+    assert np.allclose(np.array(updated.vectors)[updated.vector_rows], np.array(fresh.vectors)[fresh.vector_rows])
+    hits = updated.search("revised clinical trials", k=1)
+    assert (hits[0]["source"], hits[0]["node_id"]) == ("v2.json", "new1")
@@ -0,0 +1,43 @@
+from create_pdf_index.section_store import SectionStore, body_hash
+
+
+def _record(node_id, heading_id, title, content, page_label="1"):
+    return {"section_title": title, "page_label": page_label, "heading_level": heading_id.count(".") + 1,
+            "heading_id": heading_id, "parent_node_id": None, "node_id": node_id, "content": content}
+
+
+RECORDS = [
+    _record("a", "1", "1. Definitions", "Adverse event means any untoward medical occurrence."),
+    _record("b", "2", "2. Glossary", "Adverse event  means any untoward\nmedical occurrence. "),
+    _record("c", "3", "3. Scope", "This guideline applies to clinical trials."),
+    _record("d", "4", "4. Empty", ""),
+]
+
+
+def test_records_round_trip_exactly(tmp_path):
+    store = SectionStore(str(tmp_path / "store"))
+    added = store.add_records("doc", RECORDS)
+    assert added == {"sections": 4, "new_bodies": 3}
+    assert store.records("doc") == RECORDS
+    # Reopened from disk
+    assert SectionStore(str(tmp_path / "store")).records("doc") == RECORDS
+
+
+def test_whitespace_variant_shares_the_body(tmp_path):
+    store = SectionStore(str(tmp_path / "store"))
+    store.add_records("doc", RECORDS)
+    references = store.references("doc")
+    assert references[0]["body_hash"] == references[1]["body_hash"] == body_hash(RECORDS[0]["content"])
+    assert "content" not in references[0]
+    assert references[1]["content"] == RECORDS[1]["content"]
+    assert len(store) == 3
+
+
+def test_bodies_shared_across_documents_and_compacted(tmp_path):
+    store = SectionStore(str(tmp_path / "store"))
+    store.add_records("doc", RECORDS)
+    other = [_record("x", "1", "1. Other", RECORDS[2]["content"]), _record("y", "2", "2. New", "Only here.")]
+    assert store.add_records("other", other)["new_bodies"] == 1
+    store.remove_documents(["doc"])
+    assert store.compact() == 2
+    assert store.records("other") == other
@@ -0,0 +1,52 @@
+import numpy as np
+
+from create_pdf_index.vector_index import HashingEmbedder, build_index
+
+
+def _record(node_id, title, content):
+    return {"section_title": title, "page_label": "1", "heading_level": 1, "heading_id": "",
+            "parent_node_id": None, "node_id": node_id, "content": content}
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return super().__call__(texts)
+
+
+def test_same_body_under_two_titles_is_embedded_once(tmp_path):
+    records = [("doc", _record("a", "1. Definitions", "Adverse event means any untoward occurrence.")),
+               ("doc", _record("b", "7. Glossary", "Adverse  event means any untoward occurrence.")),
+               ("doc", _record("c", "2. Scope", "")),
+               ("doc", _record("d", "3. Other scope", ""))]
+    embedder = CountingEmbedder()
+    index = build_index(records, str(tmp_path / "vectors"), embedder)
+    assert index.meta["vectors"] == 3
+    assert embedder.texts == ["Adverse event means any untoward occurrence.", "2. Scope", "3. Other scope"]
+    assert index.vector_rows[0] == index.vector_rows[1]
+
+
+def test_rebuild_reuses_vectors_of_unchanged_bodies(tmp_path):
+    directory = str(tmp_path / "vectors")
+    records = [("doc", _record(str(i), f"{i}. Title", f"Body text number {i} of the guideline."))
+               for i in range(20)]
+    first = build_index(records, directory, CountingEmbedder())
+    first_vectors = np.array(first.vectors)
+    records[5] = ("doc", _record("5", "5. Renamed title", records[5][1]["content"]))
+    records[7] = ("doc", _record("7", "7. Title", "A revised body."))
+
+    embedder = CountingEmbedder()
+    rebuilt = build_index(records, directory, embedder, previous=first)
+    assert embedder.texts == ["A revised body."]
+    assert np.array_equal(np.array(rebuilt.vectors)[rebuilt.vector_rows[5]], first_vectors[first.vector_rows[5]])
+
+
+def test_search_finds_the_matching_body(tmp_path):
+    records = [("doc", _record(str(i), f"{i}. Title", text)) for i, text in enumerate(
+        ["Informed consent of trial subjects.", "Storage of investigational product.", "Safety reporting."])]
+    index = build_index(records, str(tmp_path / "vectors"))
+    assert index.search("informed consent", k=1)[0]["node_id"] == "0"